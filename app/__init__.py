@@ -5,7 +5,31 @@ def create_app() -> Flask:
 	app = Flask(__name__)
 	app.config["SECRET_KEY"] = "change-me-dev-key"
 
+	from .log import configure_logging
+	from . import metrics, profiling
+	configure_logging()
+	metrics.init_app(app)
+	profiling.init_app(app)
+
 	from .routes import pages
 	app.register_blueprint(pages)
 
 	return app
+
+
+def warm_up(app: Flask) -> None:
+	"""Load what requests would otherwise load lazily: modules, templates and data.
+
+	Called in the gunicorn master when preloading, so forked workers share
+	these pages copy-on-write instead of each paying for them on first use.
+	"""
+	from . import closed_samples_store, customers_store, samples_store, sqlite_store, users_store, xlsx_writer  # noqa: F401
+
+	for name in app.jinja_env.list_templates():
+		app.jinja_env.get_template(name)
+	if sqlite_store.use_sqlite():
+		import sqlite3  # noqa: F401
+	else:
+		for module in (customers_store, samples_store, closed_samples_store, users_store):
+			module._store.read()
+		samples_store.search_samples("")  # builds the search index
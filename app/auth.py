@@ -1,18 +1,83 @@
+import os
 from functools import wraps
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Dict, Optional
 
-from flask import session, redirect, url_for, abort
+from flask import session, redirect, url_for, abort, g
 
-from .users_store import verify_user_credentials, is_admin as _is_admin, has_permission as _has_permission
+from .users_store import verify_user_credentials, resolve_principal, users_version, Principal
 
 
 ADMIN_USERNAME = "Admin"
 
+# With LAB_SESSION_CLAIMS=1 the user's role and permissions travel in the signed
+# session cookie and are trusted until the users store version moves. The
+# version is re-read from disk at most once per LAB_SESSION_CLAIMS_TTL seconds
+# per worker, so most requests authorize without any file I/O; a change made in
+# another worker reaches this one within the TTL (this worker's own changes
+# are seen at once).
+SESSION_CLAIMS = os.environ.get("LAB_SESSION_CLAIMS", "").strip().lower() in ("1", "true", "yes", "on")
+SESSION_CLAIMS_TTL = float(os.environ.get("LAB_SESSION_CLAIMS_TTL", "1.0"))
+
 
 def verify_credentials(username: str, password: str) -> bool:
 	return verify_user_credentials(username, password)
 
 
+def issue_claims(username: str) -> Optional[Principal]:
+	"""Store the user's current authorization in the session and return it.
+
+	Only stores anything with LAB_SESSION_CLAIMS; the principal is returned either way.
+	"""
+	if not SESSION_CLAIMS:
+		return resolve_principal(username)
+	version = users_version()
+	principal = resolve_principal(username)
+	if principal is None:
+		session.pop("claims", None)
+		return None
+	session["claims"] = {
+		"username": principal.username,
+		"role": "admin" if principal.is_admin else "user",
+		"active": principal.active,
+		"permissions": sorted(principal.permissions),
+		"version": version,
+	}
+	return principal
+
+
+def _principal_from_claims(username: str) -> Optional[Principal]:
+	claims: Optional[Dict[str, Any]] = session.get("claims")
+	if not claims or claims.get("username") != username or claims.get("version") != users_version(SESSION_CLAIMS_TTL):
+		return None
+	return Principal(
+		username=username,
+		is_admin=claims.get("role") == "admin",
+		active=bool(claims.get("active")),
+		permissions=frozenset(claims.get("permissions") or []),
+	)
+
+
+def _resolve(username: str) -> Optional[Principal]:
+	if not SESSION_CLAIMS:
+		return resolve_principal(username)
+	principal = _principal_from_claims(username)
+	if principal is None:
+		# Missing or stale claim: re-check against the users store and re-issue it.
+		principal = issue_claims(username)
+	return principal
+
+
+def current_principal() -> Optional[Principal]:
+	"""The logged-in user's Principal, resolved at most once per request."""
+	username: Optional[str] = session.get("user_id")
+	if not username:
+		return None
+	if getattr(g, "principal_username", None) != username:
+		g.principal = _resolve(username)
+		g.principal_username = username
+	return g.principal
+
+
 def login_required(view_func: Callable[..., Any]) -> Callable[..., Any]:
 	@wraps(view_func)
 	def wrapped(*args: Any, **kwargs: Any):
@@ -29,7 +94,8 @@ def admin_required(view_func: Callable[..., Any]) -> Callable[..., Any]:
 		username: Optional[str] = session.get("user_id")
 		if not username:
 			return redirect(url_for("pages.login"))
-		if not _is_admin(username):
+		principal = current_principal()
+		if not principal or not principal.is_admin:
 			return abort(403)
 		return view_func(*args, **kwargs)
 
@@ -43,7 +109,8 @@ def permission_required(section: str) -> Callable[[Callable[..., Any]], Callable
 			username: Optional[str] = session.get("user_id")
 			if not username:
 				return redirect(url_for("pages.login"))
-			if not _has_permission(username, section):
+			principal = current_principal()
+			if not principal or not principal.can(section):
 				return abort(403)
 			return view_func(*args, **kwargs)
 
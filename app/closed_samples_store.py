@@ -1,28 +1,37 @@
-import json
 import os
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-CLOSED_SAMPLES_FILE = os.path.join(DATA_DIR, "closed_samples.json")
+from . import sqlite_store
+from .json_store import DATA_DIR, JsonStore, record_type
 
+CLOSED_SAMPLES_FILE = os.path.join(DATA_DIR, "closed_samples.json")
 
-def _ensure_store() -> None:
-	os.makedirs(DATA_DIR, exist_ok=True)
-	if not os.path.exists(CLOSED_SAMPLES_FILE):
-		with open(CLOSED_SAMPLES_FILE, "w", encoding="utf-8") as f:
-			json.dump({"next_id": 1, "closed_samples": []}, f, ensure_ascii=False, indent=2)
+# Filters of list_closed_samples_paginated() (exact match) and the fields it can sort by
+FILTER_FIELDS = ("customer_name", "encoding", "box_symbol")
+SORT_FIELDS = ("closing_date", "customer_name", "encoding", "box_symbol")
+# Filtered lists with more candidates than this are paged by walking the sort index
+FILTER_SORT_LIMIT = 2000
 
+# Closed samples are kept in memory as compact records; the boxes of one sample share most values
+ClosedSampleRecord = record_type(
+	"ClosedSampleRecord",
+	sqlite_store.CLOSED_SAMPLE_COLUMNS,
+	shared=("closing_date", "customer_name", "sample_name", "encoding", "box_symbol", "note"),
+)
 
-def _read() -> Dict[str, Any]:
-	_ensure_store()
-	with open(CLOSED_SAMPLES_FILE, "r", encoding="utf-8") as f:
-		return json.load(f)
+_store = JsonStore(
+	CLOSED_SAMPLES_FILE,
+	lambda: {"next_id": 1, "closed_samples": []},
+	collection="closed_samples",
+	indexes=FILTER_FIELDS,
+	sorted_indexes=SORT_FIELDS,
+	record_type=ClosedSampleRecord,
+)
 
 
-def _write(data: Dict[str, Any]) -> None:
-	with open(CLOSED_SAMPLES_FILE, "w", encoding="utf-8") as f:
-		json.dump(data, f, ensure_ascii=False, indent=2)
+def _read() -> Dict[str, Any]:
+	return _store.read()
 
 
 def list_closed_samples() -> List[Dict[str, Any]]:
@@ -30,6 +39,80 @@ def list_closed_samples() -> List[Dict[str, Any]]:
 	return _read().get("closed_samples", [])
 
 
+def list_closed_samples_between(date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+	"""Closed samples with a closing date between two inclusive YYYY-MM-DD dates (None = open), oldest first.
+
+	Binary search over the closing_date sorted index: the cost grows with
+	the number of boxes returned, not with the history.
+	"""
+	return _store.ordered("closing_date", date_from or None, date_to or None)[0]
+
+
+def list_closed_samples_paginated(
+	page: int = 1,
+	per_page: int = 20,
+	sort: str = "closing_date",
+	descending: bool = True,
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+	customer_name: Optional[str] = None,
+	encoding: Optional[str] = None,
+	box_symbol: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], int, int]:
+	"""Closed samples filtered, sorted and paginated. Returns (closed_samples, total_pages, total_count)
+
+	Dates are inclusive YYYY-MM-DD bounds; customer name, encoding and box
+	symbol match exactly. Ties in the sort field are ordered by id.
+	"""
+	if sort not in SORT_FIELDS:
+		sort = "closing_date"
+	offset = max(page - 1, 0) * per_page
+	equal = {field: value for field, value in zip(FILTER_FIELDS, (customer_name, encoding, box_symbol)) if value}
+	
+	date_range = (date_from or None, date_to or None)
+	if not equal and (sort == "closing_date" or date_range == (None, None)):
+		# Straight from the sorted index: cost depends on the page, not the history
+		if sort == "closing_date":
+			closed_samples, total_count = _store.ordered(sort, *date_range, offset, offset + per_page, descending)
+		else:
+			closed_samples, total_count = _store.ordered(sort, None, None, offset, offset + per_page, descending)
+	else:
+		def matches(r: Dict[str, Any], equal: Dict[str, Any] = equal, dates: bool = True) -> bool:
+			date = r.get("closing_date") or ""
+			return (
+				all(r.get(field) == value for field, value in equal.items())
+				and (not dates or not date_from or date >= date_from)
+				and (not dates or not date_to or date <= date_to)
+			)
+		
+		# Count over the smallest candidate set (an equality group or the date
+		# range), checking only the criteria that set does not already satisfy
+		sizes = {item: _store.count(*item) for item in equal.items()}
+		if date_range != (None, None):
+			sizes[None] = _store.ordered("closing_date", *date_range, 0, 0)[1]
+		smallest = min(sizes, key=sizes.get)
+		if smallest is None:
+			candidates = _store.ordered("closing_date", *date_range)[0]
+			rest, check_dates = equal, False
+		else:
+			candidates = _store.select(*smallest)
+			rest = {f: v for f, v in equal.items() if f != smallest[0]}
+			check_dates = date_range != (None, None)
+		if rest or check_dates:
+			candidates = [r for r in candidates if matches(r, rest, check_dates)]
+		total_count = len(candidates)
+		if total_count <= FILTER_SORT_LIMIT:
+			candidates.sort(key=lambda r: (r.get(sort) or "", r.get("id")), reverse=descending)
+			closed_samples = candidates[offset:offset + per_page]
+		else:
+			# Many matches: walk the sort index until the page is filled
+			bounds = date_range if sort == "closing_date" else (None, None)
+			closed_samples = _store.scan_ordered(sort, matches, offset, offset + per_page, *bounds, descending)
+	
+	total_pages = (total_count + per_page - 1) // per_page
+	return closed_samples, total_pages, total_count
+
+
 def create_closed_sample(
 	closing_date: str,
 	customer_name: str,
@@ -41,30 +124,28 @@ def create_closed_sample(
 	note: str = ""
 ) -> int:
 	"""Create a new closed sample record"""
-	data = _read()
-	closed_sample_id = data["next_id"]
+	with _store.locked() as data:
+		closed_sample_id = data["next_id"]
 	
-	# Calculate corrected weight (weight - moisture weight)
-	moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
-	corrected_weight = weight - moisture_weight
+		# Calculate corrected weight (weight - moisture weight)
+		moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
+		corrected_weight = weight - moisture_weight
 	
-	closed_sample = {
-		"id": closed_sample_id,
-		"closing_date": closing_date,
-		"customer_name": customer_name,
-		"sample_name": sample_name,
-		"encoding": encoding,
-		"box_symbol": box_symbol,
-		"weight": weight,
-		"moisture": moisture,
-		"corrected_weight": corrected_weight,
-		"note": note,
-		"created_at": datetime.now().isoformat()
-	}
+		closed_sample = {
+			"id": closed_sample_id,
+			"closing_date": closing_date,
+			"customer_name": customer_name,
+			"sample_name": sample_name,
+			"encoding": encoding,
+			"box_symbol": box_symbol,
+			"weight": weight,
+			"moisture": moisture,
+			"corrected_weight": corrected_weight,
+			"note": note,
+			"created_at": datetime.now().isoformat()
+		}
 	
-	data["closed_samples"].append(closed_sample)
-	data["next_id"] += 1
-	_write(data)
+		_store.apply(put=[closed_sample], meta={"next_id": closed_sample_id + 1})
 	
 	return closed_sample_id
 
@@ -78,47 +159,45 @@ def create_closed_sample_with_boxes(
 	note: str = ""
 ) -> List[int]:
 	"""Create multiple closed sample records for the same sample with different boxes"""
-	data = _read()
-	created_ids = []
+	with _store.locked() as data:
+		next_id = data["next_id"]
+		records = []
+		created_ids = []
 	
-	for box in boxes:
-		closed_sample_id = data["next_id"]
+		for box in boxes:
+			closed_sample_id = next_id
 		
-		# Calculate corrected weight (weight - moisture weight)
-		weight = float(box.get("weight", 0))
-		moisture = float(box.get("moisture", 0))
-		moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
-		corrected_weight = weight - moisture_weight
+			# Calculate corrected weight (weight - moisture weight)
+			weight = float(box.get("weight", 0))
+			moisture = float(box.get("moisture", 0))
+			moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
+			corrected_weight = weight - moisture_weight
 		
-		closed_sample = {
-			"id": closed_sample_id,
-			"closing_date": closing_date,
-			"customer_name": customer_name,
-			"sample_name": sample_name,
-			"encoding": encoding,
-			"box_symbol": box.get("box_symbol", ""),
-			"weight": weight,
-			"moisture": moisture,
-			"corrected_weight": corrected_weight,
-			"note": note,
-			"created_at": datetime.now().isoformat()
-		}
+			closed_sample = {
+				"id": closed_sample_id,
+				"closing_date": closing_date,
+				"customer_name": customer_name,
+				"sample_name": sample_name,
+				"encoding": encoding,
+				"box_symbol": box.get("box_symbol", ""),
+				"weight": weight,
+				"moisture": moisture,
+				"corrected_weight": corrected_weight,
+				"note": note,
+				"created_at": datetime.now().isoformat()
+			}
 		
-		data["closed_samples"].append(closed_sample)
-		data["next_id"] += 1
-		created_ids.append(closed_sample_id)
+			records.append(closed_sample)
+			next_id += 1
+			created_ids.append(closed_sample_id)
 	
-	_write(data)
+		_store.apply(put=records, meta={"next_id": next_id})
 	return created_ids
 
 
 def get_closed_sample(closed_sample_id: int) -> Optional[Dict[str, Any]]:
 	"""Get a specific closed sample by ID"""
-	closed_samples = list_closed_samples()
-	for sample in closed_samples:
-		if sample["id"] == closed_sample_id:
-			return sample
-	return None
+	return _store.get(closed_sample_id)
 
 
 def update_closed_sample(
@@ -133,76 +212,211 @@ def update_closed_sample(
 	note: str = ""
 ) -> bool:
 	"""Update an existing closed sample"""
-	data = _read()
-	for sample in data["closed_samples"]:
-		if sample["id"] == closed_sample_id:
-			# Calculate corrected weight
-			moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
-			corrected_weight = weight - moisture_weight
-			
-			sample["closing_date"] = closing_date
-			sample["customer_name"] = customer_name
-			sample["sample_name"] = sample_name
-			sample["encoding"] = encoding
-			sample["box_symbol"] = box_symbol
-			sample["weight"] = weight
-			sample["moisture"] = moisture
-			sample["corrected_weight"] = corrected_weight
-			sample["note"] = note
-			
-			_write(data)
-			return True
-	return False
+	# Calculate corrected weight
+	moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
+	corrected_weight = weight - moisture_weight
+	
+	with _store.locked():
+		existing = get_closed_sample(closed_sample_id)
+		if not existing:
+			return False
+		sample = dict(existing)
+		sample["closing_date"] = closing_date
+		sample["customer_name"] = customer_name
+		sample["sample_name"] = sample_name
+		sample["encoding"] = encoding
+		sample["box_symbol"] = box_symbol
+		sample["weight"] = weight
+		sample["moisture"] = moisture
+		sample["corrected_weight"] = corrected_weight
+		sample["note"] = note
+		_store.apply(put=[sample])
+	return True
 
 
 def delete_closed_sample(closed_sample_id: int) -> bool:
 	"""Delete a closed sample"""
-	data = _read()
-	data["closed_samples"] = [s for s in data["closed_samples"] if s["id"] != closed_sample_id]
-	_write(data)
+	_store.apply(delete=[closed_sample_id])
 	return True
 
 
-def export_closed_samples_to_excel() -> str:
+EXPORT_SHEET_NAME = "Mẫu đã đóng"
+EXPORT_COLUMNS = [
+	("id", "ID"),
+	("closing_date", "Ngày đóng mẫu"),
+	("customer_name", "Tên khách hàng"),
+	("sample_name", "Tên mẫu"),
+	("encoding", "Mã hóa"),
+	("box_symbol", "Ký hiệu box"),
+	("weight", "Khối lượng cân (g)"),
+	("moisture", "Độ ẩm (%)"),
+	("corrected_weight", "Khối lượng hiệu chỉnh (g)"),
+	("note", "Ghi chú"),
+]
+
+
+def export_closed_samples_xlsx_stream(date_from: Optional[str] = None, date_to: Optional[str] = None) -> Iterator[bytes]:
+	"""Closed samples (all, or those closed in a date range) as an .xlsx file, yielded in chunks as the rows are written."""
+	from .xlsx_writer import iter_xlsx  # zipfile is only needed for exports, not at startup
+
+	# Snapshot the list now so a concurrent write cannot change it mid-export
+	if date_from or date_to:
+		closed_samples = list(list_closed_samples_between(date_from, date_to))
+	else:
+		closed_samples = list(list_closed_samples())
+	rows = ([sample.get(field) for field, _ in EXPORT_COLUMNS] for sample in closed_samples)
+	return iter_xlsx(EXPORT_SHEET_NAME, [title for _, title in EXPORT_COLUMNS], rows)
+
+
+def export_closed_samples_to_excel(date_from: Optional[str] = None, date_to: Optional[str] = None) -> bytes:
 	"""Export closed samples to Excel format"""
-	import io
-	import pandas as pd
-	
-	closed_samples = list_closed_samples()
-	
-	# Create DataFrame
-	df = pd.DataFrame(closed_samples)
-	
-	# Reorder columns for better display
-	column_order = [
-		"id", "closing_date", "customer_name", "sample_name", "encoding", 
-		"box_symbol", "weight", "moisture", "corrected_weight", "note"
-	]
-	
-	# Only include columns that exist in the data
-	available_columns = [col for col in column_order if col in df.columns]
-	df = df[available_columns]
-	
-	# Rename columns to Vietnamese
-	column_names = {
-		"id": "ID",
-		"closing_date": "Ngày đóng mẫu",
-		"customer_name": "Tên khách hàng",
-		"sample_name": "Tên mẫu",
-		"encoding": "Mã hóa",
-		"box_symbol": "Ký hiệu box",
-		"weight": "Khối lượng cân (g)",
-		"moisture": "Độ ẩm (%)",
-		"corrected_weight": "Khối lượng hiệu chỉnh (g)",
-		"note": "Ghi chú"
-	}
-	
-	df = df.rename(columns=column_names)
-	
-	# Create Excel file in memory
-	output = io.BytesIO()
-	with pd.ExcelWriter(output, engine='openpyxl') as writer:
-		df.to_excel(writer, sheet_name='Mẫu đã đóng', index=False)
-	
-	output.seek(0)
-	return output.getvalue()
+	return b"".join(export_closed_samples_xlsx_stream(date_from, date_to))
+
+
+# SQLite backend (LAB_STORAGE_BACKEND=sqlite)
+
+def _corrected_weight(weight: float, moisture: float) -> float:
+	moisture_weight = weight * (moisture / 100) if moisture > 0 else 0
+	return weight - moisture_weight
+
+
+def _sql_insert_closed_sample(conn, closing_date: str, customer_name: str, sample_name: str, encoding: str, box_symbol: str, weight: float, moisture: float, note: str) -> int:
+	closed_sample_id = sqlite_store.next_id(conn, "closed_samples")
+	conn.execute(
+		"INSERT INTO closed_samples (id, closing_date, customer_name, sample_name, encoding, box_symbol, weight, moisture, corrected_weight, note, created_at) "
+		"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+		(
+			closed_sample_id, closing_date, customer_name, sample_name, encoding, box_symbol,
+			weight, moisture, _corrected_weight(weight, moisture), note, datetime.now().isoformat(),
+		),
+	)
+	return closed_sample_id
+
+
+def _sql_list_closed_samples() -> List[Dict[str, Any]]:
+	rows = sqlite_store.connect().execute("SELECT * FROM closed_samples ORDER BY id").fetchall()
+	return sqlite_store.rows_to_dicts(rows)
+
+
+def _sql_list_closed_samples_between(date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+	conditions: List[str] = []
+	params: List[Any] = []
+	if date_from:
+		conditions.append("closing_date >= ?")
+		params.append(date_from)
+	if date_to:
+		conditions.append("closing_date <= ?")
+		params.append(date_to)
+	where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+	rows = sqlite_store.connect().execute(f"SELECT * FROM closed_samples {where} ORDER BY closing_date, id", params).fetchall()
+	return sqlite_store.rows_to_dicts(rows)
+
+
+def _sql_list_closed_samples_paginated(
+	page: int = 1,
+	per_page: int = 20,
+	sort: str = "closing_date",
+	descending: bool = True,
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+	customer_name: Optional[str] = None,
+	encoding: Optional[str] = None,
+	box_symbol: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], int, int]:
+	if sort not in SORT_FIELDS:
+		sort = "closing_date"
+	conditions = [f"{field} = ?" for field, value in zip(FILTER_FIELDS, (customer_name, encoding, box_symbol)) if value]
+	params: List[Any] = [value for value in (customer_name, encoding, box_symbol) if value]
+	if date_from:
+		conditions.append("closing_date >= ?")
+		params.append(date_from)
+	if date_to:
+		conditions.append("closing_date <= ?")
+		params.append(date_to)
+	where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+	direction = "DESC" if descending else "ASC"
+	conn = sqlite_store.connect()
+	total_count = conn.execute(f"SELECT COUNT(*) FROM closed_samples {where}", params).fetchone()[0]
+	rows = conn.execute(
+		f"SELECT * FROM closed_samples {where} ORDER BY {sort} {direction}, id {direction} LIMIT ? OFFSET ?",
+		params + [per_page, max(page - 1, 0) * per_page],
+	).fetchall()
+	total_pages = (total_count + per_page - 1) // per_page
+	return sqlite_store.rows_to_dicts(rows), total_pages, total_count
+
+
+def _sql_create_closed_sample(
+	closing_date: str,
+	customer_name: str,
+	sample_name: str,
+	encoding: str,
+	box_symbol: str,
+	weight: float,
+	moisture: float,
+	note: str = ""
+) -> int:
+	with sqlite_store.transaction() as conn:
+		return _sql_insert_closed_sample(conn, closing_date, customer_name, sample_name, encoding, box_symbol, weight, moisture, note)
+
+
+def _sql_create_closed_sample_with_boxes(
+	closing_date: str,
+	customer_name: str,
+	sample_name: str,
+	encoding: str,
+	boxes: List[Dict[str, Any]],
+	note: str = ""
+) -> List[int]:
+	with sqlite_store.transaction() as conn:
+		return [
+			_sql_insert_closed_sample(
+				conn, closing_date, customer_name, sample_name, encoding, box.get("box_symbol", ""),
+				float(box.get("weight", 0)), float(box.get("moisture", 0)), note,
+			)
+			for box in boxes
+		]
+
+
+def _sql_get_closed_sample(closed_sample_id: int) -> Optional[Dict[str, Any]]:
+	row = sqlite_store.connect().execute("SELECT * FROM closed_samples WHERE id = ?", (closed_sample_id,)).fetchone()
+	return sqlite_store.row_to_dict(row)
+
+
+def _sql_update_closed_sample(
+	closed_sample_id: int,
+	closing_date: str,
+	customer_name: str,
+	sample_name: str,
+	encoding: str,
+	box_symbol: str,
+	weight: float,
+	moisture: float,
+	note: str = ""
+) -> bool:
+	with sqlite_store.transaction() as conn:
+		cursor = conn.execute(
+			"UPDATE closed_samples SET closing_date = ?, customer_name = ?, sample_name = ?, encoding = ?, box_symbol = ?, "
+			"weight = ?, moisture = ?, corrected_weight = ?, note = ? WHERE id = ?",
+			(
+				closing_date, customer_name, sample_name, encoding, box_symbol,
+				weight, moisture, _corrected_weight(weight, moisture), note, closed_sample_id,
+			),
+		)
+	return cursor.rowcount > 0
+
+
+def _sql_delete_closed_sample(closed_sample_id: int) -> bool:
+	with sqlite_store.transaction() as conn:
+		conn.execute("DELETE FROM closed_samples WHERE id = ?", (closed_sample_id,))
+	return True
+
+
+if sqlite_store.use_sqlite():
+	list_closed_samples = _sql_list_closed_samples
+	list_closed_samples_between = _sql_list_closed_samples_between
+	list_closed_samples_paginated = _sql_list_closed_samples_paginated
+	create_closed_sample = _sql_create_closed_sample
+	create_closed_sample_with_boxes = _sql_create_closed_sample_with_boxes
+	get_closed_sample = _sql_get_closed_sample
+	update_closed_sample = _sql_update_closed_sample
+	delete_closed_sample = _sql_delete_closed_sample
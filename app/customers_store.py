@@ -1,27 +1,16 @@
-import json
 import os
 from typing import Dict, Any, List, Optional
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-CUSTOMERS_FILE = os.path.join(DATA_DIR, "customers.json")
+from . import sqlite_store
+from .json_store import DATA_DIR, JsonStore
 
+CUSTOMERS_FILE = os.path.join(DATA_DIR, "customers.json")
 
-def _ensure_store() -> None:
-	os.makedirs(DATA_DIR, exist_ok=True)
-	if not os.path.exists(CUSTOMERS_FILE):
-		with open(CUSTOMERS_FILE, "w", encoding="utf-8") as f:
-			json.dump({"next_id": 1, "customers": []}, f, ensure_ascii=False, indent=2)
+_store = JsonStore(CUSTOMERS_FILE, lambda: {"next_id": 1, "customers": []}, collection="customers")
 
 
 def _read() -> Dict[str, Any]:
-	_ensure_store()
-	with open(CUSTOMERS_FILE, "r", encoding="utf-8") as f:
-		return json.load(f)
-
-
-def _write(data: Dict[str, Any]) -> None:
-	with open(CUSTOMERS_FILE, "w", encoding="utf-8") as f:
-		json.dump(data, f, ensure_ascii=False, indent=2)
+	return _store.read()
 
 
 def list_customers() -> List[Dict[str, Any]]:
@@ -29,53 +18,87 @@ def list_customers() -> List[Dict[str, Any]]:
 
 
 def get_customer(customer_id: int) -> Optional[Dict[str, Any]]:
-	for c in list_customers():
-		if c.get("id") == customer_id:
-			return c
-	return None
+	return _store.get(customer_id)
 
 
 def create_customer(name: str, organization: str, phone: str, address: str, note: str) -> int:
-	data = _read()
-	customer_id = data.get("next_id", 1)
-	record = {
-		"id": customer_id,
-		"name": name.strip(),
-		"organization": organization.strip(),
-		"phone": phone.strip(),
-		"address": address.strip(),
-		"note": note.strip(),
-	}
-	data.setdefault("customers", []).append(record)
-	data["next_id"] = customer_id + 1
-	_write(data)
+	with _store.locked() as data:
+		customer_id = data.get("next_id", 1)
+		record = {
+			"id": customer_id,
+			"name": name.strip(),
+			"organization": organization.strip(),
+			"phone": phone.strip(),
+			"address": address.strip(),
+			"note": note.strip(),
+		}
+		_store.apply(put=[record], meta={"next_id": customer_id + 1})
 	return customer_id
 
 
 def update_customer(customer_id: int, name: str, organization: str, phone: str, address: str, note: str) -> bool:
-	data = _read()
-	found = False
-	for c in data.get("customers", []):
-		if c.get("id") == customer_id:
-			c["name"] = name.strip()
-			c["organization"] = organization.strip()
-			c["phone"] = phone.strip()
-			c["address"] = address.strip()
-			c["note"] = note.strip()
-			found = True
-			break
-	if not found:
-		return False
-	_write(data)
+	with _store.locked():
+		existing = get_customer(customer_id)
+		if not existing:
+			return False
+		record = dict(existing)
+		record["name"] = name.strip()
+		record["organization"] = organization.strip()
+		record["phone"] = phone.strip()
+		record["address"] = address.strip()
+		record["note"] = note.strip()
+		_store.apply(put=[record])
 	return True
 
 
 def delete_customer(customer_id: int) -> bool:
-	data = _read()
-	customers = data.get("customers", [])
-	new_customers = [c for c in customers if c.get("id") != customer_id]
-	if len(new_customers) == len(customers):
-		return False
-	data["customers"] = new_customers
-	_write(data)
+	with _store.locked():
+		if not get_customer(customer_id):
+			return False
+		_store.apply(delete=[customer_id])
 	return True
+
+
+# SQLite backend (LAB_STORAGE_BACKEND=sqlite)
+
+def _sql_list_customers() -> List[Dict[str, Any]]:
+	rows = sqlite_store.connect().execute("SELECT * FROM customers ORDER BY id").fetchall()
+	return sqlite_store.rows_to_dicts(rows)
+
+
+def _sql_get_customer(customer_id: int) -> Optional[Dict[str, Any]]:
+	row = sqlite_store.connect().execute("SELECT * FROM customers WHERE id = ?", (customer_id,)).fetchone()
+	return sqlite_store.row_to_dict(row)
+
+
+def _sql_create_customer(name: str, organization: str, phone: str, address: str, note: str) -> int:
+	with sqlite_store.transaction() as conn:
+		customer_id = sqlite_store.next_id(conn, "customers")
+		conn.execute(
+			"INSERT INTO customers (id, name, organization, phone, address, note) VALUES (?, ?, ?, ?, ?, ?)",
+			(customer_id, name.strip(), organization.strip(), phone.strip(), address.strip(), note.strip()),
+		)
+	return customer_id
+
+
+def _sql_update_customer(customer_id: int, name: str, organization: str, phone: str, address: str, note: str) -> bool:
+	with sqlite_store.transaction() as conn:
+		cursor = conn.execute(
+			"UPDATE customers SET name = ?, organization = ?, phone = ?, address = ?, note = ? WHERE id = ?",
+			(name.strip(), organization.strip(), phone.strip(), address.strip(), note.strip(), customer_id),
+		)
+	return cursor.rowcount > 0
+
+
+def _sql_delete_customer(customer_id: int) -> bool:
+	with sqlite_store.transaction() as conn:
+		cursor = conn.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
+	return cursor.rowcount > 0
+
+
+if sqlite_store.use_sqlite():
+	list_customers = _sql_list_customers
+	get_customer = _sql_get_customer
+	create_customer = _sql_create_customer
+	update_customer = _sql_update_customer
+	delete_customer = _sql_delete_customer
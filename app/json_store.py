@@ -0,0 +1,954 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, FrozenSet, IO, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Type
+
+from . import metrics
+from .search_index import SearchIndex
+
+try:
+	import fcntl
+except ImportError:  # Windows
+	fcntl = None
+	import msvcrt
+
+DATA_DIR = os.environ.get("LAB_DATA_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+# Journaled mode: mutations are appended to "<file>.log" and folded back into
+# the snapshot by a background compaction once the log grows past the limit.
+JOURNAL_ENABLED = os.environ.get("LAB_JSON_JOURNAL", "").strip().lower() in ("1", "true", "yes", "on")
+JOURNAL_MAX_BYTES = int(os.environ.get("LAB_JSON_JOURNAL_MAX_BYTES", str(1024 * 1024)))
+
+# Group commit: mutations arriving within this many milliseconds of each
+# other (from different threads) share one durable write. 0 disables it.
+GROUP_COMMIT_MS = float(os.environ.get("LAB_JSON_GROUP_COMMIT_MS", "0"))
+
+_Stamp = Tuple[int, int, int]
+
+
+def _stat_stamp(path: str) -> Optional[_Stamp]:
+	try:
+		st = os.stat(path)
+	except FileNotFoundError:
+		return None
+	return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _lock_file(f: IO[bytes]) -> None:
+	"""Block until this process holds the exclusive lock on an open lock file."""
+	if fcntl is not None:
+		fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+		return
+	while True:
+		try:
+			msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+			return
+		except OSError:
+			# LK_LOCK gives up after ~10 s of retries; keep waiting.
+			time.sleep(0.01)
+
+
+def _unlock_file(f: IO[bytes]) -> None:
+	if fcntl is not None:
+		fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+	else:
+		f.seek(0)
+		msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _fsync_write(path: str, payload: bytes) -> None:
+	with open(path, "wb") as f:
+		f.write(payload)
+		f.flush()
+		os.fsync(f.fileno())
+
+
+def _sort_value(value: Any) -> Any:
+	# Sorted indexes hold one type per field (e.g. ISO date strings); a missing value sorts first
+	return "" if value is None else value
+
+
+_MISSING = object()
+
+
+class Record(Mapping[str, Any]):
+	"""Read-only record held in ``__slots__`` instead of a per-record dict.
+
+	Subclasses are made by ``record_type()``. A record reads like the dict
+	it was built from (``r["id"]``, ``r.get()``, ``dict(r)``, ``r.field`` in
+	templates) without a per-record hash table, and string values of the
+	``shared`` fields are interned so that a date or type repeated across
+	records is a single object. Keys outside ``fields`` go to a per-record
+	dict. Records are never changed in place: copy with ``dict(r)``, edit
+	the copy and ``apply()`` it.
+	"""
+
+	__slots__ = ("_extra",)
+	_fields: Tuple[str, ...] = ()
+	_field_set: FrozenSet[str] = frozenset()
+	_shared: FrozenSet[str] = frozenset()
+
+	def __init__(self, values: Mapping[str, Any]) -> None:
+		self._assign(values.items())
+
+	@classmethod
+	def from_pairs(cls, pairs: Iterable[Tuple[str, Any]]) -> "Record":
+		"""A record from (key, value) pairs, as given to a ``json.loads`` object_pairs_hook."""
+		record = cls.__new__(cls)
+		record._assign(pairs)
+		return record
+
+	def _assign(self, items: Iterable[Tuple[str, Any]]) -> None:
+		# Runs once per stored record on every load: keep lookups local
+		fields, shared, intern, set_field = self._field_set, self._shared, sys.intern, setattr
+		extra = None
+		for key, value in items:
+			if key in fields:
+				if key in shared and type(value) is str:
+					value = intern(value)
+				set_field(self, key, value)
+			else:
+				if extra is None:
+					extra = {}
+				extra[key] = value
+		self._extra = extra
+
+	def __getitem__(self, key: str) -> Any:
+		if key in self._field_set:
+			try:
+				return getattr(self, key)
+			except AttributeError:
+				raise KeyError(key) from None
+		if self._extra is not None and key in self._extra:
+			return self._extra[key]
+		raise KeyError(key)
+
+	def get(self, key: str, default: Any = None) -> Any:
+		if key in self._field_set:
+			return getattr(self, key, default)
+		return default if self._extra is None else self._extra.get(key, default)
+
+	def __contains__(self, key: object) -> bool:
+		if key in self._field_set:
+			return hasattr(self, key)
+		return self._extra is not None and key in self._extra
+
+	def __iter__(self) -> Iterator[str]:
+		for field in self._fields:
+			if hasattr(self, field):
+				yield field
+		if self._extra is not None:
+			yield from self._extra
+
+	def __len__(self) -> int:
+		return sum(1 for _ in self)
+
+	def to_dict(self) -> Dict[str, Any]:
+		values = {}
+		for field in self._fields:
+			value = getattr(self, field, _MISSING)
+			if value is not _MISSING:
+				values[field] = value
+		if self._extra is not None:
+			values.update(self._extra)
+		return values
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def record_type(name: str, fields: Iterable[str], shared: Iterable[str] = ()) -> Type[Record]:
+	"""A ``Record`` class with one slot per field; string values of ``shared`` fields are interned."""
+	fields = tuple(fields)
+	clashes = [field for field in fields if hasattr(Record, field)]
+	if clashes:
+		raise ValueError(f"Record fields clash with Record attributes: {clashes}")
+	return type(name, (Record,), {
+		"__slots__": fields,
+		"_fields": fields,
+		"_field_set": frozenset(fields),
+		"_shared": frozenset(shared),
+	})
+
+
+def _json_default(value: Any) -> Any:
+	if isinstance(value, Record):
+		return value.to_dict()
+	raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _Batch:
+	"""Mutations waiting for one group commit."""
+
+	__slots__ = ("entries", "opened", "done", "error")
+
+	def __init__(self) -> None:
+		self.entries: List[Dict[str, Any]] = []
+		self.opened = time.monotonic()
+		self.done = False
+		self.error: Optional[BaseException] = None
+
+
+class JsonStore:
+	"""A JSON document on disk, parsed once per worker and kept in memory.
+
+	The document holds one list of records (``collection``) identified by
+	``key``, plus top-level metadata such as ``next_id``. The parsed document
+	is reused until the snapshot or its journal changes on disk (e.g. another
+	gunicorn worker wrote it), so read-heavy pages do not re-parse the file on
+	every call. The returned document is shared and must be treated as
+	read-only; change it through ``apply()`` or ``write()``.
+
+	Each field listed in ``indexes`` gets a secondary index (value -> record
+	positions in collection order) that is kept in sync by every mutation,
+	so ``select()`` and ``count()`` on that field do not scan the collection.
+	Fields listed in ``sorted_indexes`` can be walked in value order with
+	``ordered()`` (range bounds found by bisection, then a slice), so a page
+	of records costs the same whatever the collection size; these indexes
+	are built on first use and then maintained by every mutation.
+	``search_fields`` (field -> ranking weight) adds a full-text index for
+	``search()``; it is built on the first search and then updated by each
+	mutation like the other indexes. With ``record_type`` (see
+	``record_type()``) the records are kept in memory as compact read-only
+	``Record`` objects instead of dicts.
+
+	Snapshots are always replaced atomically (temp file + ``os.replace``), so
+	a crash mid-write never leaves a truncated store behind. Writers from
+	different processes (gunicorn workers) are serialized by an advisory
+	lock on ``<file>.lock``; once it is held the cached document is checked
+	against the file's stamp and reloaded if another process changed it, so
+	a write never builds on stale data. Read-modify-write sequences such as
+	allocating ``next_id`` must run inside ``locked()``. With
+	``LAB_JSON_JOURNAL=1``, ``apply()`` appends one JSON line per mutation to
+	``<file>.log`` instead of rewriting the snapshot; the state is rebuilt
+	from snapshot + log on load, and the log is compacted into the snapshot
+	in a background thread once it exceeds ``LAB_JSON_JOURNAL_MAX_BYTES``.
+
+	With ``LAB_JSON_GROUP_COMMIT_MS`` (or ``group_commit_ms``) set, mutations
+	from concurrent threads that arrive within that window are made durable
+	by one write and acknowledged together; ``commit_stats`` counts commits,
+	batch sizes and commit latency.
+	"""
+
+	def __init__(
+		self,
+		path: str,
+		seed: Callable[[], Dict[str, Any]],
+		collection: str,
+		key: str = "id",
+		journal: Optional[bool] = None,
+		journal_max_bytes: Optional[int] = None,
+		indexes: Iterable[str] = (),
+		group_commit_ms: Optional[float] = None,
+		search_fields: Optional[Mapping[str, float]] = None,
+		sorted_indexes: Iterable[str] = (),
+		record_type: Optional[Type[Record]] = None,
+	) -> None:
+		self.path = path
+		self.name = os.path.splitext(os.path.basename(path))[0]
+		self.log_path = path + ".log"
+		self.lock_path = path + ".lock"
+		self.collection = collection
+		self.key = key
+		self.journal = JOURNAL_ENABLED if journal is None else journal
+		self.journal_max_bytes = JOURNAL_MAX_BYTES if journal_max_bytes is None else journal_max_bytes
+		self.indexes = tuple(indexes)
+		self.sorted_indexes = tuple(sorted_indexes)
+		self.group_commit_ms = GROUP_COMMIT_MS if group_commit_ms is None else group_commit_ms
+		self.record_type = record_type
+		self._seed = seed
+		self._lock = threading.RLock()
+		self._data: Optional[Dict[str, Any]] = None
+		# key -> slot, and field -> value -> sorted slots. A slot is the record's
+		# position in the collection, except that deleting a record does not
+		# shift the slots after it: the deleted slot goes to _deleted (sorted),
+		# a position is its slot minus the deleted slots before it, and all
+		# slots are renumbered once that list grows (see _remove_at).
+		self._positions: Dict[Any, int] = {}
+		self._groups: Dict[str, Dict[Any, List[int]]] = {}
+		self._deleted: List[int] = []
+		# field -> (values ascending, keys in the same order; ties ordered by key)
+		self._sorted: Dict[str, Tuple[List[Any], List[Any]]] = {}
+		# (indexed field, sorted field) -> indexed value -> the same, for those records only
+		self._grouped: Dict[Tuple[str, str], Dict[Any, Tuple[List[Any], List[Any]]]] = {}
+		self._search = SearchIndex(search_fields) if search_fields else None
+		self._search_ready = False
+		self._stamp: Optional[_Stamp] = None
+		self._log_stamp: Optional[_Stamp] = None
+		self._log_offset = 0
+		self._log_ino = 0
+		self._version_checked = 0.0
+		self._compacting = False
+		self._lock_file: Optional[IO[bytes]] = None
+		# Holders of locked() across all threads; a thread waiting for a group
+		# commit has released self._lock but is still counted.
+		self._lock_depth = 0
+		self._committed = threading.Condition(self._lock)
+		self._batch: Optional[_Batch] = None
+		self.commit_stats: Dict[str, float] = {
+			"commits": 0,
+			"mutations": 0,
+			"max_batch_size": 0,
+			"commit_seconds": 0.0,
+			"latency_seconds": 0.0,
+			"max_latency_seconds": 0.0,
+		}
+
+	def _ensure_file(self) -> None:
+		if not os.path.exists(self.path):
+			self._dump(self._seed())
+
+	def _dump(self, data: Dict[str, Any]) -> None:
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		payload = self._serialize(data)
+		tmp_path = f"{self.path}.{os.getpid()}.tmp"
+		_fsync_write(tmp_path, payload)
+		os.replace(tmp_path, self.path)
+		metrics.STORE_WRITES.inc(self.name)
+		metrics.STORE_WRITE_BYTES.inc(self.name, amount=len(payload))
+
+	def _serialize(self, data: Dict[str, Any]) -> bytes:
+		started = time.perf_counter()
+		records = data.get(self.collection)
+		if self.record_type is not None and records:
+			# The indenting (pure Python) encoder is several times slower when
+			# every record goes through default=; give it dicts
+			data = dict(data, **{self.collection: [r.to_dict() if isinstance(r, Record) else r for r in records]})
+		payload = json.dumps(data, ensure_ascii=False, indent=2, default=_json_default).encode("utf-8")
+		metrics.JSON_SERIALIZE_SECONDS.observe(time.perf_counter() - started, self.name)
+		return payload
+
+	# Reading
+
+	def read(self) -> Dict[str, Any]:
+		with self._lock:
+			stamp = _stat_stamp(self.path)
+			if stamp is None:
+				self._ensure_file()
+				stamp = _stat_stamp(self.path)
+			log_stamp = _stat_stamp(self.log_path) if self.journal else None
+			if self._data is None or stamp != self._stamp:
+				with open(self.path, "rb") as f:
+					raw = f.read()
+				started = time.perf_counter()
+				self._data = self._parse(raw)
+				metrics.JSON_PARSE_SECONDS.observe(time.perf_counter() - started, self.name)
+				metrics.STORE_READS.inc(self.name, "disk")
+				metrics.STORE_READ_BYTES.inc(self.name, amount=len(raw))
+				self._rebuild_indexes()
+				self._stamp = stamp
+				self._log_offset = 0
+				self._log_stamp = None
+			elif log_stamp == self._log_stamp:
+				metrics.STORE_READS.inc(self.name, "cache")
+			if log_stamp != self._log_stamp:
+				self._replay_log()
+			return self._data
+
+	def _compact(self, record: Mapping[str, Any]) -> Mapping[str, Any]:
+		if self.record_type is None or type(record) is self.record_type:
+			return record
+		return self.record_type(record)
+
+	def _compact_document(self, document: Dict[str, Any]) -> Dict[str, Any]:
+		"""A copy of the document with its records as ``record_type`` objects."""
+		records = document.get(self.collection)
+		if self.record_type is None or not records:
+			return document
+		return dict(document, **{self.collection: [self._compact(r) for r in records]})
+
+	def _parse(self, raw: bytes) -> Any:
+		if self.record_type is None:
+			return json.loads(raw)
+		# Records are built as they are parsed (objects carrying the key field):
+		# dicts converted afterwards would leave their freed memory scattered
+		# between the records, and the process would not shrink.
+		key, make = self.key, self.record_type
+
+		def build(pairs: List[Tuple[str, Any]]) -> Any:
+			# Stored records start with their key
+			if pairs and pairs[0][0] == key:
+				return make.from_pairs(pairs)
+			value = dict(pairs)
+			return make(value) if key in value else value
+
+		return json.loads(raw, object_pairs_hook=build)
+
+	def _replay_log(self) -> None:
+		"""Apply journal entries written since the last replay.
+
+		``_log_stamp`` is set to describe only the bytes consumed: taken before
+		reading, with the size replaced by ``_log_offset``, so that an append
+		made meanwhile (or the rest of a half-written batch) no longer matches
+		the file's stamp and is picked up by the next read.
+		"""
+		try:
+			f = open(self.log_path, "rb")
+		except FileNotFoundError:
+			self._log_offset = 0
+			self._log_stamp = None
+			return
+		with f:
+			st = os.fstat(f.fileno())
+			if self._log_offset and (st.st_size < self._log_offset or st.st_ino != self._log_ino):
+				# The log was compacted by another process; start over from the snapshot.
+				self.invalidate()
+				self.read()
+				return
+			self._log_ino = st.st_ino
+			f.seek(self._log_offset)
+			replayed = 0
+			started = time.perf_counter()
+			for line in f:
+				if not line.endswith(b"\n"):
+					break  # torn tail from a crash mid-append; ignored
+				try:
+					entry = self._parse(line)
+				except ValueError:
+					break
+				self._apply_entry(entry)
+				self._log_offset += len(line)
+				replayed += len(line)
+			self._log_stamp = (st.st_mtime_ns, self._log_offset, st.st_ino)
+			metrics.JSON_PARSE_SECONDS.observe(time.perf_counter() - started, self.name)
+			metrics.STORE_READS.inc(self.name, "journal")
+			metrics.STORE_READ_BYTES.inc(self.name, amount=replayed)
+
+	def version(self, max_age: float = 0.0) -> str:
+		"""Opaque token that changes whenever the stored document changes, in any process.
+
+		With ``max_age``, the files are stat'ed at most once per ``max_age``
+		seconds: in between, the token only reflects this process's own writes.
+		"""
+		with self._lock:
+			now = time.monotonic()
+			if self._data is None or now - self._version_checked >= max_age:
+				self.read()
+				self._version_checked = now
+			return f"{self._stamp}:{self._log_stamp}"
+
+	def get(self, key: Any) -> Optional[Dict[str, Any]]:
+		"""The record with this key, or None."""
+		with self._lock:
+			records = self.read().get(self.collection, [])
+			position = self._positions.get(key)
+			return self._at(records)(position) if position is not None else None
+
+	def select(self, field: str, value: Any, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+		"""Records whose indexed field equals value, in collection order, sliced [start:stop]."""
+		with self._lock:
+			records = self.read().get(self.collection, [])
+			positions = self._groups[field].get(value, [])
+			at = self._at(records)
+			return [at(i) for i in positions[start:stop]]
+
+	def count(self, field: str, value: Any) -> int:
+		with self._lock:
+			self.read()
+			return len(self._groups[field].get(value, []))
+
+	def ordered(
+		self,
+		field: str,
+		low: Any = None,
+		high: Any = None,
+		start: int = 0,
+		stop: Optional[int] = None,
+		descending: bool = False,
+	) -> Tuple[List[Dict[str, Any]], int]:
+		"""Records ordered by a sorted-index field (ties by key) with low <= value <= high.
+
+		Returns the slice [start:stop] of that ordering (reversed first when
+		descending) and the number of records in the range.
+		"""
+		if field not in self.sorted_indexes:
+			raise KeyError(field)
+		with self._lock:
+			records = self.read().get(self.collection, [])
+			values, keys = self._sorted_index(field)
+			lo = 0 if low is None else bisect.bisect_left(values, low)
+			hi = len(values) if high is None else bisect.bisect_right(values, high)
+			total = max(hi - lo, 0)
+			stop = total if stop is None else min(stop, total)
+			if start >= stop:
+				return [], total
+			if descending:
+				selected = keys[hi - stop:hi - start][::-1]
+			else:
+				selected = keys[lo + start:lo + stop]
+			at = self._at(records)
+			return [at(self._positions[key]) for key in selected], total
+
+	def scan_ordered(
+		self,
+		field: str,
+		where: Callable[[Dict[str, Any]], bool],
+		start: int = 0,
+		stop: Optional[int] = None,
+		low: Any = None,
+		high: Any = None,
+		descending: bool = False,
+	) -> List[Dict[str, Any]]:
+		"""Like ``ordered()`` but only records for which ``where`` is true; stops once ``stop`` are found.
+
+		Cheap for early pages of broad filters, where a match turns up every
+		few records.
+		"""
+		if field not in self.sorted_indexes:
+			raise KeyError(field)
+		with self._lock:
+			records = self.read().get(self.collection, [])
+			values, keys = self._sorted_index(field)
+			lo = 0 if low is None else bisect.bisect_left(values, low)
+			hi = len(values) if high is None else bisect.bisect_right(values, high)
+			walk = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+			at = self._at(records)
+			matches = []
+			for i in walk:
+				record = at(self._positions[keys[i]])
+				if where(record):
+					matches.append(record)
+					if stop is not None and len(matches) >= stop:
+						break
+			return matches[start:]
+
+	def keyset(
+		self,
+		field: str,
+		after: Optional[Tuple[Any, Any]] = None,
+		limit: int = 20,
+		descending: bool = False,
+		where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+		group: Optional[Tuple[str, Any]] = None,
+	) -> List[Dict[str, Any]]:
+		"""Up to ``limit`` records that follow the position ``after`` = (value, key) in (field, key) order.
+
+		The position is found by bisection, so a page costs the same however
+		deep it is; with ``where``, non-matching records are skipped. With
+		``group`` = (indexed field, value), only records with that value are
+		walked, in an ordering of their own, so a page of a small group costs
+		no more than a page of the whole collection.
+		"""
+		if field not in self.sorted_indexes or (group is not None and group[0] not in self.indexes):
+			raise KeyError(field if group is None else group[0])
+		with self._lock:
+			records = self.read().get(self.collection, [])
+			if group is None:
+				values, keys = self._sorted_index(field)
+			else:
+				values, keys = self._grouped_index(group[0], field).get(group[1], ([], []))
+			if after is None:
+				i = len(keys) if descending else 0
+			else:
+				value, key = after
+				lo = bisect.bisect_left(values, value)
+				hi = bisect.bisect_right(values, value, lo)
+				i = bisect.bisect_left(keys, key, lo, hi) if descending else bisect.bisect_right(keys, key, lo, hi)
+			walk = range(i - 1, -1, -1) if descending else range(i, len(keys))
+			at = self._at(records)
+			page = []
+			for j in walk:
+				record = at(self._positions[keys[j]])
+				if where is None or where(record):
+					page.append(record)
+					if len(page) >= limit:
+						break
+			return page
+
+	def search(
+		self,
+		query: str,
+		start: int = 0,
+		stop: Optional[int] = None,
+		field: Optional[str] = None,
+		value: Any = None,
+		allowed: Optional[Set[Any]] = None,
+	) -> Tuple[List[Dict[str, Any]], int]:
+		"""Best matches for a text query, sliced [start:stop], and the number of matches.
+
+		With ``field``, only records whose indexed field equals ``value`` are
+		searched; with ``allowed``, only records whose key is in that set.
+		"""
+		with self._lock:
+			records = self.read().get(self.collection, [])
+			if not self._search_ready:
+				self._search.build((r.get(self.key), r) for r in records)
+				self._search_ready = True
+			at = self._at(records)
+			if field is not None:
+				group = {at(i).get(self.key) for i in self._groups[field].get(value, [])}
+				allowed = group if allowed is None else group & allowed
+			keys, total = self._search.search(query, stop, allowed)
+			return [at(self._positions[key]) for key in keys[start:stop]], total
+
+	# Locking
+
+	@contextmanager
+	def locked(self) -> Iterator[Dict[str, Any]]:
+		"""Hold the cross-process write lock; yields the up-to-date document.
+
+		Reentrant within a thread, so ``apply()``/``write()`` can be called
+		inside the block.
+		"""
+		with self._lock:
+			if self._lock_file is None:
+				os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+				f = open(self.lock_path, "a+b")
+				try:
+					_lock_file(f)
+				except BaseException:
+					f.close()
+					raise
+				self._lock_file = f
+			self._lock_depth += 1
+			try:
+				yield self.read()
+			finally:
+				self._lock_depth -= 1
+				if self._lock_depth == 0 and self._batch is None:
+					f, self._lock_file = self._lock_file, None
+					try:
+						_unlock_file(f)
+					finally:
+						f.close()
+
+	# Indexes
+
+	def _rebuild_indexes(self) -> None:
+		self._renumber()
+		self._sorted = {}
+		self._grouped = {}
+		self._search_ready = False
+
+	def _renumber(self) -> None:
+		"""Rebuild the slot-based indexes so that slots equal positions again."""
+		records = self._data.get(self.collection, [])
+		self._positions = {r.get(self.key): i for i, r in enumerate(records)}
+		self._groups = {field: {} for field in self.indexes}
+		for field, groups in self._groups.items():
+			for i, r in enumerate(records):
+				groups.setdefault(r.get(field), []).append(i)
+		self._deleted = []
+
+	def _at(self, records: List[Dict[str, Any]]) -> Callable[[int], Dict[str, Any]]:
+		"""Record lookup by slot: a plain index unless deleted slots are pending renumbering."""
+		deleted = self._deleted
+		if not deleted:
+			return records.__getitem__
+		return lambda slot: records[slot - bisect.bisect_left(deleted, slot)]
+
+	def _sorted_index(self, field: str) -> Tuple[List[Any], List[Any]]:
+		index = self._sorted.get(field)
+		if index is None:
+			pairs = sorted((_sort_value(r.get(field)), r.get(self.key)) for r in self._data.get(self.collection, []))
+			index = self._sorted[field] = ([value for value, _ in pairs], [key for _, key in pairs])
+		return index
+
+	def _grouped_index(self, group_field: str, field: str) -> Dict[Any, Tuple[List[Any], List[Any]]]:
+		"""Per value of ``group_field``, its records' (values, keys) in (field, key) order."""
+		index = self._grouped.get((group_field, field))
+		if index is None:
+			buckets: Dict[Any, List[Tuple[Any, Any]]] = {}
+			for r in self._data.get(self.collection, []):
+				buckets.setdefault(r.get(group_field), []).append((_sort_value(r.get(field)), r.get(self.key)))
+			index = self._grouped[(group_field, field)] = {}
+			for group, pairs in buckets.items():
+				pairs.sort()
+				index[group] = ([value for value, _ in pairs], [key for _, key in pairs])
+		return index
+
+	@staticmethod
+	def _sorted_insert(values: List[Any], keys: List[Any], value: Any, key: Any) -> None:
+		lo = bisect.bisect_left(values, value)
+		i = bisect.bisect_left(keys, key, lo, bisect.bisect_right(values, value, lo))
+		values.insert(i, value)
+		keys.insert(i, key)
+
+	@staticmethod
+	def _sorted_discard(values: List[Any], keys: List[Any], value: Any, key: Any) -> None:
+		lo = bisect.bisect_left(values, value)
+		hi = bisect.bisect_right(values, value, lo)
+		i = bisect.bisect_left(keys, key, lo, hi)
+		if i < hi and keys[i] == key:
+			del values[i]
+			del keys[i]
+
+	def _index_add(self, position: int, record: Dict[str, Any]) -> None:
+		key = record.get(self.key)
+		if self._search_ready:
+			self._search.add(key, record)
+		for field, (values, keys) in self._sorted.items():
+			self._sorted_insert(values, keys, _sort_value(record.get(field)), key)
+		for (group_field, field), index in self._grouped.items():
+			values, keys = index.setdefault(record.get(group_field), ([], []))
+			self._sorted_insert(values, keys, _sort_value(record.get(field)), key)
+		for field, groups in self._groups.items():
+			group = groups.setdefault(record.get(field), [])
+			if not group or group[-1] < position:
+				group.append(position)
+			else:
+				bisect.insort(group, position)
+
+	def _index_remove(self, position: int, record: Dict[str, Any]) -> None:
+		key = record.get(self.key)
+		if self._search_ready:
+			self._search.remove(key)
+		for field, (values, keys) in self._sorted.items():
+			self._sorted_discard(values, keys, _sort_value(record.get(field)), key)
+		for (group_field, field), index in self._grouped.items():
+			group = index.get(record.get(group_field))
+			if group is not None:
+				self._sorted_discard(group[0], group[1], _sort_value(record.get(field)), key)
+				if not group[1]:
+					del index[record.get(group_field)]
+		for field, groups in self._groups.items():
+			group = groups.get(record.get(field))
+			if group:
+				i = bisect.bisect_left(group, position)
+				if i < len(group) and group[i] == position:
+					del group[i]
+				if not group:
+					del groups[record.get(field)]
+
+	def _apply_entry(self, entry: Dict[str, Any]) -> None:
+		if "document" in entry:
+			self._data = self._compact_document(entry["document"])
+			self._rebuild_indexes()
+		records = self._data.setdefault(self.collection, [])
+		for record in entry.get("put", []):
+			record = self._compact(record)
+			position = self._positions.get(record.get(self.key))
+			if position is None:
+				position = len(records) + len(self._deleted)
+				self._positions[record.get(self.key)] = position
+				records.append(record)
+			else:
+				i = position - bisect.bisect_left(self._deleted, position)
+				self._index_remove(position, records[i])
+				records[i] = record
+			self._index_add(position, record)
+		for key in entry.get("delete", []):
+			position = self._positions.pop(key, None)
+			if position is not None:
+				self._remove_at(records, position)
+		self._data.update(entry.get("meta", {}))
+
+	def _remove_at(self, records: List[Dict[str, Any]], position: int) -> None:
+		"""Remove the record at this slot.
+
+		The slots after it are not shifted: the slot joins ``_deleted`` and
+		lookups subtract the deleted slots before theirs. Once those outnumber
+		1/16 of the collection, all slots are renumbered in one O(N) pass, so
+		a delete costs O(log N) amortized.
+		"""
+		i = position - bisect.bisect_left(self._deleted, position)
+		self._index_remove(position, records[i])
+		del records[i]
+		bisect.insort(self._deleted, position)
+		if len(self._deleted) > 64 + len(records) // 16:
+			self._renumber()
+
+	# Writing
+
+	def apply(
+		self,
+		put: Iterable[Dict[str, Any]] = (),
+		delete: Iterable[Any] = (),
+		meta: Optional[Dict[str, Any]] = None,
+	) -> None:
+		"""Insert or replace records (matched by key), delete keys and set metadata.
+
+		One call is one atomic mutation: a single journal line, or a single
+		snapshot rewrite when journaling is off. With group commit enabled the
+		mutation is visible in memory at once, but the call returns only after
+		the batch it joined is durable; while waiting, the store lock is
+		released so that other threads can add to the batch.
+		"""
+		entry: Dict[str, Any] = {}
+		put = list(put)
+		delete = list(delete)
+		if put:
+			entry["put"] = put
+		if delete:
+			entry["delete"] = delete
+		if meta:
+			entry["meta"] = meta
+		with self.locked():
+			try:
+				self._apply_entry(entry)
+			except Exception:
+				self.invalidate()
+				raise
+			if self.group_commit_ms > 0:
+				self._join_batch(entry)
+			else:
+				started = time.perf_counter()
+				self._commit([entry])
+				self._record_commit(1, time.perf_counter() - started, time.perf_counter() - started)
+
+	def write(self, data: Dict[str, Any]) -> None:
+		"""Replace the whole document."""
+		with self.locked():
+			self._flush_batch()
+			if self.journal:
+				# Logged like any other mutation so that replaying the journal over
+				# a newer snapshot (crash during compaction) stays correct.
+				self._apply_entry({"document": data})
+				self._commit([{"document": data}])
+				return
+			try:
+				self._dump(data)
+			except Exception:
+				self.invalidate()
+				raise
+			self._data = self._compact_document(data)
+			self._rebuild_indexes()
+			self._stamp = _stat_stamp(self.path)
+
+	def _commit(self, entries: List[Dict[str, Any]]) -> None:
+		"""Make entries that are already applied in memory durable (one fsync)."""
+		try:
+			if self.journal:
+				self._append(entries)
+			else:
+				self._dump(self._data)
+				self._stamp = _stat_stamp(self.path)
+		except Exception:
+			self.invalidate()
+			raise
+
+	def _append(self, entries: List[Dict[str, Any]]) -> None:
+		started = time.perf_counter()
+		payload = b"".join((json.dumps(entry, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8") for entry in entries)
+		metrics.JSON_SERIALIZE_SECONDS.observe(time.perf_counter() - started, self.name)
+		with open(self.log_path, "ab") as f:
+			if f.tell() != self._log_offset:
+				# Complete entries this process has not replayed yet were committed
+				# first: apply them, then ours again so memory follows the log order
+				# (entries are idempotent). Only a final line without its newline is
+				# a torn tail from a crash, dropped before appending after it.
+				self._replay_log()
+				for entry in entries:
+					self._apply_entry(entry)
+				if os.fstat(f.fileno()).st_size != self._log_offset:
+					f.truncate(self._log_offset)
+			f.write(payload)
+			f.flush()
+			os.fsync(f.fileno())
+			st = os.fstat(f.fileno())
+		self._log_ino = st.st_ino
+		self._log_offset += len(payload)
+		self._log_stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+		metrics.STORE_WRITES.inc(self.name)
+		metrics.STORE_WRITE_BYTES.inc(self.name, amount=len(payload))
+		if self._log_offset > self.journal_max_bytes and not self._compacting:
+			self._compacting = True
+			threading.Thread(target=self.compact, name=f"compact-{os.path.basename(self.path)}", daemon=True).start()
+
+	# Group commit
+
+	def _join_batch(self, entry: Dict[str, Any]) -> None:
+		"""Add an applied entry to the open batch and wait until that batch is durable.
+
+		The thread that opens a batch leads it: it waits for the commit window,
+		then writes every entry that arrived meanwhile with a single fsync and
+		wakes the others. The file lock stays held until then, so no other
+		process can read the not yet durable state.
+		"""
+		batch = self._batch
+		leader = batch is None
+		if leader:
+			batch = self._batch = _Batch()
+		batch.entries.append(entry)
+		if leader:
+			deadline = batch.opened + self.group_commit_ms / 1000
+			while not batch.done and time.monotonic() < deadline:
+				self._committed.wait(deadline - time.monotonic())
+			self._flush_batch()
+		else:
+			self._committed.wait_for(lambda: batch.done)
+		if batch.error is not None:
+			raise batch.error
+
+	def _flush_batch(self) -> None:
+		"""Commit the open batch now, if there is one, and wake its waiters."""
+		batch = self._batch
+		if batch is None:
+			return
+		self._batch = None
+		started = time.perf_counter()
+		try:
+			self._commit(batch.entries)
+		except Exception as exc:
+			batch.error = exc
+		finished = time.perf_counter()
+		batch.done = True
+		self._committed.notify_all()
+		if batch.error is None:
+			self._record_commit(len(batch.entries), finished - started, time.monotonic() - batch.opened)
+
+	def _record_commit(self, size: int, commit_seconds: float, latency_seconds: float) -> None:
+		stats = self.commit_stats
+		stats["commits"] += 1
+		stats["mutations"] += size
+		stats["max_batch_size"] = max(stats["max_batch_size"], size)
+		stats["commit_seconds"] += commit_seconds
+		stats["latency_seconds"] += latency_seconds
+		stats["max_latency_seconds"] = max(stats["max_latency_seconds"], latency_seconds)
+		metrics.COMMIT_BATCH_SIZE.observe(size, self.name)
+		metrics.COMMIT_SECONDS.observe(latency_seconds, self.name)
+
+	def compact(self) -> None:
+		"""Fold the journal into a fresh snapshot without blocking writers for the dump."""
+		try:
+			with self.locked() as data:
+				self._flush_batch()
+				payload = self._serialize(data)
+				stamp = self._stamp
+				offset = self._log_offset
+			tmp_path = f"{self.path}.{os.getpid()}.tmp"
+			_fsync_write(tmp_path, payload)
+			with self.locked():
+				if self._stamp != stamp or self._log_offset < offset:
+					# Someone else replaced the snapshot meanwhile; ours is stale.
+					os.remove(tmp_path)
+					return
+				# Entries appended while the snapshot was being written survive in the new log.
+				tail = b""
+				if os.path.exists(self.log_path):
+					with open(self.log_path, "rb") as f:
+						f.seek(offset)
+						tail = f.read(self._log_offset - offset)
+				tmp_log = f"{self.log_path}.{os.getpid()}.tmp"
+				_fsync_write(tmp_log, tail)
+				# A crash between these two renames replays the old log over the
+				# new snapshot, which is harmless: every entry is idempotent.
+				os.replace(tmp_path, self.path)
+				os.replace(tmp_log, self.log_path)
+				metrics.STORE_WRITES.inc(self.name)
+				metrics.STORE_WRITE_BYTES.inc(self.name, amount=len(payload) + len(tail))
+				self._stamp = _stat_stamp(self.path)
+				self._log_offset = len(tail)
+				self._log_stamp = _stat_stamp(self.log_path)
+				self._log_ino = self._log_stamp[2]
+		finally:
+			self._compacting = False
+
+	def invalidate(self) -> None:
+		"""Drop the cached document so the next read re-parses the file."""
+		with self._lock:
+			self._data = None
+			self._positions = {}
+			self._groups = {}
+			self._deleted = []
+			self._sorted = {}
+			self._grouped = {}
+			self._search_ready = False
+			self._stamp = None
+			self._log_stamp = None
+			self._log_offset = 0
+			self._log_ino = 0
@@ -0,0 +1,49 @@
+"""Leveled, sampled, structured (logfmt) logging.
+
+``LAB_LOG_LEVEL`` sets the level of the ``app`` loggers (default INFO) and
+``LAB_LOG_SAMPLE`` the fraction of DEBUG/INFO events that are kept (default
+1.0); warnings and errors are never sampled out.
+"""
+
+import logging
+import os
+import random
+import sys
+from typing import Any, Optional
+
+LOG_LEVEL = os.environ.get("LAB_LOG_LEVEL", "INFO").strip().upper()
+LOG_SAMPLE = float(os.environ.get("LAB_LOG_SAMPLE", "1.0"))
+
+_configured = False
+
+
+def configure_logging() -> None:
+	"""Send ``app.*`` loggers to stderr as ``time level logger event key=value ...`` lines."""
+	global _configured
+	if _configured:
+		return
+	handler = logging.StreamHandler(sys.stderr)
+	handler.setFormatter(logging.Formatter("ts=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"))
+	logger = logging.getLogger("app")
+	logger.addHandler(handler)
+	logger.setLevel(LOG_LEVEL)
+	logger.propagate = False
+	_configured = True
+
+
+def _format(value: Any) -> str:
+	text = str(value)
+	if not text or any(c in text for c in ' "=\n'):
+		return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+	return text
+
+
+def log_event(logger: logging.Logger, level: int, event: str, sample: Optional[float] = None, exc_info: bool = False, **fields: Any) -> None:
+	"""Log ``event=<event> key=value ...``; below WARNING only a ``sample`` fraction is kept."""
+	if not logger.isEnabledFor(level):
+		return
+	rate = LOG_SAMPLE if sample is None else sample
+	if level < logging.WARNING and rate < 1.0 and random.random() >= rate:
+		return
+	message = " ".join([f"event={_format(event)}"] + [f"{key}={_format(value)}" for key, value in fields.items()])
+	logger.log(level, message, exc_info=exc_info)
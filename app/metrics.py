@@ -0,0 +1,170 @@
+"""In-process metrics in Prometheus text format.
+
+Counters and histograms are kept per worker process (each gunicorn worker
+reports its own numbers at ``/metrics``). ``init_app()`` adds request
+latency and template render timing to the Flask app; JsonStore records its
+reads, writes and JSON parse/serialize time here.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from flask import Flask, g, request, before_render_template, template_rendered
+
+from .log import log_event
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+	pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+	if extra:
+		pairs.append(extra)
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+	return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.label_names = tuple(labels)
+		_registry.append(self)
+
+	def samples(self) -> List[str]:
+		raise NotImplementedError
+
+	def render(self) -> str:
+		lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+		return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+		super().__init__(name, help, labels)
+		self._values: Dict[Tuple[str, ...], float] = {}
+
+	def inc(self, *label_values: str, amount: float = 1) -> None:
+		with _lock:
+			self._values[label_values] = self._values.get(label_values, 0) + amount
+
+	def samples(self) -> List[str]:
+		with _lock:
+			values = sorted(self._values.items())
+		return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+		super().__init__(name, help, labels)
+		self.buckets = tuple(buckets)
+		# label values -> [count per bucket (non-cumulative, last is +Inf), sum]
+		self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value: float, *label_values: str) -> None:
+		with _lock:
+			entry = self._values.get(label_values)
+			if entry is None:
+				entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+			counts, total = entry
+			for i, bound in enumerate(self.buckets):
+				if value <= bound:
+					counts[i] += 1
+					break
+			else:
+				counts[-1] += 1
+			total[0] += value
+
+	def samples(self) -> List[str]:
+		with _lock:
+			values = sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+		lines = []
+		for key, counts, total in values:
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float("inf"),), counts):
+				cumulative += count
+				le = "+Inf" if bound == float("inf") else _number(bound)
+				bucket = f'le="{le}"'
+				lines.append(f"{self.name}_bucket{_labels(self.label_names, key, bucket)} {cumulative}")
+			lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+			lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+		return lines
+
+
+REQUEST_SECONDS = Histogram("lab_request_duration_seconds", "Request latency, until the response body is sent", ["endpoint", "method"])
+REQUESTS = Counter("lab_requests_total", "Requests by endpoint and status", ["endpoint", "method", "status"])
+TEMPLATE_SECONDS = Histogram("lab_template_render_seconds", "Template render time", ["template"])
+STORE_READS = Counter("lab_store_reads_total", "Store reads, served from the in-memory cache or loaded from disk", ["store", "source"])
+STORE_READ_BYTES = Counter("lab_store_read_bytes_total", "Bytes of snapshot and journal read from disk", ["store"])
+STORE_WRITES = Counter("lab_store_writes_total", "Durable store writes (snapshot rewrites or journal appends)", ["store"])
+STORE_WRITE_BYTES = Counter("lab_store_write_bytes_total", "Bytes written by store writes", ["store"])
+JSON_PARSE_SECONDS = Histogram("lab_json_parse_seconds", "Time spent parsing store documents", ["store"])
+JSON_SERIALIZE_SECONDS = Histogram("lab_json_serialize_seconds", "Time spent serializing store documents and journal entries", ["store"])
+COMMIT_BATCH_SIZE = Histogram("lab_store_commit_batch_size", "Mutations made durable per store write", ["store"], buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+COMMIT_SECONDS = Histogram("lab_store_commit_seconds", "Time from a mutation to its durable acknowledgement", ["store"])
+
+
+def render() -> str:
+	"""All metrics in Prometheus text exposition format."""
+	return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def init_app(app: Flask) -> None:
+	"""Time every request and template render of the app."""
+
+	@app.before_request
+	def _start_timer() -> None:
+		g.metrics_started = time.perf_counter()
+
+	@app.after_request
+	def _observe_request(response):
+		started = g.get("metrics_started")
+		if started is None:
+			return response
+		endpoint = request.endpoint or "unmatched"
+		method = request.method
+		status = str(response.status_code)
+
+		def observe() -> None:
+			elapsed = time.perf_counter() - started
+			REQUEST_SECONDS.observe(elapsed, endpoint, method)
+			REQUESTS.inc(endpoint, method, status)
+			log_event(logger, logging.DEBUG, "request", endpoint=endpoint, method=method, status=status, ms=round(elapsed * 1000, 1))
+
+		if response.is_streamed:
+			# Streamed responses (CSV/XLSX exports) finish when the body is closed
+			response.call_on_close(observe)
+		else:
+			observe()
+		return response
+
+	def _template_started(sender, template, context, **extra) -> None:
+		g.setdefault("template_started", []).append(time.perf_counter())
+
+	def _template_finished(sender, template, context, **extra) -> None:
+		started = g.get("template_started")
+		if started:
+			TEMPLATE_SECONDS.observe(time.perf_counter() - started.pop(), template.name or "?")
+
+	before_render_template.connect(_template_started, app, weak=False)
+	template_rendered.connect(_template_finished, app, weak=False)
@@ -0,0 +1,218 @@
+"""Opt-in request profiling and automatic slow-request capture.
+
+An admin can run any request under cProfile by adding ``?_profile=1`` or
+the ``X-Lab-Profile: 1`` header; the response then carries an
+``X-Lab-Profile-Id`` header. One request per worker is profiled at a time
+(Python 3.12+ allows a single active profiler); a request asking while
+another is profiled runs unprofiled and gets ``X-Lab-Profile: busy``.
+Independently, a background sampler records the call stacks of requests
+that run longer than a quarter of ``LAB_SLOW_REQUEST_MS`` (default 1000,
+0 disables), and keeps them if the request ends up slower than the
+threshold. The latest captures of this
+worker are kept in memory and listed at ``/admin/profiles``.
+"""
+
+import collections
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from flask import Flask, g, request, session
+
+from .auth import current_principal
+
+SLOW_REQUEST_MS = float(os.environ.get("LAB_SLOW_REQUEST_MS", "1000"))
+SAMPLE_INTERVAL_MS = float(os.environ.get("LAB_PROFILE_SAMPLE_MS", "10"))
+MAX_CAPTURES = 50
+STACK_DEPTH = 40
+TOP_STACKS = 20
+TOP_FUNCTIONS = 40
+
+_captures: Deque[Dict[str, Any]] = collections.deque(maxlen=MAX_CAPTURES)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+# Held while a request runs under cProfile
+_profiling = threading.Lock()
+
+
+def list_captures() -> List[Dict[str, Any]]:
+	"""Captured profiles of this worker, newest first."""
+	with _lock:
+		return list(reversed(_captures))
+
+
+def get_capture(capture_id: int) -> Optional[Dict[str, Any]]:
+	with _lock:
+		return next((c for c in _captures if c["id"] == capture_id), None)
+
+
+def _request_info() -> Dict[str, Any]:
+	return {
+		"method": request.method,
+		"path": request.full_path.rstrip("?"),
+		"endpoint": request.endpoint or "",
+		"user": session.get("user_id") or "",
+	}
+
+
+def _store_capture(kind: str, info: Dict[str, Any], duration: float, status: int, report: str = "", stacks: Optional[List[Tuple[int, str]]] = None) -> int:
+	with _lock:
+		capture_id = next(_ids)
+		_captures.append(dict(
+			info,
+			id=capture_id,
+			kind=kind,
+			time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+			status=status,
+			duration_ms=round(duration * 1000, 1),
+			report=report,
+			stacks=stacks or [],
+		))
+	return capture_id
+
+
+def _format_stack(frame: Any) -> str:
+	lines = []
+	while frame is not None and len(lines) < STACK_DEPTH:
+		code = frame.f_code
+		lines.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+		frame = frame.f_back
+	return "\n".join(reversed(lines))
+
+
+class _Sampler:
+	"""Samples the stacks of long-running requests from a background thread."""
+
+	def __init__(self, start_after: float, interval: float) -> None:
+		self.start_after = start_after
+		self.interval = interval
+		self.active: Dict[int, Tuple[float, collections.Counter]] = {}
+		self.pid = 0
+		self._lock = threading.Lock()
+
+	def _ensure_running(self) -> None:
+		# Started lazily, and again in each forked worker
+		if self.pid != os.getpid():
+			self.pid = os.getpid()
+			self.active = {}
+			threading.Thread(target=self._run, name="slow-request-sampler", daemon=True).start()
+
+	def begin(self) -> None:
+		with self._lock:
+			self._ensure_running()
+			self.active[threading.get_ident()] = (time.monotonic(), collections.Counter())
+
+	def end(self) -> collections.Counter:
+		with self._lock:
+			entry = self.active.pop(threading.get_ident(), None)
+		return entry[1] if entry else collections.Counter()
+
+	def _run(self) -> None:
+		while True:
+			time.sleep(self.interval)
+			now = time.monotonic()
+			with self._lock:
+				due = [(ident, samples) for ident, (started, samples) in self.active.items() if now - started >= self.start_after]
+			if not due:
+				continue
+			frames = sys._current_frames()
+			for ident, samples in due:
+				frame = frames.get(ident)
+				if frame is not None:
+					samples[_format_stack(frame)] += 1
+
+
+_sampler = _Sampler(start_after=SLOW_REQUEST_MS / 4000, interval=SAMPLE_INTERVAL_MS / 1000)
+
+
+def _profile_requested() -> bool:
+	if request.args.get("_profile") != "1" and request.headers.get("X-Lab-Profile") != "1":
+		return False
+	principal = current_principal()
+	return bool(principal and principal.is_admin)
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+	"""An enabled profiler holding _profiling, or None if profiling is already active."""
+	if not _profiling.acquire(blocking=False):
+		return None
+	profiler = cProfile.Profile()
+	try:
+		profiler.enable()
+	except ValueError:  # "Another profiling tool is already active" (Python 3.12+)
+		_profiling.release()
+		return None
+	return profiler
+
+
+def _stop_profiler(profiler: cProfile.Profile) -> None:
+	profiler.disable()
+	_profiling.release()
+
+
+def _profile_report(profiler: cProfile.Profile) -> str:
+	output = io.StringIO()
+	stats = pstats.Stats(profiler, stream=output)
+	stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+	return output.getvalue()
+
+
+def init_app(app: Flask) -> None:
+	"""Enable the admin profiling flag and slow-request capture for the app."""
+
+	@app.before_request
+	def _start_profiling() -> None:
+		g.profile_started = time.perf_counter()
+		if SLOW_REQUEST_MS > 0:
+			_sampler.begin()
+		if _profile_requested():
+			g.profiler = _start_profiler()
+			g.profile_busy = g.profiler is None
+
+	@app.after_request
+	def _finish_profiling(response):
+		started = g.get("profile_started")
+		if started is None:
+			return response
+		g.profile_handled = True
+		profiler = g.pop("profiler", None)
+		info = _request_info()
+		status = response.status_code
+
+		def finish() -> Optional[int]:
+			duration = time.perf_counter() - started
+			samples = _sampler.end() if SLOW_REQUEST_MS > 0 else None
+			if profiler is not None:
+				_stop_profiler(profiler)
+				return _store_capture("profile", info, duration, status, report=_profile_report(profiler))
+			if samples is not None and duration * 1000 >= SLOW_REQUEST_MS:
+				return _store_capture("slow", info, duration, status, stacks=[(count, stack) for stack, count in samples.most_common(TOP_STACKS)])
+			return None
+
+		if response.is_streamed:
+			# The body of a streamed export is produced after this hook returns
+			response.call_on_close(finish)
+		else:
+			capture_id = finish()
+			if capture_id is not None and profiler is not None:
+				response.headers["X-Lab-Profile-Id"] = str(capture_id)
+		if g.get("profile_busy"):
+			response.headers["X-Lab-Profile"] = "busy"
+		return response
+
+	@app.teardown_request
+	def _abandon_profiling(exc: Optional[BaseException]) -> None:
+		# Requests that never reached after_request must not stay in the sampler
+		if g.get("profile_started") is not None and not g.get("profile_handled"):
+			if SLOW_REQUEST_MS > 0:
+				_sampler.end()
+			profiler = g.pop("profiler", None)
+			if profiler is not None:
+				_stop_profiler(profiler)
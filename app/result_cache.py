@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+
+class ResultCache:
+	"""Bounded in-memory cache of result lists, keyed by token.
+
+	Entries expire after ``ttl`` seconds and the least recently used entries
+	are evicted once there are more than ``max_entries`` of them or they hold
+	more than ``max_items`` records in total. The cache is per process, so
+	callers must be able to recompute a result that is missing.
+	"""
+
+	def __init__(self, ttl: float = 600, max_entries: int = 32, max_items: int = 500_000) -> None:
+		self.ttl = ttl
+		self.max_entries = max_entries
+		self.max_items = max_items
+		self._lock = threading.Lock()
+		self._entries: "OrderedDict[str, Tuple[float, Any, List[Any]]]" = OrderedDict()
+		self._items = 0
+
+	def put(self, token: str, items: List[Any], meta: Any = None) -> None:
+		with self._lock:
+			self._discard(token)
+			if len(items) > self.max_items:
+				return
+			self._entries[token] = (time.monotonic() + self.ttl, meta, items)
+			self._items += len(items)
+			self._evict()
+
+	def get(self, token: str) -> Optional[Tuple[List[Any], Any]]:
+		"""Return (items, meta) for a live token, or None if missing or expired."""
+		with self._lock:
+			entry = self._entries.get(token)
+			if entry is None:
+				return None
+			expires_at, meta, items = entry
+			if expires_at < time.monotonic():
+				self._discard(token)
+				return None
+			self._entries.move_to_end(token)
+			return items, meta
+
+	def pop(self, token: str) -> None:
+		with self._lock:
+			self._discard(token)
+
+	def _discard(self, token: str) -> None:
+		entry = self._entries.pop(token, None)
+		if entry is not None:
+			self._items -= len(entry[2])
+
+	def _evict(self) -> None:
+		now = time.monotonic()
+		for token in [t for t, (expires_at, _, _) in self._entries.items() if expires_at < now]:
+			self._discard(token)
+		while self._entries and (len(self._entries) > self.max_entries or self._items > self.max_items):
+			self._discard(next(iter(self._entries)))
@@ -1,13 +1,25 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+import base64
+import codecs
+import json
+import logging
+import re
+from datetime import datetime
 
-from .auth import login_required, verify_credentials, admin_required, permission_required
+from flask import Blueprint, Response, render_template, request, redirect, url_for, session, flash, jsonify
+
+from .auth import login_required, verify_credentials, admin_required, permission_required, issue_claims
 from .users_store import load_users, create_user, delete_user, DEFAULT_SECTIONS
 from .customers_store import list_customers, create_customer, delete_customer, get_customer, update_customer
-from .samples_store import list_samples, list_samples_paginated, create_sample, delete_sample, get_sample, update_sample, import_samples_from_csv, export_samples_to_excel, save_filtered_samples_to_temp, load_filtered_samples_from_temp, cleanup_temp_file
-from .closed_samples_store import list_closed_samples, create_closed_sample, delete_closed_sample, export_closed_samples_to_excel
+from .samples_store import KEYSET_SORTS as SAMPLE_KEYSET_SORTS, count_samples, list_samples_after, list_samples, list_samples_paginated, search_samples, create_sample, delete_sample, get_sample, update_sample, import_samples_from_stream, export_samples_csv_stream, iter_samples_csv, save_filtered_samples, load_filtered_samples, discard_filtered_samples
+from .closed_samples_store import SORT_FIELDS as CLOSED_SORT_FIELDS, list_closed_samples_paginated, create_closed_sample, delete_closed_sample, export_closed_samples_xlsx_stream
+from .log import log_event
+from .search_index import fold
+from .sqlite_store import SAMPLE_COLUMNS
+from . import metrics, profiling
 
 
 pages = Blueprint("pages", __name__)
+logger = logging.getLogger(__name__)
 
 
 @pages.route("/", methods=["GET"])
@@ -31,6 +43,7 @@ def login():
 		if verify_credentials(username, password):
 			session["user_id"] = username
 			session["username"] = username
+			issue_claims(username)
 			return redirect(url_for("pages.index"))
 		flash("Sai tên đăng nhập hoặc mật khẩu", "danger")
 	return render_template("login.html")
@@ -142,6 +155,26 @@ def customers_update(customer_id: int):
 
 
 # Samples management (permission: receiving)
+def _date_arg(name: str) -> str:
+	"""A YYYY-MM-DD query parameter, or '' when it is missing or malformed."""
+	value = request.args.get(name, '').strip()
+	try:
+		datetime.strptime(value, "%Y-%m-%d")
+	except ValueError:
+		return ''
+	return value
+
+
+def _attachment(filename: str) -> str:
+	"""Content-Disposition for a download: an ASCII filename plus the UTF-8 one (RFC 6266).
+
+	Header values must be latin-1, so Vietnamese names are folded for ``filename``.
+	"""
+	from urllib.parse import quote
+	fallback = re.sub(r'[^A-Za-z0-9\-_\.]', '_', fold(filename))
+	return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
 @pages.route("/receiving", methods=["GET"]) 
 @permission_required("receiving")
 def samples_list():
@@ -149,12 +182,17 @@ def samples_list():
 	page = int(request.args.get('page', 1))
 	per_page = int(request.args.get('per_page', 20))
 	customer_id = request.args.get('customer_id', '')
+	query = request.args.get('q', '').strip()
+	date_from, date_to = _date_arg('date_from'), _date_arg('date_to')
 	
 	# Convert customer_id to int if provided
 	customer_id = int(customer_id) if customer_id and customer_id.isdigit() else None
 	
-	# Get paginated samples
-	samples, total_pages, total_count = list_samples_paginated(page, per_page, customer_id)
+	# Get paginated samples (search results are ranked best first)
+	if query:
+		samples, total_pages, total_count = search_samples(query, page, per_page, customer_id, date_from, date_to)
+	else:
+		samples, total_pages, total_count = list_samples_paginated(page, per_page, customer_id, date_from, date_to)
 	customers = list_customers()
 	
 	# Create customer lookup for display
@@ -168,7 +206,10 @@ def samples_list():
 		total_pages=total_pages,
 		total_count=total_count,
 		per_page=per_page,
-		selected_customer_id=customer_id
+		selected_customer_id=customer_id,
+		query=query,
+		date_from=date_from,
+		date_to=date_to
 	)
 
 
@@ -246,16 +287,8 @@ def samples_import():
 		return redirect(url_for("pages.samples_list"))
 	
 	try:
-		# Try different encodings for Vietnamese
-		try:
-			csv_content = file.read().decode('utf-8-sig')
-		except UnicodeDecodeError:
-			try:
-				csv_content = file.read().decode('utf-8')
-			except UnicodeDecodeError:
-				csv_content = file.read().decode('cp1252')
-		
-		success_count, errors = import_samples_from_csv(csv_content)
+		all_or_nothing = request.form.get("all_or_nothing") == "1"
+		success_count, errors = import_samples_from_stream(file.stream, all_or_nothing=all_or_nothing)
 		
 		if success_count > 0:
 			flash(f"Đã import thành công {success_count} mẫu", "success")
@@ -315,22 +348,16 @@ def samples_template():
 @pages.route("/receiving/export")
 @permission_required("receiving")
 def samples_export():
-	from flask import Response
-	
 	# Get filter parameters
 	customer_id = request.args.get('customer_id', '')
-	print(f"DEBUG: Received customer_id: {customer_id}")
-	print(f"DEBUG: Request args: {dict(request.args)}")
 	customer_id = int(customer_id) if customer_id and customer_id.isdigit() else None
-	print(f"DEBUG: Parsed customer_id: {customer_id}")
+	date_from, date_to = _date_arg('date_from'), _date_arg('date_to')
 	
 	# Export samples to Excel format
 	try:
-		csv_content = export_samples_to_excel(customer_id)
-		print(f"DEBUG: CSV content length: {len(csv_content)}")
-		print(f"DEBUG: CSV content preview: {csv_content[:200]}...")
+		csv_stream = export_samples_csv_stream(customer_id, date_from, date_to)
 	except Exception as e:
-		print(f"DEBUG: Error in export_samples_to_excel: {e}")
+		log_event(logger, logging.ERROR, "samples_export_failed", exc_info=True, customer_id=customer_id)
 		flash(f"Lỗi xuất dữ liệu: {str(e)}", "danger")
 		return redirect(url_for("pages.samples_list"))
 	
@@ -341,7 +368,6 @@ def samples_export():
 		customer_name = customer_lookup.get(customer_id, f"KhachHang_{customer_id}")
 		
 		# Sanitize customer name for filename
-		import re
 		safe_name = re.sub(r'[^\w\-_\.]', '_', customer_name)
 		safe_name = safe_name.replace(' ', '_')
 		# Limit filename length to avoid issues
@@ -350,16 +376,16 @@ def samples_export():
 		filename = f"mau_khach_hang_{safe_name}.csv"
 	else:
 		filename = "tat_ca_mau.csv"
+	if date_from or date_to:
+		filename = filename.replace(".csv", f"_{date_from or 'dau'}_{date_to or 'nay'}.csv")
+	log_event(logger, logging.DEBUG, "samples_export", customer_id=customer_id, date_from=date_from, date_to=date_to, filename=filename)
 	
-	print(f"DEBUG: Filename: {filename}")
-	
-	# Return with proper headers
-	from urllib.parse import quote
+	# Stream rows as they are written (BOM first for Excel compatibility)
 	response = Response(
-		csv_content.encode('utf-8-sig'),  # Add BOM for Excel compatibility
+		csv_stream,
 		mimetype='text/csv; charset=utf-8',
 		headers={
-			'Content-Disposition': f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename)}',
+			'Content-Disposition': _attachment(filename),
 			'Content-Type': 'text/csv; charset=utf-8',
 			'Cache-Control': 'no-cache'
 		}
@@ -370,73 +396,32 @@ def samples_export():
 @pages.route("/receiving/save-filtered")
 @permission_required("receiving")
 def samples_save_filtered():
-	"""Save filtered samples to temporary file and return temp file ID."""
+	"""Cache the filtered samples and return a token for the export."""
 	try:
 		customer_id = request.args.get('customer_id', '')
 		customer_id = int(customer_id) if customer_id and customer_id.isdigit() else None
 		
-		print(f"DEBUG: Saving filtered samples for customer_id: {customer_id}")
+		token = save_filtered_samples(customer_id, _date_arg('date_from'), _date_arg('date_to'))
+		log_event(logger, logging.DEBUG, "samples_save_filtered", customer_id=customer_id, token=token)
 		
-		# Save filtered samples to temp file
-		temp_path = save_filtered_samples_to_temp(customer_id)
-		
-		# Return temp file ID (just the filename)
-		import os
-		temp_filename = os.path.basename(temp_path)
-		
-		return jsonify({"temp_file": temp_filename, "message": "Dữ liệu đã lọc đã được lưu"})
+		return jsonify({"token": token, "message": "Dữ liệu đã lọc đã được lưu"})
 		
 	except Exception as e:
-		print(f"DEBUG: Error in save-filtered: {e}")
+		log_event(logger, logging.ERROR, "samples_save_filtered_failed", exc_info=True)
 		return jsonify({"error": str(e)}), 500
 
 
-@pages.route("/receiving/export-from-temp/<temp_filename>")
+@pages.route("/receiving/export-filtered/<token>")
 @permission_required("receiving")
-def samples_export_from_temp(temp_filename):
-	"""Export samples from temporary file."""
-	from flask import Response
-	import os
-	
-	# Construct temp file path
-	temp_dir = os.path.join(os.path.dirname(__file__), "..", "temp")
-	temp_path = os.path.join(temp_dir, temp_filename)
-	
-	print(f"DEBUG: Exporting from temp file: {temp_path}")
-	
+def samples_export_filtered(token):
+	"""Export samples cached by samples_save_filtered."""
 	try:
-		# Load filtered samples from temp file
-		filtered_samples, customer_id = load_filtered_samples_from_temp(temp_path)
+		filtered_samples, customer_id = load_filtered_samples(token)
 		
 		if not filtered_samples:
 			flash("Không tìm thấy dữ liệu đã lọc", "danger")
 			return redirect(url_for("pages.samples_list"))
 		
-		# Create CSV content
-		import io
-		import csv
-		output = io.StringIO()
-		writer = csv.writer(output)
-		
-		# Write header
-		writer.writerow(['ID', 'Ngày nhận', 'ID Khách hàng', 'Tên mẫu', 'Mã hóa mẫu', 'Loại mẫu', 'Chỉ tiêu phân tích', 'Ghi chú'])
-		
-		# Write data
-		for sample in filtered_samples:
-			writer.writerow([
-				sample.get('id', ''),
-				sample.get('received_date', ''),
-				sample.get('customer_id', ''),
-				sample.get('sample_name', ''),
-				sample.get('sample_code', ''),
-				sample.get('sample_type', ''),
-				sample.get('analysis_target', ''),
-				sample.get('note', '')
-			])
-		
-		csv_content = output.getvalue()
-		print(f"DEBUG: CSV content length: {len(csv_content)}")
-		
 		# Determine filename based on customer
 		if customer_id:
 			# Get customer name
@@ -445,7 +430,6 @@ def samples_export_from_temp(temp_filename):
 			customer_name = customer_lookup.get(customer_id, f"KhachHang_{customer_id}")
 			
 			# Strong sanitize customer name for filename
-			import re
 			# Remove all non-ASCII characters and replace with ASCII equivalents
 			safe_name = customer_name
 			# Replace Vietnamese characters
@@ -481,29 +465,33 @@ def samples_export_from_temp(temp_filename):
 				safe_name = f"KhachHang_{safe_name}"
 			
 			filename = f"mau_khach_hang_{safe_name}.csv"
-			print(f"DEBUG: Original name: {customer_name}, Safe name: {safe_name}, Filename: {filename}")
 		else:
 			filename = f"tat_ca_mau_{len(filtered_samples)}_mau.csv"
 		
+		def generate():
+			yield codecs.BOM_UTF8
+			for chunk in iter_samples_csv(filtered_samples):
+				yield chunk.encode('utf-8')
+		
 		# Return with proper headers
-		from urllib.parse import quote
 		response = Response(
-			csv_content.encode('utf-8-sig'),
+			generate(),
 			mimetype='text/csv; charset=utf-8',
 			headers={
-				'Content-Disposition': f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename)}',
+				'Content-Disposition': _attachment(filename),
 				'Content-Type': 'text/csv; charset=utf-8',
 				'Cache-Control': 'no-cache'
 			}
 		)
 		
-		# Clean up temp file after successful export
-		cleanup_temp_file(temp_path)
+		# The export is one-shot; free the cached list
+		discard_filtered_samples(token)
+		log_event(logger, logging.DEBUG, "samples_export_filtered", customer_id=customer_id, rows=len(filtered_samples), filename=filename)
 		
 		return response
 		
 	except Exception as e:
-		print(f"DEBUG: Error exporting from temp file: {e}")
+		log_event(logger, logging.ERROR, "samples_export_filtered_failed", exc_info=True, token=token)
 		flash(f"Lỗi xuất dữ liệu: {str(e)}", "danger")
 		return redirect(url_for("pages.samples_list"))
 
@@ -525,8 +513,30 @@ def closing_index():
 @permission_required("closing")
 def closing_regular():
 	"""Regular sample closing management"""
-	closed_samples = list_closed_samples()
-	return render_template("closing/regular.html", closed_samples=closed_samples)
+	page = max(request.args.get('page', 1, type=int), 1)
+	per_page = min(max(request.args.get('per_page', 20, type=int), 1), 500)
+	sort = request.args.get('sort', 'closing_date')
+	if sort not in CLOSED_SORT_FIELDS:
+		sort = 'closing_date'
+	order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+	filters = {field: request.args.get(field, '').strip() for field in ('customer_name', 'encoding', 'box_symbol')}
+	filters = dict(date_from=_date_arg('date_from'), date_to=_date_arg('date_to'), **filters)
+	
+	closed_samples, total_pages, total_count = list_closed_samples_paginated(
+		page, per_page, sort, order == 'desc', **{field: value or None for field, value in filters.items()}
+	)
+	return render_template("closing/regular.html",
+		closed_samples=closed_samples,
+		current_page=page,
+		total_pages=total_pages,
+		total_count=total_count,
+		per_page=per_page,
+		sort=sort,
+		order=order,
+		filters=filters,
+		# Current query without page/sort, for pagination and column links
+		list_args={field: value for field, value in filters.items() if value}
+	)
 
 
 @pages.route("/closing/regular/add", methods=["POST"])
@@ -604,19 +614,22 @@ def closing_regular_delete(closed_sample_id):
 @pages.route("/closing/regular/export")
 @permission_required("closing")
 def closing_regular_export():
-	"""Export closed samples to Excel"""
+	"""Export closed samples to Excel, optionally only those closed between date_from and date_to"""
 	try:
-		excel_data = export_closed_samples_to_excel()
+		date_from, date_to = _date_arg('date_from'), _date_arg('date_to')
+		excel_chunks = export_closed_samples_xlsx_stream(date_from, date_to)
+		filename = f"closed_samples_{date_from or 'dau'}_{date_to or 'nay'}.xlsx" if date_from or date_to else "closed_samples.xlsx"
+		log_event(logger, logging.DEBUG, "closed_samples_export", date_from=date_from, date_to=date_to)
 		
-		from flask import Response
 		response = Response(
-			excel_data,
+			excel_chunks,
 			mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-			headers={'Content-Disposition': 'attachment; filename=closed_samples.xlsx'}
+			headers={'Content-Disposition': f'attachment; filename={filename}'}
 		)
 		return response
 		
 	except Exception as e:
+		log_event(logger, logging.ERROR, "closed_samples_export_failed", exc_info=True)
 		flash(f"Lỗi khi xuất dữ liệu: {str(e)}", "danger")
 		return redirect(url_for("pages.closing_regular"))
 
@@ -632,4 +645,110 @@ def closing_foil():
 @permission_required("closing")
 def closing_standard():
 	"""Standard sample closing management"""
-	return render_template("closing/standard.html")
\ No newline at end of file
+	return render_template("closing/standard.html")
+
+
+# JSON API (permission: receiving)
+API_MAX_LIMIT = 500
+
+
+def _encode_cursor(state: dict) -> str:
+	raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+	return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+	"""The state inside a cursor from _encode_cursor; ValueError if it is not one."""
+	try:
+		state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+		sort, order, customer_id, (value, last_id), total = state["s"], state["o"], state["c"], state["a"], state["t"]
+	except (ValueError, TypeError, KeyError):
+		raise ValueError("invalid cursor")
+	value_type = int if sort == "id" else str
+	if (
+		sort not in SAMPLE_KEYSET_SORTS or order not in ("asc", "desc")
+		or not isinstance(value, value_type) or not isinstance(last_id, int)
+		or not (customer_id is None or isinstance(customer_id, int)) or not isinstance(total, int)
+	):
+		raise ValueError("invalid cursor")
+	return state
+
+
+@pages.route("/api/samples", methods=["GET"])
+@permission_required("receiving")
+def api_samples():
+	"""Samples as JSON, walked with an opaque cursor (keyset pagination).
+
+	Query: sort (id | received_date), order (asc | desc), customer_id,
+	limit (max API_MAX_LIMIT), fields (comma-separated projection) and
+	cursor (next_cursor of the previous page; it carries sort, order and
+	customer_id). total is counted on the first page and then carried in
+	the cursor, so on later pages it is the count when the walk started.
+	"""
+	limit = min(max(request.args.get("limit", 50, type=int), 1), API_MAX_LIMIT)
+	fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+	unknown = [f for f in fields if f not in SAMPLE_COLUMNS]
+	if unknown:
+		return jsonify({"error": f"Trường không hợp lệ: {', '.join(unknown)}"}), 400
+	
+	cursor = request.args.get("cursor")
+	if cursor:
+		try:
+			state = _decode_cursor(cursor)
+		except ValueError:
+			return jsonify({"error": "Cursor không hợp lệ"}), 400
+		sort, order, customer_id, total = state["s"], state["o"], state["c"], state["t"]
+		after = tuple(state["a"])
+	else:
+		sort = request.args.get("sort", "id")
+		order = request.args.get("order", "asc")
+		if sort not in SAMPLE_KEYSET_SORTS or order not in ("asc", "desc"):
+			return jsonify({"error": "sort phải là id hoặc received_date, order phải là asc hoặc desc"}), 400
+		customer_id = request.args.get("customer_id", type=int)
+		total = count_samples(customer_id)
+		after = None
+	
+	samples, last = list_samples_after(sort, after, limit, order == "desc", customer_id)
+	# Stored records are compact read-only mappings; the JSON encoder needs dicts
+	if fields:
+		samples = [{f: s.get(f) for f in fields} for s in samples]
+	else:
+		samples = [dict(s) for s in samples]
+	next_cursor = None
+	if last is not None:
+		next_cursor = _encode_cursor({"s": sort, "o": order, "c": customer_id, "a": list(last), "t": total})
+	return jsonify({
+		"items": samples,
+		"next_cursor": next_cursor,
+		"total": total,
+		"total_exact": cursor is None,
+	})
+
+
+# Monitoring (admin only)
+@pages.route("/metrics", methods=["GET"])
+@admin_required
+def metrics_endpoint():
+	"""This worker's metrics in Prometheus text format."""
+	return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@pages.route("/admin/profiles", methods=["GET"])
+@admin_required
+def admin_profiles():
+	"""Profiles and slow requests captured by this worker."""
+	return render_template(
+		"admin/profiles.html",
+		captures=profiling.list_captures(),
+		slow_request_ms=profiling.SLOW_REQUEST_MS,
+	)
+
+
+@pages.route("/admin/profiles/<int:capture_id>", methods=["GET"])
+@admin_required
+def admin_profile_detail(capture_id):
+	capture = profiling.get_capture(capture_id)
+	if not capture:
+		flash("Không tìm thấy bản ghi hiệu năng (có thể đã bị xoá hoặc thuộc worker khác)", "warning")
+		return redirect(url_for("pages.admin_profiles"))
+	return render_template("admin/profile.html", capture=capture)
@@ -1,141 +1,342 @@
-import json
+import codecs
 import os
 import csv
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional
+
+from . import search_index, sqlite_store
+from .json_store import DATA_DIR, JsonStore, record_type
+from .result_cache import ResultCache
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 SAMPLES_FILE = os.path.join(DATA_DIR, "samples.json")
 
+# Fields covered by search_samples(), with their ranking weights
+SEARCH_FIELDS = {"sample_code": 4, "sample_name": 3, "sample_type": 1, "analysis_target": 1, "note": 1}
 
-def _ensure_store() -> None:
-	os.makedirs(DATA_DIR, exist_ok=True)
-	if not os.path.exists(SAMPLES_FILE):
-		with open(SAMPLES_FILE, "w", encoding="utf-8") as f:
-			json.dump({"next_id": 1, "samples": []}, f, ensure_ascii=False, indent=2)
+# Samples are kept in memory as compact records; these fields repeat across samples
+SampleRecord = record_type("SampleRecord", sqlite_store.SAMPLE_COLUMNS, shared=("received_date", "sample_type", "analysis_target", "note"))
 
+_store = JsonStore(
+	SAMPLES_FILE,
+	lambda: {"next_id": 1, "samples": []},
+	collection="samples",
+	indexes=["customer_id"],
+	search_fields=SEARCH_FIELDS,
+	sorted_indexes=["id", "received_date"],
+	record_type=SampleRecord,
+)
 
-def _read() -> Dict[str, Any]:
-	_ensure_store()
-	with open(SAMPLES_FILE, "r", encoding="utf-8") as f:
-		return json.load(f)
+# Sort keys for keyset pagination (ties are ordered by id)
+KEYSET_SORTS = ("id", "received_date")
 
 
-def _write(data: Dict[str, Any]) -> None:
-	with open(SAMPLES_FILE, "w", encoding="utf-8") as f:
-		json.dump(data, f, ensure_ascii=False, indent=2)
+def _read() -> Dict[str, Any]:
+	return _store.read()
 
 
 def list_samples() -> List[Dict[str, Any]]:
 	return _read().get("samples", [])
 
 
-def list_samples_paginated(page: int = 1, per_page: int = 20, customer_id: Optional[int] = None) -> tuple[List[Dict[str, Any]], int, int]:
-	"""Get paginated samples with optional customer filter. Returns (samples, total_pages, total_count)"""
-	all_samples = _read().get("samples", [])
-	
-	# Filter by customer if specified
-	if customer_id is not None:
-		all_samples = [s for s in all_samples if s.get("customer_id") == customer_id]
-	
-	total_count = len(all_samples)
-	total_pages = (total_count + per_page - 1) // per_page
-	
+def _samples_for_customer(customer_id: Optional[int]) -> List[Dict[str, Any]]:
+	"""All samples, or only those of one customer when customer_id is given."""
+	if customer_id is None:
+		return _read().get("samples", [])
+	return _store.select("customer_id", customer_id)
+
+
+def _received_between(
+	date_from: Optional[str],
+	date_to: Optional[str],
+	customer_id: Optional[int] = None,
+	start: int = 0,
+	stop: Optional[int] = None,
+) -> tuple[List[Dict[str, Any]], int]:
+	"""Samples received in [date_from, date_to] in (received_date, id) order, sliced [start:stop], and their number."""
+	date_from, date_to = date_from or None, date_to or None
+	if customer_id is None:
+		return _store.ordered("received_date", date_from, date_to, start, stop)
+	# Filter whichever is smaller: the date range or the customer's samples
+	in_range = _store.ordered("received_date", date_from, date_to, 0, 0)[1]
+	if in_range <= _store.count("customer_id", customer_id):
+		samples = [s for s in _store.ordered("received_date", date_from, date_to)[0] if s.get("customer_id") == customer_id]
+	else:
+		samples = [
+			s for s in _store.select("customer_id", customer_id)
+			if (not date_from or (s.get("received_date") or "") >= date_from) and (not date_to or (s.get("received_date") or "") <= date_to)
+		]
+		samples.sort(key=lambda s: (s.get("received_date") or "", s.get("id")))
+	return samples[start:stop], len(samples)
+
+
+def list_samples_between(date_from: Optional[str] = None, date_to: Optional[str] = None, customer_id: Optional[int] = None) -> List[Dict[str, Any]]:
+	"""Samples received between two inclusive YYYY-MM-DD dates (None = open), oldest first.
+
+	The range is found by binary search in the received_date sorted index,
+	so the cost grows with the number of samples returned, not the store.
+	"""
+	return _received_between(date_from, date_to, customer_id)[0]
+
+
+def list_samples_paginated(
+	page: int = 1,
+	per_page: int = 20,
+	customer_id: Optional[int] = None,
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], int, int]:
+	"""Get paginated samples with optional customer and received date filters. Returns (samples, total_pages, total_count)
+
+	With a date filter the samples are ordered by received date.
+	"""
 	# Calculate offset
 	offset = (page - 1) * per_page
 	
-	# Get samples for current page
-	samples = all_samples[offset:offset + per_page]
+	if date_from or date_to:
+		samples, total_count = _received_between(date_from, date_to, customer_id, max(offset, 0), max(offset + per_page, 0))
+	# Filtered pages come straight from the customer_id index
+	elif customer_id is not None:
+		total_count = _store.count("customer_id", customer_id)
+		samples = _store.select("customer_id", customer_id, offset, offset + per_page) if offset >= 0 else []
+	else:
+		all_samples = _read().get("samples", [])
+		total_count = len(all_samples)
+		samples = all_samples[offset:offset + per_page]
+	
+	total_pages = (total_count + per_page - 1) // per_page
 	
 	return samples, total_pages, total_count
 
 
+def search_samples(
+	query: str,
+	page: int = 1,
+	per_page: int = 20,
+	customer_id: Optional[int] = None,
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], int, int]:
+	"""Samples matching a text query, best first, paginated like list_samples_paginated.
+
+	Matches name, code, type, analysis target and note, ignoring diacritics;
+	words also match as prefixes.
+	"""
+	offset = max(page - 1, 0) * per_page
+	if date_from or date_to:
+		allowed = {s["id"] for s in _received_between(date_from, date_to, customer_id)[0]}
+		samples, total_count = _store.search(query, offset, offset + per_page, allowed=allowed)
+	elif customer_id is not None:
+		samples, total_count = _store.search(query, offset, offset + per_page, "customer_id", customer_id)
+	else:
+		samples, total_count = _store.search(query, offset, offset + per_page)
+	total_pages = (total_count + per_page - 1) // per_page
+	return samples, total_pages, total_count
+
+
+def count_samples(customer_id: Optional[int] = None) -> int:
+	if customer_id is None:
+		return len(_read().get("samples", []))
+	return _store.count("customer_id", customer_id)
+
+
+def list_samples_after(
+	sort: str = "id",
+	after: Optional[tuple] = None,
+	limit: int = 50,
+	descending: bool = False,
+	customer_id: Optional[int] = None,
+) -> tuple[List[Dict[str, Any]], Optional[tuple]]:
+	"""One page of samples in (sort, id) order, starting after the position ``after``.
+
+	Returns (samples, position of the last sample) where the position is
+	None when there are no more samples. Unlike offset pages, the cost does
+	not grow with the depth of the page.
+	"""
+	group = None if customer_id is None else ("customer_id", customer_id)
+	samples = _store.keyset(sort, after, limit + 1, descending, group=group)
+	if len(samples) <= limit:
+		return samples, None
+	samples = samples[:limit]
+	value = samples[-1].get(sort)
+	return samples, ("" if value is None else value, samples[-1]["id"])
+
+
 def get_sample(sample_id: int) -> Optional[Dict[str, Any]]:
-	for s in list_samples():
-		if s.get("id") == sample_id:
-			return s
-	return None
+	return _store.get(sample_id)
 
 
-def create_sample(customer_id: int, sample_name: str, sample_code: str, sample_type: str, analysis_target: str, note: str) -> int:
-	data = _read()
+def _next_sample_id(data: Dict[str, Any]) -> int:
+	"""Next stable sample id from the next_id counter.
+
+	Ids are never reused or renumbered. Older files kept ids dense (1..N)
+	without advancing next_id, so the counter is also kept past the last id.
+	"""
 	samples = data.get("samples", [])
-	
-	# ID is always the next sequential number (1, 2, 3, 4...)
-	sample_id = len(samples) + 1
-	
-	record = {
-		"id": sample_id,
-		"received_date": datetime.now().strftime("%Y-%m-%d"),
-		"customer_id": customer_id,
-		"sample_name": sample_name.strip(),
-		"sample_code": sample_code.strip(),
-		"sample_type": sample_type.strip(),
-		"analysis_target": analysis_target.strip(),
-		"note": note.strip(),
-	}
-	samples.append(record)
-	data["samples"] = samples
-	_write(data)
+	last_id = samples[-1].get("id", 0) if samples else 0
+	return max(data.get("next_id", 1), last_id + 1)
+
+
+def create_sample(customer_id: int, sample_name: str, sample_code: str, sample_type: str, analysis_target: str, note: str) -> int:
+	with _store.locked() as data:
+		sample_id = _next_sample_id(data)
+		record = {
+			"id": sample_id,
+			"received_date": datetime.now().strftime("%Y-%m-%d"),
+			"customer_id": customer_id,
+			"sample_name": sample_name.strip(),
+			"sample_code": sample_code.strip(),
+			"sample_type": sample_type.strip(),
+			"analysis_target": analysis_target.strip(),
+			"note": note.strip(),
+		}
+		_store.apply(put=[record], meta={"next_id": sample_id + 1})
 	return sample_id
 
 
+def create_samples(rows: List[Dict[str, Any]]) -> List[int]:
+	"""Create many samples in one store write. Each row holds create_sample's fields. Returns the new ids."""
+	with _store.locked() as data:
+		next_sample_id = _next_sample_id(data)
+		received_date = datetime.now().strftime("%Y-%m-%d")
+		records = []
+		for offset, row in enumerate(rows):
+			records.append({
+				"id": next_sample_id + offset,
+				"received_date": received_date,
+				"customer_id": row["customer_id"],
+				"sample_name": row.get("sample_name", "").strip(),
+				"sample_code": row.get("sample_code", "").strip(),
+				"sample_type": row.get("sample_type", "").strip(),
+				"analysis_target": row.get("analysis_target", "").strip(),
+				"note": row.get("note", "").strip(),
+			})
+		if records:
+			_store.apply(put=records, meta={"next_id": next_sample_id + len(records)})
+	return [r["id"] for r in records]
+
+
 def update_sample(sample_id: int, customer_id: int, sample_name: str, sample_code: str, sample_type: str, analysis_target: str, note: str) -> bool:
-	data = _read()
-	found = False
-	for s in data.get("samples", []):
-		if s.get("id") == sample_id:
-			s["customer_id"] = customer_id
-			s["sample_name"] = sample_name.strip()
-			s["sample_code"] = sample_code.strip()
-			s["sample_type"] = sample_type.strip()
-			s["analysis_target"] = analysis_target.strip()
-			s["note"] = note.strip()
-			found = True
-			break
-	if not found:
-		return False
-	_write(data)
+	with _store.locked():
+		existing = get_sample(sample_id)
+		if not existing:
+			return False
+		record = dict(existing)
+		record["customer_id"] = customer_id
+		record["sample_name"] = sample_name.strip()
+		record["sample_code"] = sample_code.strip()
+		record["sample_type"] = sample_type.strip()
+		record["analysis_target"] = analysis_target.strip()
+		record["note"] = note.strip()
+		_store.apply(put=[record])
 	return True
 
 
 def delete_sample(sample_id: int) -> bool:
-	data = _read()
-	samples = data.get("samples", [])
-	
-	# Find and remove the sample
-	original_count = len(samples)
-	new_samples = [s for s in samples if s.get("id") != sample_id]
-	
-	if len(new_samples) == original_count:
-		return False  # Sample not found
-	
-	# Renumber all samples to maintain sequential IDs (1, 2, 3, 4...)
-	for i, sample in enumerate(new_samples, 1):
-		sample["id"] = i
-	
-	data["samples"] = new_samples
-	_write(data)
+	with _store.locked():
+		if not get_sample(sample_id):
+			return False  # Sample not found
+		_store.apply(delete=[sample_id])
 	return True
 
 
-def import_samples_from_csv(csv_content: str) -> tuple[int, List[str]]:
+IMPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 64 * 1024
+
+
+def import_samples_from_csv(csv_content: str, all_or_nothing: bool = False) -> tuple[int, List[str]]:
 	"""Import samples from CSV content. Returns (success_count, error_messages)"""
+	import io
+	return import_samples_from_rows(csv.reader(io.StringIO(csv_content)), all_or_nothing=all_or_nothing)
+
+
+def import_samples_from_stream(stream: BinaryIO, all_or_nothing: bool = False) -> tuple[int, List[str]]:
+	"""Import samples from an uploaded CSV byte stream without buffering the whole file.
+
+	The encoding is detected on the first chunk (UTF-8 with or without BOM,
+	otherwise cp1252). Returns (success_count, error_messages).
+	"""
+	return import_samples_from_rows(csv.reader(_decoded_lines(stream)), all_or_nothing=all_or_nothing)
+
+
+def _detect_encoding(first_chunk: bytes) -> str:
+	try:
+		codecs.getincrementaldecoder("utf-8-sig")().decode(first_chunk, final=False)
+		return "utf-8-sig"
+	except UnicodeDecodeError:
+		return "cp1252"
+
+
+class CsvDecodeError(ValueError):
+	"""Bytes of an imported file that are invalid in its detected encoding."""
+
+	def __init__(self, message: str, line: int) -> None:
+		super().__init__(message)
+		self.line = line
+
+
+def _decoded_lines(stream: BinaryIO) -> Iterator[str]:
+	"""Yield text lines (with line endings) decoded incrementally from a byte stream.
+
+	The encoding is guessed from the first chunk only, so later bytes can be
+	invalid in it: the complete lines before them are yielded, then
+	CsvDecodeError names the line and byte offset.
+	"""
+	chunk = stream.read(IMPORT_CHUNK_SIZE)
+	encoding = _detect_encoding(chunk)
+	decoder = codecs.getincrementaldecoder(encoding)()
+	pending = ""
+	line = 1  # number of the first line not yet yielded
+	offset = 0  # stream offset of the current chunk
+	while True:
+		buffered = decoder.getstate()[0]
+		try:
+			text = decoder.decode(chunk, final=not chunk)
+		except UnicodeDecodeError as e:
+			data = buffered + chunk
+			lines = (pending + data[:e.start].decode(encoding)).splitlines(keepends=True)
+			if lines and not lines[-1].endswith("\n"):
+				lines.pop()  # the start of the bad line
+			yield from lines
+			line += len(lines)
+			raise CsvDecodeError(
+				f"Dòng {line} (byte {offset - len(buffered) + e.start}): "
+				f"không đọc được theo bảng mã {encoding} (byte 0x{data[e.start]:02x})",
+				line,
+			) from e
+		if not chunk:
+			break
+		lines = (pending + text).splitlines(keepends=True)
+		# The last line may continue in the next chunk (including a split "\r\n")
+		pending = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+		line += len(lines)
+		yield from lines
+		offset += len(chunk)
+		chunk = stream.read(IMPORT_CHUNK_SIZE)
+	pending += text
+	if pending:
+		yield pending
+
+
+def import_samples_from_rows(rows: Iterable[List[str]], all_or_nothing: bool = False) -> tuple[int, List[str]]:
+	"""Import samples from parsed CSV rows (header first). Returns (success_count, error_messages)
+
+	Rows are validated as they stream in and saved in bulk writes of
+	IMPORT_BATCH_SIZE rows. With all_or_nothing, valid rows are held back
+	until the end and nothing is saved if any row is invalid.
+	"""
 	errors = []
 	success_count = 0
+	valid_rows = []
 	
 	try:
-		# Use proper CSV parsing with StringIO
-		import io
-		csv_reader = csv.reader(io.StringIO(csv_content))
-		rows = list(csv_reader)
-		
-		if len(rows) < 2:
+		rows = iter(rows)
+		header_row = next(rows, None)
+		if header_row is None:
 			errors.append("File CSV phải có ít nhất 1 dòng dữ liệu")
 			return 0, errors
 		
 		# Get header and map Vietnamese to English field names
-		header = [col.strip() for col in rows[0]]
+		header = [col.strip() for col in header_row]
 		
 		# Remove BOM (Byte Order Mark) from first column if present
 		if header and header[0].startswith('\ufeff'):
@@ -174,7 +375,9 @@ def import_samples_from_csv(csv_content: str) -> tuple[int, List[str]]:
 				return 0, errors
 		
 		# Process data rows
-		for i, row_data in enumerate(rows[1:], 2):
+		row_count = 0
+		for i, row_data in enumerate(rows, 2):
+			row_count += 1
 			if not any(row_data):  # Skip empty rows
 				continue
 				
@@ -196,47 +399,58 @@ def import_samples_from_csv(csv_content: str) -> tuple[int, List[str]]:
 				errors.append(f"Dòng {i}: customer_id phải là số")
 				continue
 			
-			# Create sample
-			try:
-				create_sample(
-					customer_id=customer_id,
-					sample_name=row['sample_name'],
-					sample_code=row.get('sample_code', ''),
-					sample_type=row.get('sample_type', ''),
-					analysis_target=row.get('analysis_target', ''),
-					note=row.get('note', '')
-				)
-				success_count += 1
-			except Exception as e:
-				errors.append(f"Dòng {i}: Lỗi tạo mẫu - {str(e)}")
+			valid_rows.append({
+				"customer_id": customer_id,
+				"sample_name": row['sample_name'],
+				"sample_code": row.get('sample_code', ''),
+				"sample_type": row.get('sample_type', ''),
+				"analysis_target": row.get('analysis_target', ''),
+				"note": row.get('note', ''),
+			})
+			
+			if not all_or_nothing and len(valid_rows) >= IMPORT_BATCH_SIZE:
+				success_count += len(create_samples(valid_rows))
+				valid_rows = []
+		
+		if row_count == 0:
+			errors.append("File CSV phải có ít nhất 1 dòng dữ liệu")
+			return 0, errors
+		
+		if all_or_nothing and errors:
+			errors.append(f"Không import mẫu nào vì có {len(errors)} dòng lỗi")
+			return 0, errors
+		
+		# Create the remaining valid samples in one write
+		success_count += len(create_samples(valid_rows))
 				
+	except CsvDecodeError as e:
+		errors.append(f"Lỗi đọc file CSV: {str(e)}")
+		if all_or_nothing:
+			errors.append("Không import mẫu nào")
+		else:
+			# Everything before the unreadable line was valid CSV: keep it
+			success_count += len(create_samples(valid_rows))
+			errors.append(f"Đã lưu {success_count} mẫu từ các dòng trước dòng {e.line}; từ dòng {e.line} trở đi chưa được import")
 	except Exception as e:
 		errors.append(f"Lỗi đọc file CSV: {str(e)}")
+		if success_count:
+			errors.append(f"Đã lưu {success_count} mẫu trước khi gặp lỗi; các dòng sau đó chưa được import")
 	
 	return success_count, errors
 
 
-def export_samples_to_excel(customer_id: Optional[int] = None) -> str:
-	"""Export samples to Excel format. Returns CSV content for Excel."""
-	all_samples = _read().get("samples", [])
-	print(f"DEBUG: Total samples: {len(all_samples)}")
-	print(f"DEBUG: Filtering by customer_id: {customer_id}")
-	
-	# Filter by customer if specified
-	if customer_id is not None:
-		all_samples = [s for s in all_samples if s.get("customer_id") == customer_id]
-		print(f"DEBUG: Filtered samples: {len(all_samples)}")
-	
-	# Create CSV content
+EXPORT_HEADER = ['ID', 'Ngày nhận', 'ID Khách hàng', 'Tên mẫu', 'Mã hóa mẫu', 'Loại mẫu', 'Chỉ tiêu phân tích', 'Ghi chú']
+EXPORT_CHUNK_ROWS = 500
+
+
+def iter_samples_csv(samples: Iterable[Dict[str, Any]]) -> Iterator[str]:
+	"""Yield CSV text for the given samples (header first), EXPORT_CHUNK_ROWS rows at a time."""
 	import io
 	output = io.StringIO()
 	writer = csv.writer(output)
+	writer.writerow(EXPORT_HEADER)
 	
-	# Write header
-	writer.writerow(['ID', 'Ngày nhận', 'ID Khách hàng', 'Tên mẫu', 'Mã hóa mẫu', 'Loại mẫu', 'Chỉ tiêu phân tích', 'Ghi chú'])
-	
-	# Write data
-	for sample in all_samples:
+	for count, sample in enumerate(samples, 1):
 		writer.writerow([
 			sample.get('id', ''),
 			sample.get('received_date', ''),
@@ -247,70 +461,308 @@ def export_samples_to_excel(customer_id: Optional[int] = None) -> str:
 			sample.get('analysis_target', ''),
 			sample.get('note', '')
 		])
+		if count % EXPORT_CHUNK_ROWS == 0:
+			yield output.getvalue()
+			output.seek(0)
+			output.truncate()
 	
-	return output.getvalue()
+	yield output.getvalue()
 
 
-def save_filtered_samples_to_temp(customer_id: Optional[int] = None) -> str:
-	"""Save filtered samples to temporary file. Returns temp file path."""
-	import tempfile
-	import os
-	
-	all_samples = _read().get("samples", [])
-	
-	# Filter by customer if specified
-	if customer_id is not None:
-		all_samples = [s for s in all_samples if s.get("customer_id") == customer_id]
-	
-	# Create temporary file
-	temp_dir = os.path.join(os.path.dirname(__file__), "..", "temp")
-	os.makedirs(temp_dir, exist_ok=True)
-	
-	# Create temp file with unique name
-	import uuid
-	temp_filename = f"filtered_samples_{uuid.uuid4().hex}.json"
-	temp_path = os.path.join(temp_dir, temp_filename)
-	
-	# Save filtered samples to temp file with metadata
-	temp_data = {
-		"customer_id": customer_id,
-		"samples": all_samples,
-		"count": len(all_samples)
-	}
+def _samples_matching(customer_id: Optional[int], date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+	"""Samples for an export: optionally one customer's and/or a received date range."""
+	if date_from or date_to:
+		return list_samples_between(date_from, date_to, customer_id)
+	return _samples_for_customer(customer_id)
+
+
+def export_samples_csv_stream(customer_id: Optional[int] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Iterator[bytes]:
+	"""Stream the samples export as UTF-8 CSV with a BOM for Excel.
+
+	The samples are selected before the first chunk is produced, so store
+	errors are raised here rather than in the middle of a download.
+	"""
+	# Shallow copy: the cached list may change while the response streams
+	samples = list(_samples_matching(customer_id, date_from, date_to))
 	
-	with open(temp_path, 'w', encoding='utf-8') as f:
-		json.dump(temp_data, f, ensure_ascii=False, indent=2)
+	def generate() -> Iterator[bytes]:
+		yield codecs.BOM_UTF8
+		for chunk in iter_samples_csv(samples):
+			yield chunk.encode('utf-8')
 	
-	print(f"DEBUG: Saved {len(all_samples)} filtered samples to {temp_path}")
-	return temp_path
+	return generate()
 
 
-def load_filtered_samples_from_temp(temp_path: str) -> tuple[List[Dict[str, Any]], Optional[int]]:
-	"""Load filtered samples from temporary file. Returns (samples, customer_id)."""
+def export_samples_to_excel(customer_id: Optional[int] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> str:
+	"""Export samples to Excel format. Returns CSV content for Excel."""
+	return "".join(iter_samples_csv(_samples_matching(customer_id, date_from, date_to)))
+
+
+# Filtered lists prepared by /receiving/save-filtered for the export that follows
+FILTER_CACHE = ResultCache(ttl=600, max_entries=32, max_items=500_000)
+
+
+def save_filtered_samples(customer_id: Optional[int] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> str:
+	"""Cache the filtered samples for a later export. Returns the cache token."""
+	import secrets
+	samples = list(_samples_matching(customer_id, date_from, date_to))
+	# The filter is part of the token so another worker (or an expired entry) can recompute it:
+	# <nonce>-<customer id|all>[~<date from>~<date to>]
+	token = f"{secrets.token_hex(8)}-{customer_id if customer_id is not None else 'all'}"
+	if date_from or date_to:
+		token += f"~{date_from or ''}~{date_to or ''}"
+	FILTER_CACHE.put(token, samples, customer_id)
+	return token
+
+
+def _is_date(value: str) -> bool:
 	try:
-		with open(temp_path, 'r', encoding='utf-8') as f:
-			temp_data = json.load(f)
-		
-		# Handle both old format (list) and new format (dict)
-		if isinstance(temp_data, list):
-			samples = temp_data
-			customer_id = None
-		else:
-			samples = temp_data.get("samples", [])
-			customer_id = temp_data.get("customer_id")
-		
-		print(f"DEBUG: Loaded {len(samples)} samples from temp file, customer_id: {customer_id}")
-		return samples, customer_id
-	except Exception as e:
-		print(f"DEBUG: Error loading temp file: {e}")
+		datetime.strptime(value, "%Y-%m-%d")
+	except ValueError:
+		return False
+	return True
+
+
+def load_filtered_samples(token: str) -> tuple[List[Dict[str, Any]], Optional[int]]:
+	"""Load filtered samples saved under a token. Returns (samples, customer_id)."""
+	cached = FILTER_CACHE.get(token)
+	if cached is not None:
+		return cached
+	nonce, _, criteria = token.partition("-")
+	customer, _, dates = criteria.partition("~")
+	date_from, _, date_to = dates.partition("~")
+	if not nonce or not (customer == "all" or customer.isdigit()):
+		return [], None
+	if not all(_is_date(date) for date in (date_from, date_to) if date):
 		return [], None
+	customer_id = int(customer) if customer.isdigit() else None
+	return list(_samples_matching(customer_id, date_from, date_to)), customer_id
 
 
-def cleanup_temp_file(temp_path: str) -> None:
-	"""Clean up temporary file."""
-	try:
-		if os.path.exists(temp_path):
-			os.remove(temp_path)
-			print(f"DEBUG: Cleaned up temp file: {temp_path}")
-	except Exception as e:
-		print(f"DEBUG: Error cleaning up temp file: {e}")
+def discard_filtered_samples(token: str) -> None:
+	FILTER_CACHE.pop(token)
+
+
+# SQLite backend (LAB_STORAGE_BACKEND=sqlite)
+
+def _sql_list_samples() -> List[Dict[str, Any]]:
+	rows = sqlite_store.connect().execute("SELECT * FROM samples ORDER BY id").fetchall()
+	return sqlite_store.rows_to_dicts(rows)
+
+
+def _sql_samples_for_customer(customer_id: Optional[int]) -> List[Dict[str, Any]]:
+	if customer_id is None:
+		return _sql_list_samples()
+	rows = sqlite_store.connect().execute(
+		"SELECT * FROM samples WHERE customer_id = ? ORDER BY id", (customer_id,)
+	).fetchall()
+	return sqlite_store.rows_to_dicts(rows)
+
+
+def _sql_sample_filter(customer_id: Optional[int], date_from: Optional[str] = None, date_to: Optional[str] = None) -> tuple[List[str], List[Any]]:
+	"""WHERE conditions and parameters for the customer and received date filters."""
+	conditions: List[str] = []
+	params: List[Any] = []
+	if customer_id is not None:
+		conditions.append("customer_id = ?")
+		params.append(customer_id)
+	if date_from:
+		conditions.append("received_date >= ?")
+		params.append(date_from)
+	if date_to:
+		conditions.append("received_date <= ?")
+		params.append(date_to)
+	return conditions, params
+
+
+def _sql_list_samples_between(date_from: Optional[str] = None, date_to: Optional[str] = None, customer_id: Optional[int] = None) -> List[Dict[str, Any]]:
+	conditions, params = _sql_sample_filter(customer_id, date_from, date_to)
+	where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+	rows = sqlite_store.connect().execute(f"SELECT * FROM samples {where} ORDER BY received_date, id", params).fetchall()
+	return sqlite_store.rows_to_dicts(rows)
+
+
+def _sql_list_samples_paginated(
+	page: int = 1,
+	per_page: int = 20,
+	customer_id: Optional[int] = None,
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], int, int]:
+	conn = sqlite_store.connect()
+	conditions, params = _sql_sample_filter(customer_id, date_from, date_to)
+	where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+	order = "received_date, id" if date_from or date_to else "id"
+	total_count = conn.execute(f"SELECT COUNT(*) FROM samples {where}", params).fetchone()[0]
+	total_pages = (total_count + per_page - 1) // per_page
+	offset = max(page - 1, 0) * per_page
+	rows = conn.execute(
+		f"SELECT * FROM samples {where} ORDER BY {order} LIMIT ? OFFSET ?", params + [per_page, offset]
+	).fetchall()
+	return sqlite_store.rows_to_dicts(rows), total_pages, total_count
+
+
+def _sql_search_samples(
+	query: str,
+	page: int = 1,
+	per_page: int = 20,
+	customer_id: Optional[int] = None,
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], int, int]:
+	# samples_fts finds the matches (every query word, exactly or as a prefix)
+	# and ranks them like SearchIndex: per word, the best weight among the
+	# fields containing it, halved for a prefix match. Field matches are
+	# column-filtered FTS queries, so scoring never reads the stored text.
+	query_words = list(dict.fromkeys(search_index.words(query)))
+	if not query_words:
+		return [], 0, 0
+	conn = sqlite_store.connect()
+	conditions, params = _sql_sample_filter(customer_id, date_from, date_to)
+	conditions = [f"s.{condition}" for condition in conditions]
+	conditions.append("samples_fts MATCH ?")
+	params.append(" AND ".join(f'"{word}"*' if len(word) >= search_index.MIN_PREFIX else f'"{word}"' for word in query_words))
+	where = " AND ".join(conditions)
+	total_count = conn.execute(
+		f"SELECT COUNT(*) FROM samples_fts JOIN samples s ON s.id = samples_fts.rowid WHERE {where}", params
+	).fetchone()[0]
+	if not total_count:
+		return [], 0, 0
+	field_match = "samples_fts.rowid IN (SELECT rowid FROM samples_fts WHERE samples_fts MATCH ?)"
+	scores: List[str] = []
+	score_params: List[Any] = []
+	for word in query_words:
+		# (score, FTS query) per field, best first: the first match is the word's score
+		levels = [(weight, f'{field} : "{word}"') for field, weight in SEARCH_FIELDS.items()]
+		if len(word) >= search_index.MIN_PREFIX:
+			levels += [(weight * search_index.PREFIX_FACTOR, f'{field} : "{word}"*') for field, weight in SEARCH_FIELDS.items()]
+		levels.sort(key=lambda level: level[0], reverse=True)
+		scores.append(f"CASE {' '.join(f'WHEN {field_match} THEN {score}' for score, _ in levels)} ELSE 0 END")
+		score_params += [match for _, match in levels]
+	offset = max(page - 1, 0) * per_page
+	rows = conn.execute(
+		f"SELECT s.* FROM samples_fts JOIN samples s ON s.id = samples_fts.rowid WHERE {where} "
+		f"ORDER BY {' + '.join(scores)} DESC, s.id DESC LIMIT ? OFFSET ?",
+		params + score_params + [per_page, offset],
+	).fetchall()
+	total_pages = (total_count + per_page - 1) // per_page
+	return sqlite_store.rows_to_dicts(rows), total_pages, total_count
+
+
+def _sql_count_samples(customer_id: Optional[int] = None) -> int:
+	where, params = ("WHERE customer_id = ?", (customer_id,)) if customer_id is not None else ("", ())
+	return sqlite_store.connect().execute(f"SELECT COUNT(*) FROM samples {where}", params).fetchone()[0]
+
+
+def _sql_list_samples_after(
+	sort: str = "id",
+	after: Optional[tuple] = None,
+	limit: int = 50,
+	descending: bool = False,
+	customer_id: Optional[int] = None,
+) -> tuple[List[Dict[str, Any]], Optional[tuple]]:
+	if sort not in KEYSET_SORTS:
+		raise KeyError(sort)
+	conditions: List[str] = []
+	params: List[Any] = []
+	if after is not None:
+		conditions.append(f"({sort}, id) {'<' if descending else '>'} (?, ?)")
+		params.extend(after)
+	if customer_id is not None:
+		conditions.append("customer_id = ?")
+		params.append(customer_id)
+	where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+	direction = "DESC" if descending else "ASC"
+	rows = sqlite_store.connect().execute(
+		f"SELECT * FROM samples {where} ORDER BY {sort} {direction}, id {direction} LIMIT ?", params + [limit + 1]
+	).fetchall()
+	samples = sqlite_store.rows_to_dicts(rows)
+	if len(samples) <= limit:
+		return samples, None
+	samples = samples[:limit]
+	return samples, (samples[-1][sort], samples[-1]["id"])
+
+
+def _sql_get_sample(sample_id: int) -> Optional[Dict[str, Any]]:
+	row = sqlite_store.connect().execute("SELECT * FROM samples WHERE id = ?", (sample_id,)).fetchone()
+	return sqlite_store.row_to_dict(row)
+
+
+def _sql_next_sample_ids(conn, count: int) -> int:
+	"""Reserve count stable ids; returns the first one."""
+	max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM samples").fetchone()[0]
+	first_id = max(sqlite_store.next_id(conn, "samples"), max_id + 1)
+	sqlite_store.set_counter(conn, "samples", first_id + count)
+	return first_id
+
+
+def _sql_create_sample(customer_id: int, sample_name: str, sample_code: str, sample_type: str, analysis_target: str, note: str) -> int:
+	with sqlite_store.transaction() as conn:
+		sample_id = _sql_next_sample_ids(conn, 1)
+		conn.execute(
+			"INSERT INTO samples (id, received_date, customer_id, sample_name, sample_code, sample_type, analysis_target, note) "
+			"VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+			(
+				sample_id,
+				datetime.now().strftime("%Y-%m-%d"),
+				customer_id,
+				sample_name.strip(),
+				sample_code.strip(),
+				sample_type.strip(),
+				analysis_target.strip(),
+				note.strip(),
+			),
+		)
+	return sample_id
+
+
+def _sql_create_samples(rows: List[Dict[str, Any]]) -> List[int]:
+	received_date = datetime.now().strftime("%Y-%m-%d")
+	with sqlite_store.transaction() as conn:
+		next_sample_id = _sql_next_sample_ids(conn, len(rows))
+		records = [
+			{
+				"id": next_sample_id + offset,
+				"received_date": received_date,
+				"customer_id": row["customer_id"],
+				"sample_name": row.get("sample_name", "").strip(),
+				"sample_code": row.get("sample_code", "").strip(),
+				"sample_type": row.get("sample_type", "").strip(),
+				"analysis_target": row.get("analysis_target", "").strip(),
+				"note": row.get("note", "").strip(),
+			}
+			for offset, row in enumerate(rows)
+		]
+		sqlite_store.insert_many(conn, "samples", sqlite_store.SAMPLE_COLUMNS, records)
+	return [r["id"] for r in records]
+
+
+def _sql_update_sample(sample_id: int, customer_id: int, sample_name: str, sample_code: str, sample_type: str, analysis_target: str, note: str) -> bool:
+	with sqlite_store.transaction() as conn:
+		cursor = conn.execute(
+			"UPDATE samples SET customer_id = ?, sample_name = ?, sample_code = ?, sample_type = ?, analysis_target = ?, note = ? "
+			"WHERE id = ?",
+			(customer_id, sample_name.strip(), sample_code.strip(), sample_type.strip(), analysis_target.strip(), note.strip(), sample_id),
+		)
+	return cursor.rowcount > 0
+
+
+def _sql_delete_sample(sample_id: int) -> bool:
+	with sqlite_store.transaction() as conn:
+		cursor = conn.execute("DELETE FROM samples WHERE id = ?", (sample_id,))
+	return cursor.rowcount > 0
+
+
+if sqlite_store.use_sqlite():
+	list_samples = _sql_list_samples
+	_samples_for_customer = _sql_samples_for_customer
+	list_samples_between = _sql_list_samples_between
+	list_samples_paginated = _sql_list_samples_paginated
+	search_samples = _sql_search_samples
+	count_samples = _sql_count_samples
+	list_samples_after = _sql_list_samples_after
+	get_sample = _sql_get_sample
+	create_sample = _sql_create_sample
+	create_samples = _sql_create_samples
+	update_sample = _sql_update_sample
+	delete_sample = _sql_delete_sample
@@ -0,0 +1,190 @@
+"""In-memory inverted index for diacritic-insensitive text search.
+
+Text is folded (Vietnamese diacritics removed, ``đ`` -> ``d``, lower case)
+and split into words, so "mau dat" finds "Mẫu đất". Each query word must
+match a word of the record exactly or as a prefix (words of at least
+``MIN_PREFIX`` characters); results are ranked by the weights of the fields
+that matched, exact matches counting double, then newest (highest key)
+first.
+"""
+
+import bisect
+import heapq
+import itertools
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+MIN_PREFIX = 2
+PREFIX_FACTOR = 0.5
+PREFIX_CACHE_SIZE = 256
+
+_WORD = re.compile(r"\w+")
+# NFD-free folding: precomposed Vietnamese letters map straight to their base letter
+_FOLD = str.maketrans(
+	"àáảãạăằắẳẵặâầấẩẫậđèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵ"
+	"ÀÁẢÃẠĂẰẮẲẴẶÂẦẤẨẪẬĐÈÉẺẼẸÊỀẾỂỄỆÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴ",
+	"aaaaaaaaaaaaaaaaadeeeeeeeeeeeiiiiiooooooooooooooooouuuuuuuuuuuyyyyy"
+	"AAAAAAAAAAAAAAAAADEEEEEEEEEEEIIIIIOOOOOOOOOOOOOOOOOUUUUUUUUUUUYYYYY",
+	# Combining marks, for text typed in decomposed form
+	"".join(chr(c) for c in range(0x300, 0x370)),
+)
+
+
+def fold(text: str) -> str:
+	"""Lower-case text without Vietnamese diacritics."""
+	return text.translate(_FOLD).lower()
+
+
+def words(text: str) -> List[str]:
+	return _WORD.findall(fold(text))
+
+
+class SearchIndex:
+	"""Word -> {weight: record keys} postings plus a sorted vocabulary for prefix lookups.
+
+	``fields`` maps each indexed record field to its ranking weight; a record
+	is filed under each of its words with the highest weight among the fields
+	containing it. Keeping keys in one set per weight lets a query intersect
+	and rank matches with set operations instead of per-record work. Records
+	are added and removed one at a time, so the index follows the store's
+	mutations instead of being rebuilt.
+	"""
+
+	def __init__(self, fields: Mapping[str, float]) -> None:
+		self.fields = dict(fields)
+		self._postings: Dict[str, Dict[float, Set[Any]]] = {}
+		self._vocabulary: List[str] = []
+		# key -> its words and weights, to remove a record without its old version
+		self._documents: Dict[Any, Dict[str, float]] = {}
+		# Merged prefix expansions; any mutation clears it
+		self._prefix_cache: Dict[str, Dict[float, Set[Any]]] = {}
+
+	def __len__(self) -> int:
+		return len(self._documents)
+
+	def _record_words(self, record: Mapping[str, Any], cache: Optional[Dict[str, List[str]]] = None) -> Dict[str, float]:
+		weights: Dict[str, float] = {}
+		for field, weight in self.fields.items():
+			value = record.get(field)
+			if not value:
+				continue
+			if cache is None:
+				value_words = words(str(value))
+			else:
+				value_words = cache.get(value)
+				if value_words is None:
+					value_words = cache[value] = words(str(value))
+			for word in value_words:
+				if weights.get(word, 0) < weight:
+					weights[word] = weight
+		return weights
+
+	def build(self, records: Iterable[Tuple[Any, Mapping[str, Any]]]) -> None:
+		"""Index (key, record) pairs from scratch."""
+		postings: Dict[str, Dict[float, Set[Any]]] = {}
+		documents: Dict[Any, Dict[str, float]] = {}
+		# Types, targets and notes repeat a lot; fold each distinct value once
+		cache: Dict[str, List[str]] = {}
+		for key, record in records:
+			weights = documents[key] = self._record_words(record, cache)
+			for word, weight in weights.items():
+				levels = postings.get(word)
+				if levels is None:
+					levels = postings[word] = {}
+				keys = levels.get(weight)
+				if keys is None:
+					levels[weight] = {key}
+				else:
+					keys.add(key)
+		self._postings = postings
+		self._documents = documents
+		self._vocabulary = sorted(postings)
+		self._prefix_cache = {}
+
+	def add(self, key: Any, record: Mapping[str, Any]) -> None:
+		self.remove(key)
+		self._prefix_cache.clear()
+		weights = self._documents[key] = self._record_words(record)
+		for word, weight in weights.items():
+			levels = self._postings.get(word)
+			if levels is None:
+				levels = self._postings[word] = {}
+				bisect.insort(self._vocabulary, word)
+			levels.setdefault(weight, set()).add(key)
+
+	def remove(self, key: Any) -> None:
+		self._prefix_cache.clear()
+		for word, weight in self._documents.pop(key, {}).items():
+			levels = self._postings[word]
+			keys = levels[weight]
+			keys.discard(key)
+			if not keys:
+				del levels[weight]
+				if not levels:
+					del self._postings[word]
+					del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+
+	def _matches(self, word: str) -> Dict[float, Set[Any]]:
+		"""Keys matching one query word, exactly or by prefix, by score (disjoint sets)."""
+		exact = self._postings.get(word)
+		if len(word) < MIN_PREFIX:
+			return exact or {}
+		start = bisect.bisect_left(self._vocabulary, word)
+		stop = bisect.bisect_left(self._vocabulary, word + "\uffff", start)
+		if stop - start == (1 if exact is not None else 0):
+			return exact or {}
+		cached = self._prefix_cache.get(word)
+		if cached is not None:
+			return cached
+		merged: Dict[float, Set[Any]] = {weight: set(keys) for weight, keys in exact.items()} if exact else {}
+		for other in self._vocabulary[start:stop]:
+			if other != word:
+				for weight, keys in self._postings[other].items():
+					merged.setdefault(weight * PREFIX_FACTOR, set()).update(keys)
+		# A key matching several words keeps only its best score
+		seen: Set[Any] = set()
+		for weight in sorted(merged, reverse=True):
+			keys = merged[weight]
+			keys -= seen
+			seen |= keys
+		merged = {weight: keys for weight, keys in merged.items() if keys}
+		if len(self._prefix_cache) >= PREFIX_CACHE_SIZE:
+			self._prefix_cache.clear()
+		self._prefix_cache[word] = merged
+		return merged
+
+	def search(self, query: str, limit: Optional[int] = None, allowed: Optional[Set[Any]] = None) -> Tuple[List[Any], int]:
+		"""Keys of the best matches (all of them, or the top ``limit``) and the number of matches.
+
+		``allowed``, if given, is a set of keys that results are restricted to.
+		"""
+		matches = [self._matches(word) for word in dict.fromkeys(words(query))]
+		if not matches or not all(matches):
+			return [], 0
+		# Every combination of one score level per word is a disjoint group of
+		# results with the same total score; groups are taken best first.
+		groups = sorted(
+			((sum(weight for weight, _ in combo), [keys for _, keys in combo]) for combo in itertools.product(*(m.items() for m in matches))),
+			key=lambda group: group[0],
+			reverse=True,
+		)
+		results: List[Any] = []
+		total = 0
+		for _, sets in groups:
+			if allowed is not None:
+				sets.append(allowed)
+			sets.sort(key=len)
+			keys = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+			total += len(keys)
+			if limit is None:
+				results.extend(sorted(keys, reverse=True))
+			elif len(results) < limit:
+				need = limit - len(results)
+				if need >= len(keys):
+					results.extend(sorted(keys, reverse=True))
+				else:
+					# Top ``need`` without sorting the group. Sets of integer keys
+					# iterate roughly ascending, so feeding them reversed lets
+					# nlargest reject nearly every key with one comparison.
+					results.extend(heapq.nlargest(need, reversed(list(keys))))
+		return results, total
@@ -0,0 +1,250 @@
+"""SQLite storage backend.
+
+Selected with ``LAB_STORAGE_BACKEND=sqlite``; the database file defaults to
+``<LAB_DATA_DIR>/lab.sqlite3`` and can be moved with ``LAB_SQLITE_PATH``.
+Each store module keeps its public functions and swaps in its SQLite
+implementations when this backend is active, so routes are unaffected.
+
+Migrate the existing JSON files once with::
+
+	python -m app.sqlite_store [--force]
+"""
+
+import argparse
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional
+
+from . import search_index
+from .json_store import DATA_DIR, JsonStore
+
+if TYPE_CHECKING:
+	import sqlite3
+
+STORAGE_BACKEND = os.environ.get("LAB_STORAGE_BACKEND", "json").strip().lower()
+SQLITE_FILE = os.environ.get("LAB_SQLITE_PATH") or os.path.join(DATA_DIR, "lab.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+	name TEXT PRIMARY KEY,
+	next_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customers (
+	id INTEGER PRIMARY KEY,
+	name TEXT NOT NULL DEFAULT '',
+	organization TEXT NOT NULL DEFAULT '',
+	phone TEXT NOT NULL DEFAULT '',
+	address TEXT NOT NULL DEFAULT '',
+	note TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS samples (
+	id INTEGER PRIMARY KEY,
+	received_date TEXT NOT NULL DEFAULT '',
+	customer_id INTEGER,
+	sample_name TEXT NOT NULL DEFAULT '',
+	sample_code TEXT NOT NULL DEFAULT '',
+	sample_type TEXT NOT NULL DEFAULT '',
+	analysis_target TEXT NOT NULL DEFAULT '',
+	note TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_samples_customer_id ON samples (customer_id, id);
+CREATE INDEX IF NOT EXISTS idx_samples_received_date ON samples (received_date);
+CREATE INDEX IF NOT EXISTS idx_samples_sample_code ON samples (sample_code);
+-- Full-text index over the folded words of samples_store.SEARCH_FIELDS
+-- (rowid = samples.id), kept in sync by the triggers below
+CREATE VIRTUAL TABLE IF NOT EXISTS samples_fts USING fts5(
+	sample_code, sample_name, sample_type, analysis_target, note,
+	tokenize = "unicode61 remove_diacritics 0 tokenchars '_'"
+);
+CREATE TRIGGER IF NOT EXISTS samples_fts_insert AFTER INSERT ON samples BEGIN
+	INSERT INTO samples_fts (rowid, sample_code, sample_name, sample_type, analysis_target, note)
+	VALUES (new.id, lab_words(new.sample_code), lab_words(new.sample_name), lab_words(new.sample_type), lab_words(new.analysis_target), lab_words(new.note));
+END;
+CREATE TRIGGER IF NOT EXISTS samples_fts_update AFTER UPDATE ON samples BEGIN
+	DELETE FROM samples_fts WHERE rowid = old.id;
+	INSERT INTO samples_fts (rowid, sample_code, sample_name, sample_type, analysis_target, note)
+	VALUES (new.id, lab_words(new.sample_code), lab_words(new.sample_name), lab_words(new.sample_type), lab_words(new.analysis_target), lab_words(new.note));
+END;
+CREATE TRIGGER IF NOT EXISTS samples_fts_delete AFTER DELETE ON samples BEGIN
+	DELETE FROM samples_fts WHERE rowid = old.id;
+END;
+CREATE TABLE IF NOT EXISTS closed_samples (
+	id INTEGER PRIMARY KEY,
+	closing_date TEXT NOT NULL DEFAULT '',
+	customer_name TEXT NOT NULL DEFAULT '',
+	sample_name TEXT NOT NULL DEFAULT '',
+	encoding TEXT NOT NULL DEFAULT '',
+	box_symbol TEXT NOT NULL DEFAULT '',
+	weight REAL NOT NULL DEFAULT 0,
+	moisture REAL NOT NULL DEFAULT 0,
+	corrected_weight REAL NOT NULL DEFAULT 0,
+	note TEXT NOT NULL DEFAULT '',
+	created_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_closed_samples_closing_date ON closed_samples (closing_date);
+CREATE INDEX IF NOT EXISTS idx_closed_samples_customer_name ON closed_samples (customer_name);
+CREATE INDEX IF NOT EXISTS idx_closed_samples_encoding ON closed_samples (encoding);
+CREATE INDEX IF NOT EXISTS idx_closed_samples_box_symbol ON closed_samples (box_symbol);
+CREATE TABLE IF NOT EXISTS users (
+	username TEXT PRIMARY KEY,
+	password_hash TEXT NOT NULL DEFAULT '',
+	role TEXT NOT NULL DEFAULT 'user',
+	permissions TEXT NOT NULL DEFAULT '[]',
+	active INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+_local = threading.local()
+
+
+def use_sqlite() -> bool:
+	return STORAGE_BACKEND == "sqlite"
+
+
+def connect() -> "sqlite3.Connection":
+	"""Return this thread's connection, opening it (and the schema) on first use.
+
+	Connections are not shared across threads or forked workers.
+	"""
+	conn = getattr(_local, "conn", None)
+	if conn is not None and getattr(_local, "pid", None) == os.getpid():
+		return conn
+	import sqlite3  # only needed with the SQLite backend; keeps JSON-mode startup lighter
+
+	os.makedirs(os.path.dirname(SQLITE_FILE) or ".", exist_ok=True)
+	conn = sqlite3.connect(SQLITE_FILE, timeout=30, isolation_level=None)
+	conn.row_factory = sqlite3.Row
+	# Folded words joined by spaces, as stored in samples_fts
+	conn.create_function("lab_words", 1, lambda text: " ".join(search_index.words(str(text))) if text else "", deterministic=True)
+	conn.execute("PRAGMA journal_mode=WAL")
+	conn.execute("PRAGMA synchronous=NORMAL")
+	has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'samples_fts'").fetchone()
+	conn.executescript(SCHEMA)
+	if not has_fts:
+		# Databases created before the full-text index: fill it once
+		conn.execute(
+			"INSERT INTO samples_fts (rowid, sample_code, sample_name, sample_type, analysis_target, note) "
+			"SELECT id, lab_words(sample_code), lab_words(sample_name), lab_words(sample_type), lab_words(analysis_target), lab_words(note) FROM samples"
+		)
+	_local.conn = conn
+	_local.pid = os.getpid()
+	return conn
+
+
+@contextmanager
+def transaction() -> Iterator["sqlite3.Connection"]:
+	"""Run a block as one write transaction (BEGIN IMMEDIATE ... COMMIT)."""
+	conn = connect()
+	conn.execute("BEGIN IMMEDIATE")
+	try:
+		yield conn
+	except BaseException:
+		conn.execute("ROLLBACK")
+		raise
+	conn.execute("COMMIT")
+
+
+def next_id(conn: "sqlite3.Connection", name: str) -> int:
+	"""Allocate the next id for a table; must run inside transaction()."""
+	row = conn.execute("SELECT next_id FROM counters WHERE name = ?", (name,)).fetchone()
+	value = row["next_id"] if row else 1
+	conn.execute(
+		"INSERT INTO counters (name, next_id) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET next_id = excluded.next_id",
+		(name, value + 1),
+	)
+	return value
+
+
+def set_counter(conn: "sqlite3.Connection", name: str, value: int) -> None:
+	conn.execute(
+		"INSERT INTO counters (name, next_id) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET next_id = excluded.next_id",
+		(name, value),
+	)
+
+
+def rows_to_dicts(rows: List["sqlite3.Row"]) -> List[Dict[str, Any]]:
+	return [dict(row) for row in rows]
+
+
+def row_to_dict(row: Optional["sqlite3.Row"]) -> Optional[Dict[str, Any]]:
+	return dict(row) if row is not None else None
+
+
+def insert_many(conn: "sqlite3.Connection", table: str, columns: List[str], records: List[Dict[str, Any]]) -> None:
+	placeholders = ", ".join("?" for _ in columns)
+	conn.executemany(
+		f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+		[tuple(record.get(col) for col in columns) for record in records],
+	)
+
+
+SAMPLE_COLUMNS = ["id", "received_date", "customer_id", "sample_name", "sample_code", "sample_type", "analysis_target", "note"]
+CUSTOMER_COLUMNS = ["id", "name", "organization", "phone", "address", "note"]
+CLOSED_SAMPLE_COLUMNS = [
+	"id", "closing_date", "customer_name", "sample_name", "encoding", "box_symbol",
+	"weight", "moisture", "corrected_weight", "note", "created_at",
+]
+USER_COLUMNS = ["username", "password_hash", "role", "permissions", "active"]
+
+
+def _load_json(filename: str, collection: str, key: str = "id") -> Optional[Dict[str, Any]]:
+	"""A JSON store's current document: the snapshot plus its ``.log`` journal, if any."""
+	path = os.path.join(DATA_DIR, filename)
+	if not os.path.exists(path):
+		return None
+	# journal=True replays the log whatever LAB_JSON_JOURNAL says now; the
+	# store lock keeps running writers out until the document is read
+	store = JsonStore(path, lambda: {collection: []}, collection=collection, key=key, journal=True)
+	with store.locked() as document:
+		return document
+
+
+def migrate_from_json(force: bool = False) -> Dict[str, int]:
+	"""Copy data/*.json into the SQLite database. Returns row counts per table."""
+	conn = connect()
+	tables = ["customers", "samples", "closed_samples", "users"]
+	if not force:
+		for table in tables:
+			if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+				raise RuntimeError(f"Bảng '{table}' đã có dữ liệu, dùng --force để ghi đè")
+
+	counts: Dict[str, int] = {}
+	with transaction() as conn:
+		for table in tables + ["counters"]:
+			conn.execute(f"DELETE FROM {table}")
+
+		for table, filename, columns in (
+			("customers", "customers.json", CUSTOMER_COLUMNS),
+			("samples", "samples.json", SAMPLE_COLUMNS),
+			("closed_samples", "closed_samples.json", CLOSED_SAMPLE_COLUMNS),
+		):
+			document = _load_json(filename, table) or {}
+			records = document.get(table, [])
+			insert_many(conn, table, columns, records)
+			max_id = max((r.get("id", 0) for r in records), default=0)
+			set_counter(conn, table, max(document.get("next_id", 1), max_id + 1))
+			counts[table] = len(records)
+
+		users = (_load_json("users.json", "users", key="username") or {}).get("users", [])
+		insert_many(conn, "users", USER_COLUMNS, [
+			dict(u, permissions=json.dumps(u.get("permissions") or [], ensure_ascii=False), active=int(bool(u.get("active"))))
+			for u in users
+		])
+		counts["users"] = len(users)
+	return counts
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Chuyển dữ liệu từ data/*.json sang SQLite")
+	parser.add_argument("--force", action="store_true", help="Ghi đè dữ liệu đã có trong SQLite")
+	args = parser.parse_args()
+	counts = migrate_from_json(force=args.force)
+	print(f"Đã chuyển dữ liệu vào {SQLITE_FILE}:")
+	for table, count in counts.items():
+		print(f"   • {table}: {count}")
+
+
+if __name__ == "__main__":
+	main()
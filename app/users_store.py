@@ -1,10 +1,14 @@
 import json
 import os
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Optional
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from . import sqlite_store
+from .json_store import DATA_DIR, JsonStore
+
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 
 
@@ -17,15 +21,7 @@ DEFAULT_SECTIONS = [
 ]
 
 
-def _ensure_store() -> None:
-	os.makedirs(DATA_DIR, exist_ok=True)
-	if not os.path.exists(USERS_FILE):
-		seed_admin()
-
-
-def seed_admin() -> None:
-	"""Create the initial Admin user if file does not exist."""
-	os.makedirs(DATA_DIR, exist_ok=True)
+def _admin_seed() -> Dict[str, Any]:
 	admin_record = {
 		"username": "Admin",
 		"password_hash": generate_password_hash("admin"),
@@ -33,28 +29,27 @@ def seed_admin() -> None:
 		"permissions": DEFAULT_SECTIONS,
 		"active": True,
 	}
-	with open(USERS_FILE, "w", encoding="utf-8") as f:
-		json.dump({"users": [admin_record]}, f, ensure_ascii=False, indent=2)
+	return {"users": [admin_record]}
+
+
+_store = JsonStore(USERS_FILE, _admin_seed, collection="users", key="username")
+
+
+def seed_admin() -> None:
+	"""Create the initial Admin user if file does not exist."""
+	_store.write(_admin_seed())
 
 
 def load_users() -> List[Dict[str, Any]]:
-	_ensure_store()
-	with open(USERS_FILE, "r", encoding="utf-8") as f:
-		data = json.load(f)
-	return data.get("users", [])
+	return _store.read().get("users", [])
 
 
 def save_users(users: List[Dict[str, Any]]) -> None:
-	os.makedirs(DATA_DIR, exist_ok=True)
-	with open(USERS_FILE, "w", encoding="utf-8") as f:
-		json.dump({"users": users}, f, ensure_ascii=False, indent=2)
+	_store.write({"users": users})
 
 
 def get_user(username: str) -> Optional[Dict[str, Any]]:
-	for user in load_users():
-		if user.get("username") == username:
-			return user
-	return None
+	return _store.get(username)
 
 
 def create_user(username: str, password: str, role: str, permissions: List[str]) -> bool:
@@ -68,20 +63,20 @@ def create_user(username: str, password: str, role: str, permissions: List[str])
 		"permissions": permissions,
 		"active": True,
 	}
-	users = load_users()
-	users.append(user)
-	save_users(users)
+	with _store.locked():
+		if get_user(username):
+			return False
+		_store.apply(put=[user])
 	return True
 
 
 def delete_user(username: str) -> bool:
 	if username == "Admin":
 		return False
-	users = load_users()
-	new_users = [u for u in users if u.get("username") != username]
-	if len(new_users) == len(users):
-		return False
-	save_users(new_users)
+	with _store.locked():
+		if not get_user(username):
+			return False
+		_store.apply(delete=[username])
 	return True
 
 
@@ -92,17 +87,176 @@ def verify_user_credentials(username: str, password: str) -> bool:
 	return check_password_hash(user.get("password_hash", ""), password)
 
 
-def is_admin(username: str) -> bool:
-	if username == "Admin":
-		return True
+def users_version(max_age: float = 0.0) -> str:
+	"""Token that changes whenever users.json changes, in any worker.
+
+	``max_age`` > 0 lets another worker's change go unseen for that many
+	seconds in exchange for not stat'ing the files on every call.
+	"""
+	return _store.version(max_age)
+
+
+class Principal(NamedTuple):
+	"""A user's resolved authorization: computed once, then checked with set lookups."""
+	username: str
+	is_admin: bool
+	active: bool
+	permissions: FrozenSet[str]
+
+	def can(self, section: str) -> bool:
+		return self.is_admin or (self.active and section in self.permissions)
+
+
+_principals: Dict[str, Optional[Principal]] = {}
+_principals_version: Optional[str] = None
+_principals_lock = threading.Lock()
+
+
+def _build_principal(username: str) -> Optional[Principal]:
 	user = get_user(username)
-	return bool(user and user.get("role") == "admin")
+	if not user and username != "Admin":
+		return None
+	user = user or {}
+	return Principal(
+		username=username,
+		is_admin=username == "Admin" or user.get("role") == "admin",
+		active=bool(user.get("active")),
+		permissions=frozenset(user.get("permissions") or []),
+	)
+
+
+def resolve_principal(username: str) -> Optional[Principal]:
+	"""Principal for a username (None if unknown), cached until the users store changes."""
+	global _principals_version
+	version = users_version()
+	with _principals_lock:
+		if version != _principals_version:
+			_principals.clear()
+			_principals_version = version
+		if username not in _principals:
+			_principals[username] = _build_principal(username)
+		return _principals[username]
+
+
+def is_admin(username: str) -> bool:
+	principal = resolve_principal(username)
+	return bool(principal and principal.is_admin)
 
 
 def has_permission(username: str, section: str) -> bool:
-	if is_admin(username):
-		return True
-	user = get_user(username)
-	if not user or not user.get("active"):
+	principal = resolve_principal(username)
+	return bool(principal and principal.can(section))
+
+
+# SQLite backend (LAB_STORAGE_BACKEND=sqlite)
+
+_sql_seeded = False
+
+
+def _sql_user(row) -> Dict[str, Any]:
+	user = dict(row)
+	user["permissions"] = json.loads(user.get("permissions") or "[]")
+	user["active"] = bool(user.get("active"))
+	return user
+
+
+def _sql_insert_users(conn, users: List[Dict[str, Any]]) -> None:
+	_sql_bump_version(conn)
+	sqlite_store.insert_many(conn, "users", sqlite_store.USER_COLUMNS, [
+		dict(u, permissions=json.dumps(u.get("permissions") or [], ensure_ascii=False), active=int(bool(u.get("active"))))
+		for u in users
+	])
+
+
+def _sql_bump_version(conn) -> None:
+	global _sql_version
+	sqlite_store.next_id(conn, "users_version")
+	_sql_version = None
+
+
+# (version, time.monotonic() when it was read) for users_version(max_age)
+_sql_version: Optional[tuple] = None
+
+
+def _sql_users_version(max_age: float = 0.0) -> str:
+	global _sql_version
+	now = time.monotonic()
+	if _sql_version is not None and now - _sql_version[1] < max_age:
+		return _sql_version[0]
+	row = _sql_connect().execute("SELECT next_id FROM counters WHERE name = 'users_version'").fetchone()
+	version = str(row["next_id"] if row else 0)
+	_sql_version = (version, now)
+	return version
+
+
+def _sql_connect():
+	"""Connection with the Admin user seeded into an empty users table."""
+	global _sql_seeded
+	conn = sqlite_store.connect()
+	if not _sql_seeded:
+		with sqlite_store.transaction() as tx:
+			if not tx.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+				_sql_insert_users(tx, _admin_seed()["users"])
+		_sql_seeded = True
+	return conn
+
+
+def _sql_seed_admin() -> None:
+	with sqlite_store.transaction() as conn:
+		conn.execute("DELETE FROM users")
+		_sql_insert_users(conn, _admin_seed()["users"])
+
+
+def _sql_load_users() -> List[Dict[str, Any]]:
+	rows = _sql_connect().execute("SELECT * FROM users ORDER BY rowid").fetchall()
+	return [_sql_user(row) for row in rows]
+
+
+def _sql_save_users(users: List[Dict[str, Any]]) -> None:
+	_sql_connect()
+	with sqlite_store.transaction() as conn:
+		conn.execute("DELETE FROM users")
+		_sql_insert_users(conn, users)
+
+
+def _sql_get_user(username: str) -> Optional[Dict[str, Any]]:
+	row = _sql_connect().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+	return _sql_user(row) if row is not None else None
+
+
+def _sql_create_user(username: str, password: str, role: str, permissions: List[str]) -> bool:
+	username = username.strip()
+	if not username:
 		return False
-	return section in (user.get("permissions") or [])
+	_sql_connect()
+	with sqlite_store.transaction() as conn:
+		if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+			return False
+		_sql_insert_users(conn, [{
+			"username": username,
+			"password_hash": generate_password_hash(password),
+			"role": role,
+			"permissions": permissions,
+			"active": True,
+		}])
+	return True
+
+
+def _sql_delete_user(username: str) -> bool:
+	if username == "Admin":
+		return False
+	_sql_connect()
+	with sqlite_store.transaction() as conn:
+		cursor = conn.execute("DELETE FROM users WHERE username = ?", (username,))
+		_sql_bump_version(conn)
+	return cursor.rowcount > 0
+
+
+if sqlite_store.use_sqlite():
+	seed_admin = _sql_seed_admin
+	load_users = _sql_load_users
+	save_users = _sql_save_users
+	get_user = _sql_get_user
+	create_user = _sql_create_user
+	delete_user = _sql_delete_user
+	users_version = _sql_users_version
@@ -0,0 +1,122 @@
+"""Minimal streaming XLSX writer.
+
+Writes a single-sheet workbook row by row and yields the zip file in chunks,
+so an export never holds the whole workbook (or a DataFrame) in memory.
+Strings are stored as inline strings, so no shared-strings table has to be
+built up front.
+"""
+
+import re
+import zipfile
+from typing import Any, Iterable, Iterator, List, Sequence
+from xml.sax.saxutils import escape
+
+CHUNK_BYTES = 64 * 1024
+
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_CONTENT_TYPES = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+	'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+	'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+	'<Default Extension="xml" ContentType="application/xml"/>'
+	'<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+	'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+	'</Types>'
+)
+
+_ROOT_RELS = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+	'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+	'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+	'</Relationships>'
+)
+
+_WORKBOOK = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+	'<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+	'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+	'<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+	'</workbook>'
+)
+
+_WORKBOOK_RELS = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+	'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+	'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+	'</Relationships>'
+)
+
+_SHEET_START = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+	'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_SHEET_END = '</sheetData></worksheet>'
+
+
+class _Sink:
+	"""Write-only file object that collects zip output until it is drained."""
+
+	def __init__(self) -> None:
+		self._chunks: List[bytes] = []
+		self.size = 0
+
+	def write(self, data: bytes) -> int:
+		self._chunks.append(bytes(data))
+		self.size += len(data)
+		return len(data)
+
+	def flush(self) -> None:
+		pass
+
+	def drain(self) -> bytes:
+		data = b"".join(self._chunks)
+		self._chunks = []
+		self.size = 0
+		return data
+
+
+def _column_letter(index: int) -> str:
+	letters = ""
+	index += 1
+	while index:
+		index, remainder = divmod(index - 1, 26)
+		letters = chr(65 + remainder) + letters
+	return letters
+
+
+def _cell(ref: str, value: Any) -> str:
+	if value is None or value == "":
+		return ""
+	if isinstance(value, bool):
+		return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+	if isinstance(value, (int, float)) and value == value and value not in (float("inf"), float("-inf")):
+		return f'<c r="{ref}"><v>{value!r}</v></c>'
+	text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+	return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(number: int, columns: Sequence[str], values: Sequence[Any]) -> str:
+	cells = "".join(_cell(f"{column}{number}", value) for column, value in zip(columns, values))
+	return f'<row r="{number}">{cells}</row>'
+
+
+def iter_xlsx(sheet_name: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+	"""Yield an .xlsx file with one sheet: the header row followed by rows."""
+	columns = [_column_letter(i) for i in range(len(header))]
+	sink = _Sink()
+	with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+		archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+		archive.writestr("_rels/.rels", _ROOT_RELS)
+		archive.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name[:31], {'"': "&quot;"})))
+		archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+		with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+			sheet.write(_SHEET_START.encode("utf-8"))
+			sheet.write(_row(1, columns, header).encode("utf-8"))
+			for number, values in enumerate(rows, start=2):
+				sheet.write(_row(number, columns, values).encode("utf-8"))
+				if sink.size >= CHUNK_BYTES:
+					yield sink.drain()
+			sheet.write(_SHEET_END.encode("utf-8"))
+	yield sink.drain()
@@ -0,0 +1,6 @@
+"""Performance benchmarks for the LabManage stores and pages.
+
+Each benchmark points the app at a throw-away data directory through the
+``LAB_DATA_DIR`` environment variable, so the real ``data/`` files are never
+touched.
+"""
@@ -0,0 +1,96 @@
+"""Benchmark the closed-samples Excel export: wall time and peak RSS.
+
+Usage: python -m benchmarks.closed_export [--records 100000] [--methods stream pandas]
+
+"stream" is export_closed_samples_xlsx_stream (rows written straight into a
+zip stream); "pandas" is the previous DataFrame + ExcelWriter(openpyxl)
+implementation and needs pandas and openpyxl installed. Each method runs in
+its own process so that peak RSS is measured separately; "baseline" is the
+peak RSS after the store is loaded, before exporting.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _peak_rss_mb() -> float:
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is in KiB on Linux and in bytes on macOS
+	return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _pandas_export() -> bytes:
+	import io
+	import pandas as pd
+	from app.closed_samples_store import EXPORT_COLUMNS, list_closed_samples
+
+	df = pd.DataFrame(list_closed_samples())
+	df = df[[field for field, _ in EXPORT_COLUMNS if field in df.columns]]
+	df = df.rename(columns=dict(EXPORT_COLUMNS))
+	output = io.BytesIO()
+	with pd.ExcelWriter(output, engine="openpyxl") as writer:
+		df.to_excel(writer, sheet_name="Mẫu đã đóng", index=False)
+	return output.getvalue()
+
+
+def _run(method: str) -> None:
+	"""Child process: load the store, export once, print a JSON result line."""
+	from app import closed_samples_store
+
+	closed_samples_store.list_closed_samples()
+	baseline = _peak_rss_mb()
+	start = time.perf_counter()
+	if method == "stream":
+		size = sum(len(chunk) for chunk in closed_samples_store.export_closed_samples_xlsx_stream())
+	else:
+		size = len(_pandas_export())
+	elapsed = time.perf_counter() - start
+	print(json.dumps({"seconds": elapsed, "baseline_mb": baseline, "peak_mb": _peak_rss_mb(), "bytes": size}))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--records", type=int, default=100_000)
+	parser.add_argument("--methods", nargs="+", default=["stream", "pandas"], choices=["stream", "pandas"])
+	parser.add_argument("--run", choices=["stream", "pandas"], help=argparse.SUPPRESS)
+	args = parser.parse_args()
+	if args.run:
+		_run(args.run)
+		return
+
+	data_dir = tempfile.mkdtemp()
+	try:
+		from . import datasets
+		datasets.write_documents(
+			data_dir,
+			closed_samples={"next_id": args.records + 1, "closed_samples": datasets.make_closed_samples(args.records)},
+		)
+		env = dict(os.environ, LAB_DATA_DIR=data_dir, LAB_STORAGE_BACKEND="json")
+		print(f"{args.records} closed samples")
+		print(f"{'method':<8} {'seconds':>8} {'baseline MB':>12} {'peak MB':>8} {'export MB':>10} {'file KB':>8}")
+		for method in args.methods:
+			result = subprocess.run(
+				[sys.executable, "-m", "benchmarks.closed_export", "--run", method],
+				env=env, capture_output=True, text=True,
+			)
+			if result.returncode != 0:
+				print(f"{method:<8} failed: {result.stderr.strip().splitlines()[-1]}")
+				continue
+			r = json.loads(result.stdout.strip().splitlines()[-1])
+			print(
+				f"{method:<8} {r['seconds']:>8.2f} {r['baseline_mb']:>12.0f} {r['peak_mb']:>8.0f} "
+				f"{r['peak_mb'] - r['baseline_mb']:>10.0f} {r['bytes'] / 1024:>8.0f}"
+			)
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
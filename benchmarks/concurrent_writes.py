@@ -0,0 +1,103 @@
+"""Stress concurrent writers the way several gunicorn workers hit the JSON stores.
+
+Usage: python -m benchmarks.concurrent_writes [--workers 8] [--ops 250] [--journal]
+
+Each worker process inserts ``--ops`` customers, samples and closed samples
+(two boxes each) into a shared temporary data directory. Afterwards every
+store is reloaded from disk and checked for lost writes, duplicated ids and
+a ``next_id`` that lags behind the data. Exits non-zero if a check fails.
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+
+def _worker(worker: int, ops: int, start: Any) -> None:
+	from app.closed_samples_store import create_closed_sample_with_boxes
+	from app.customers_store import create_customer
+	from app.samples_store import create_sample
+
+	start.wait()
+	for i in range(ops):
+		customer_id = create_customer(f"Khách {worker}-{i}", "", "", "", "")
+		create_sample(customer_id, f"Mẫu {worker}-{i}", f"W{worker}-{i}", "", "", "")
+		create_closed_sample_with_boxes(
+			"2024-01-01", f"Khách {worker}-{i}", f"Mẫu {worker}-{i}", f"E{worker}-{i}",
+			[{"box_symbol": "A", "weight": 1.0, "moisture": 0}, {"box_symbol": "B", "weight": 2.0, "moisture": 0}],
+		)
+
+
+def _check(name: str, document: Dict[str, Any], collection: str, expected: int) -> List[str]:
+	records = document.get(collection, [])
+	ids = [r["id"] for r in records]
+	problems = []
+	if len(records) != expected:
+		problems.append(f"{name}: {len(records)} records, expected {expected} ({expected - len(records)} lost)")
+	if len(set(ids)) != len(ids):
+		problems.append(f"{name}: {len(ids) - len(set(ids))} duplicated ids")
+	if ids and document.get("next_id", 1) <= max(ids):
+		problems.append(f"{name}: next_id {document.get('next_id')} <= max id {max(ids)}")
+	return problems
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--workers", type=int, default=8)
+	parser.add_argument("--ops", type=int, default=250, help="inserts of each kind per worker")
+	parser.add_argument("--journal", action="store_true", help="run with LAB_JSON_JOURNAL=1")
+	args = parser.parse_args()
+
+	data_dir = tempfile.mkdtemp()
+	os.environ["LAB_DATA_DIR"] = data_dir
+	os.environ["LAB_STORAGE_BACKEND"] = "json"
+	if args.journal:
+		os.environ["LAB_JSON_JOURNAL"] = "1"
+		# Small limit so that compactions race with appends from other workers.
+		os.environ["LAB_JSON_JOURNAL_MAX_BYTES"] = str(64 * 1024)
+	try:
+		# spawn: every worker imports the app on its own, like gunicorn without --preload.
+		context = multiprocessing.get_context("spawn")
+		start = context.Event()
+		processes = [context.Process(target=_worker, args=(w, args.ops, start)) for w in range(args.workers)]
+		for p in processes:
+			p.start()
+		time.sleep(1.0)  # let the workers finish importing
+		started = time.perf_counter()
+		start.set()
+		for p in processes:
+			p.join()
+		elapsed = time.perf_counter() - started
+		failed_workers = sum(1 for p in processes if p.exitcode != 0)
+
+		from app.json_store import JsonStore
+		inserts = args.workers * args.ops
+		problems: List[str] = []
+		for name, collection, expected in (
+			("customers.json", "customers", inserts),
+			("samples.json", "samples", inserts),
+			("closed_samples.json", "closed_samples", inserts * 2),
+		):
+			store = JsonStore(os.path.join(data_dir, name), dict, collection=collection)
+			problems += _check(name, store.read(), collection, expected)
+		if failed_workers:
+			problems.append(f"{failed_workers} worker(s) crashed")
+
+		writes = inserts * 3
+		print(f"{args.workers} workers x {args.ops} ops: {writes} writes in {elapsed:.1f} s ({writes / elapsed:.0f} writes/s)")
+		for problem in problems:
+			print(f"FAIL {problem}")
+		if problems:
+			sys.exit(1)
+		print("OK: no lost writes, no duplicated ids")
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,67 @@
+"""Benchmark import_samples_from_csv against store size and CSV size.
+
+Usage: python -m benchmarks.csv_import [--store-sizes 10000 50000] [--rows 100 1000 5000] [--per-row]
+
+--per-row also times the old behaviour (one create_sample call, i.e. one
+full store write, per CSV row) for comparison; it is slow on big inputs.
+"""
+
+import argparse
+import csv
+import io
+import os
+import shutil
+import tempfile
+import time
+
+
+def _csv_content(rows: int) -> str:
+	from .datasets import make_samples
+	output = io.StringIO()
+	writer = csv.writer(output)
+	writer.writerow(["ID Khách hàng", "Tên mẫu", "Mã hóa mẫu", "Loại mẫu", "Chỉ tiêu phân tích", "Ghi chú"])
+	for s in make_samples(rows, customer_count=50, seed=1):
+		writer.writerow([s["customer_id"], s["sample_name"], s["sample_code"], s["sample_type"], s["analysis_target"], s["note"]])
+	return output.getvalue()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--store-sizes", type=int, nargs="+", default=[10_000, 50_000])
+	parser.add_argument("--rows", type=int, nargs="+", default=[100, 1_000, 5_000])
+	parser.add_argument("--per-row", action="store_true")
+	args = parser.parse_args()
+
+	data_dir = tempfile.mkdtemp()
+	os.environ["LAB_DATA_DIR"] = data_dir
+	from .datasets import write_dataset
+	from app import samples_store
+
+	def per_row_import(content: str) -> int:
+		reader = csv.reader(io.StringIO(content))
+		next(reader)
+		for row in reader:
+			samples_store.create_sample(int(row[0]), *row[1:])
+		return 0
+
+	print(f"{'store':>8} {'csv rows':>9} {'bulk ms':>10} {'per-row ms':>11}")
+	try:
+		for store_size in args.store_sizes:
+			for rows in args.rows:
+				content = _csv_content(rows)
+				timings = []
+				for importer in [samples_store.import_samples_from_csv] + ([per_row_import] if args.per_row else []):
+					write_dataset(data_dir, samples=store_size)
+					samples_store._store.invalidate()
+					samples_store.list_samples()
+					start = time.perf_counter()
+					importer(content)
+					timings.append((time.perf_counter() - start) * 1000)
+				per_row = f"{timings[1]:11.1f}" if len(timings) > 1 else f"{'-':>11}"
+				print(f"{store_size:>8} {rows:>9} {timings[0]:10.1f} {per_row}")
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
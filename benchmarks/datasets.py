@@ -0,0 +1,145 @@
+"""Synthetic datasets for benchmarks.
+
+Records look like the real data: Vietnamese names, places and notes (with
+diacritics), samples spread over five years, and closed samples stored as
+groups of one to four boxes sharing an encoding. ``SCALES`` names the
+standard sizes (1k/10k/100k/1M); every generator is deterministic for a
+given seed.
+"""
+
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, Any, List
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+SAMPLE_NAMES = ["Mẫu đất", "Mẫu nước sông", "Mẫu thực phẩm", "Mẫu lá chè", "Mẫu gạo", "Mẫu trầm tích"]
+SAMPLE_TYPES = ["Mẫu thực vật", "Mẫu đất", "Mẫu nước", "Mẫu sinh học"]
+ANALYSIS_TARGETS = ["Tất cả", "Kim loại nặng", "Phóng xạ", "Vi sinh"]
+NOTES = ["", "Phân tích kim loại nặng", "Đo phóng xạ trong đất", "Kiểm tra vi sinh trong thực phẩm"]
+PLACES = ["Đà Lạt", "Đức Trọng", "Bảo Lộc", "Di Linh", "Lạc Dương", "Phan Rang", "Buôn Ma Thuột", "Nha Trang", "Huế", "Cần Thơ"]
+PROVINCES = ["Lâm Đồng", "Ninh Thuận", "Đắk Lắk", "Khánh Hòa", "Thừa Thiên Huế", "Cần Thơ"]
+FAMILY_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+MIDDLE_NAMES = ["Văn", "Thị", "Hữu", "Minh", "Ngọc", "Thanh", "Đức", "Quốc"]
+GIVEN_NAMES = ["An", "Bình", "Cường", "Dũng", "Giang", "Hà", "Hùng", "Khánh", "Lan", "Linh", "Phương", "Quân", "Thảo", "Trung", "Tuấn", "Yến"]
+ORGANIZATIONS = ["Viện Nghiên cứu Hạt nhân", "Trường Đại học Đà Lạt", "Sở Tài nguyên và Môi trường", "Trung tâm Quan trắc Môi trường", "Công ty Chè Cầu Đất", "Hợp tác xã Rau Hoa"]
+
+
+def parse_scale(value: str) -> int:
+	"""Record count for a scale name ("10k") or a plain number."""
+	return SCALES.get(value.lower()) or int(value.replace("_", ""))
+
+
+def _person_name(rng: random.Random) -> str:
+	return f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}"
+
+
+def make_customers(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+	rng = random.Random(seed)
+	return [
+		{
+			"id": i,
+			"name": _person_name(rng),
+			"organization": rng.choice(ORGANIZATIONS),
+			"phone": f"09{i:08d}",
+			"address": f"{rng.choice(PLACES)}, {rng.choice(PROVINCES)}",
+			"note": rng.choice(NOTES),
+		}
+		for i in range(1, count + 1)
+	]
+
+
+def make_samples(count: int, customer_count: int, seed: int = 0) -> List[Dict[str, Any]]:
+	rng = random.Random(seed)
+	start = date(2020, 1, 1)
+	samples = []
+	for i in range(1, count + 1):
+		received = start + timedelta(days=i * 2000 // max(count, 1))
+		samples.append({
+			"id": i,
+			"received_date": received.strftime("%Y-%m-%d"),
+			"customer_id": rng.randint(1, customer_count),
+			"sample_name": f"{rng.choice(SAMPLE_NAMES)} {rng.choice(PLACES)} {i}",
+			"sample_code": f"M{i:07d}",
+			"sample_type": rng.choice(SAMPLE_TYPES),
+			"analysis_target": rng.choice(ANALYSIS_TARGETS),
+			"note": rng.choice(NOTES),
+		})
+	return samples
+
+
+def write_dataset(data_dir: str, samples: int, customers: int = 50) -> None:
+	"""Write customers.json and samples.json with the given sizes into data_dir."""
+	write_documents(
+		data_dir,
+		customers={"next_id": customers + 1, "customers": make_customers(customers)},
+		samples={"next_id": samples + 1, "samples": make_samples(samples, customers)},
+	)
+
+
+def make_closed_samples(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+	"""Closed-sample records in groups of 1-4 boxes (B1, B2, ...) sharing one encoding."""
+	rng = random.Random(seed)
+	start = date(2020, 1, 1)
+	closed = []
+	group = 0
+	while len(closed) < count:
+		group += 1
+		i = len(closed) + 1
+		closing_date = (start + timedelta(days=i * 2000 // max(count, 1))).strftime("%Y-%m-%d")
+		customer_name = _person_name(rng)
+		sample_name = f"{rng.choice(SAMPLE_NAMES)} {rng.choice(PLACES)} {group}"
+		note = rng.choice(NOTES)
+		for box in range(1, min(rng.randint(1, 4), count - len(closed)) + 1):
+			weight = round(rng.uniform(0.1, 5.0), 3)
+			moisture = round(rng.uniform(0, 15), 2)
+			closed.append({
+				"id": len(closed) + 1,
+				"closing_date": closing_date,
+				"customer_name": customer_name,
+				"sample_name": sample_name,
+				"encoding": f"E{group:07d}",
+				"box_symbol": f"B{box}",
+				"weight": weight,
+				"moisture": moisture,
+				"corrected_weight": weight - weight * moisture / 100,
+				"note": note,
+				"created_at": f"{closing_date}T08:00:00",
+			})
+	return closed
+
+
+def make_users(count: int) -> List[Dict[str, Any]]:
+	# A fixed, cheap hash: benchmarks never log in with these users
+	return [
+		{
+			"username": f"user{i}",
+			"password_hash": "pbkdf2:sha256:1$bench$0",
+			"role": "user",
+			"permissions": ["receiving", "closing"],
+			"active": True,
+		}
+		for i in range(1, count + 1)
+	]
+
+
+def write_documents(data_dir: str, **documents: Dict[str, Any]) -> None:
+	"""Write documents given as filename stem -> document (e.g. closed_samples={...})."""
+	os.makedirs(data_dir, exist_ok=True)
+	for stem, document in documents.items():
+		with open(os.path.join(data_dir, f"{stem}.json"), "w", encoding="utf-8") as f:
+			json.dump(document, f, ensure_ascii=False, indent=2)
+
+
+def write_scale(data_dir: str, size: int, seed: int = 0) -> None:
+	"""Write every store at one scale: size samples and closed samples, size // 100 customers (at least 50) and users."""
+	customers = max(50, size // 100)
+	write_documents(
+		data_dir,
+		customers={"next_id": customers + 1, "customers": make_customers(customers, seed)},
+		samples={"next_id": size + 1, "samples": make_samples(size, customers, seed)},
+		closed_samples={"next_id": size + 1, "closed_samples": make_closed_samples(size, seed)},
+		users={"users": make_users(customers)},
+	)
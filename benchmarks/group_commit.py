@@ -0,0 +1,78 @@
+"""Benchmark burst inserts into closed_samples.json with and without group commit.
+
+Usage: python -m benchmarks.group_commit [--records 20000] [--threads 16] [--inserts 20] [--windows 0 5 10 20] [--journal]
+
+Simulates a batch being closed: --threads request threads each call
+create_closed_sample --inserts times back to back. A window of 0 is the
+plain one-write-per-insert path; other windows coalesce concurrent inserts
+into one durable write.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--records", type=int, default=20_000, help="closed samples already stored")
+	parser.add_argument("--threads", type=int, default=16)
+	parser.add_argument("--inserts", type=int, default=20, help="inserts per thread")
+	parser.add_argument("--windows", type=float, nargs="+", default=[0, 5, 10, 20], help="group commit windows in ms")
+	parser.add_argument("--journal", action="store_true", help="use the journaled store")
+	args = parser.parse_args()
+
+	data_dir = tempfile.mkdtemp()
+	os.environ["LAB_DATA_DIR"] = data_dir
+	from . import datasets
+	from app import closed_samples_store
+
+	store = closed_samples_store._store
+	store.journal = args.journal
+	print(f"{'window ms':>9} {'inserts/s':>10} {'commits':>8} {'avg batch':>10} {'max batch':>10} {'avg write ms':>13} {'avg ack ms':>11} {'max ack ms':>11}")
+	try:
+		for window in args.windows:
+			datasets.write_documents(
+				data_dir,
+				closed_samples={"next_id": args.records + 1, "closed_samples": datasets.make_closed_samples(args.records)},
+			)
+			if os.path.exists(store.log_path):
+				os.remove(store.log_path)
+			store.invalidate()
+			store.read()
+			store.group_commit_ms = window
+			for name in store.commit_stats:
+				store.commit_stats[name] = 0
+
+			def burst(thread: int) -> None:
+				for i in range(args.inserts):
+					closed_samples_store.create_closed_sample("2024-01-01", "Khách", f"Mẫu {thread}-{i}", f"E{thread}-{i}", "A", 1.0, 0.0)
+
+			threads = [threading.Thread(target=burst, args=(t,)) for t in range(args.threads)]
+			start = time.perf_counter()
+			for t in threads:
+				t.start()
+			for t in threads:
+				t.join()
+			elapsed = time.perf_counter() - start
+
+			stats = store.commit_stats
+			inserts = args.threads * args.inserts
+			store.invalidate()
+			stored = len(store.read()["closed_samples"])
+			assert stored == args.records + inserts, f"expected {args.records + inserts} records, found {stored}"
+			commits = stats["commits"] or 1
+			print(
+				f"{window:>9g} {inserts / elapsed:>10.0f} {stats['commits']:>8.0f} {stats['mutations'] / commits:>10.1f} "
+				f"{stats['max_batch_size']:>10.0f} {stats['commit_seconds'] / commits * 1000:>13.1f} "
+				f"{stats['latency_seconds'] / commits * 1000:>11.1f} {stats['max_latency_seconds'] * 1000:>11.1f}"
+			)
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
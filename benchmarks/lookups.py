@@ -0,0 +1,70 @@
+"""Micro-benchmark primary-key lookups in every store at several sizes.
+
+Usage: python -m benchmarks.lookups [--sizes 1000 10000 100000] [--lookups 2000]
+
+"scan" is the previous implementation (a linear search over the cached
+list) for comparison; "indexed" is the store function itself.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, List
+
+
+def _per_call_us(fn: Callable[[Any], Any], keys: List[Any]) -> float:
+	start = time.perf_counter()
+	for key in keys:
+		fn(key)
+	return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+	parser.add_argument("--lookups", type=int, default=2_000)
+	args = parser.parse_args()
+
+	data_dir = tempfile.mkdtemp()
+	os.environ["LAB_DATA_DIR"] = data_dir
+	from . import datasets
+	from app import samples_store, customers_store, closed_samples_store, users_store
+
+	stores = [
+		("get_sample", samples_store, samples_store.get_sample, "id"),
+		("get_customer", customers_store, customers_store.get_customer, "id"),
+		("get_closed_sample", closed_samples_store, closed_samples_store.get_closed_sample, "id"),
+		("get_user", users_store, users_store.get_user, "username"),
+	]
+	rng = random.Random(0)
+	print(f"{'function':<18} {'records':>8} {'scan us':>10} {'indexed us':>11}")
+	try:
+		for size in args.sizes:
+			datasets.write_documents(
+				data_dir,
+				samples={"next_id": size + 1, "samples": datasets.make_samples(size, 50)},
+				customers={"next_id": size + 1, "customers": datasets.make_customers(size)},
+				closed_samples={"next_id": size + 1, "closed_samples": datasets.make_closed_samples(size)},
+				users={"users": datasets.make_users(size)},
+			)
+			for name, module, lookup, key in stores:
+				module._store.invalidate()
+				records = module._store.read()[module._store.collection]
+				keys = [rng.choice(records)[key] for _ in range(args.lookups)]
+
+				def scan(value: Any) -> Any:
+					for record in module._store.read()[module._store.collection]:
+						if record.get(key) == value:
+							return record
+					return None
+
+				print(f"{name:<18} {size:>8} {_per_call_us(scan, keys):10.1f} {_per_call_us(lookup, keys):11.2f}")
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,100 @@
+"""Benchmark the memory held by loaded samples and closed samples: RSS per 100k records.
+
+Usage: python -m benchmarks.memory [--records 100000] [--modes dict compact]
+
+"compact" is the stores as configured (records kept as slotted Record
+objects with interned shared strings); "dict" turns record_type off so
+the records stay the dicts that json.loads produced, as before. Each mode
+runs in its own process. "RSS" is the resident set after loading both
+stores minus the RSS after importing the app; "peak" is the growth of the
+peak RSS, which includes the parsed JSON during the load.
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("dict", "compact")
+
+
+def _peak_rss_mb() -> float:
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is in KiB on Linux and in bytes on macOS
+	return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _rss_mb() -> float:
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+	except OSError:  # not Linux: the peak is the best we have
+		return _peak_rss_mb()
+
+
+def _run(mode: str) -> None:
+	"""Child process: load both stores, print a JSON result line."""
+	from app import closed_samples_store, samples_store
+
+	stores = (samples_store._store, closed_samples_store._store)
+	if mode == "dict":
+		for store in stores:
+			store.record_type = None
+	gc.collect()
+	baseline, baseline_peak = _rss_mb(), _peak_rss_mb()
+	start = time.perf_counter()
+	count = len(samples_store.list_samples()) + len(closed_samples_store.list_closed_samples())
+	elapsed = time.perf_counter() - start
+	gc.collect()
+	print(json.dumps({
+		"seconds": elapsed,
+		"rss_mb": _rss_mb() - baseline,
+		"peak_mb": _peak_rss_mb() - baseline_peak,
+		"records": count,
+	}))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--records", type=int, default=100_000, help="samples and closed samples each")
+	parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+	parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+	args = parser.parse_args()
+	if args.run:
+		_run(args.run)
+		return
+
+	data_dir = tempfile.mkdtemp()
+	try:
+		from . import datasets
+		datasets.write_documents(
+			data_dir,
+			samples={"next_id": args.records + 1, "samples": datasets.make_samples(args.records, 50)},
+			closed_samples={"next_id": args.records + 1, "closed_samples": datasets.make_closed_samples(args.records)},
+		)
+		env = dict(os.environ, LAB_DATA_DIR=data_dir, LAB_STORAGE_BACKEND="json", LAB_JSON_JOURNAL="0")
+		per = 100_000 / args.records
+		print(f"{args.records} samples + {args.records} closed samples")
+		print(f"{'mode':<8} {'load s':>7} {'RSS MB':>7} {'peak MB':>8} {'RSS MB/100k samples+closed':>27}")
+		for mode in args.modes:
+			result = subprocess.run(
+				[sys.executable, "-m", "benchmarks.memory", "--run", mode],
+				env=env, capture_output=True, text=True,
+			)
+			if result.returncode != 0:
+				print(f"{mode:<8} failed: {result.stderr.strip().splitlines()[-1]}")
+				continue
+			r = json.loads(result.stdout.strip().splitlines()[-1])
+			print(f"{mode:<8} {r['seconds']:>7.2f} {r['rss_mb']:>7.0f} {r['peak_mb']:>8.0f} {r['rss_mb'] * per:>27.1f}")
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,67 @@
+"""Benchmark /receiving latency with and without the parsed-document cache.
+
+Usage: python -m benchmarks.receiving_latency [--samples 50000] [--requests 50]
+
+The "uncached" run forces every JsonStore read to re-parse its file, which is
+how the stores behaved before the in-process cache was introduced.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+
+def _measure(client, requests: int) -> List[float]:
+	timings = []
+	for i in range(requests):
+		start = time.perf_counter()
+		response = client.get(f"/receiving?page={i % 10 + 1}")
+		timings.append((time.perf_counter() - start) * 1000)
+		assert response.status_code == 200, response.status_code
+	return timings
+
+
+def _report(label: str, timings: List[float]) -> None:
+	timings = sorted(timings)
+	p95 = timings[int(len(timings) * 0.95) - 1]
+	print(f"{label:<10} mean {statistics.mean(timings):8.2f} ms   median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--samples", type=int, default=50_000)
+	parser.add_argument("--requests", type=int, default=50)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as data_dir:
+		os.environ["LAB_DATA_DIR"] = data_dir
+		from .datasets import write_dataset
+		write_dataset(data_dir, samples=args.samples)
+
+		from app import create_app
+		from app.json_store import JsonStore
+
+		app = create_app()
+		client = app.test_client()
+		with client.session_transaction() as session:
+			session["user_id"] = "Admin"
+			session["username"] = "Admin"
+
+		print(f"/receiving with {args.samples} samples, {args.requests} requests")
+		original_read = JsonStore.read
+
+		def uncached_read(self):
+			self.invalidate()
+			return original_read(self)
+
+		JsonStore.read = uncached_read
+		_report("uncached", _measure(client, args.requests))
+		JsonStore.read = original_read
+		_report("cached", _measure(client, args.requests))
+
+
+if __name__ == "__main__":
+	main()
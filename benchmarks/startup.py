@@ -0,0 +1,91 @@
+"""Measure worker cold start and check it against a time budget.
+
+Usage: python -m benchmarks.startup [--runs 5] [--budget-ms 800] [--profile] [--top 15]
+
+Each run starts a fresh interpreter that imports ``app`` and calls
+``create_app()``, the work a gunicorn worker does before serving its first
+request. Exits non-zero when the median exceeds --budget-ms, so it can be
+used as a check in CI. --profile adds an import profile (``-X importtime``):
+the slowest modules by self time and the app's own modules.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+_CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_ms": (created - imported) * 1000}))
+"""
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUDGET_MS = 800
+
+
+def measure(runs: int) -> List[Dict[str, float]]:
+	"""{"import_ms", "create_ms"} for each of ``runs`` fresh interpreters."""
+	results = []
+	for _ in range(runs):
+		result = subprocess.run([sys.executable, "-c", _CHILD], cwd=_ROOT, capture_output=True, text=True, check=True)
+		results.append(json.loads(result.stdout.strip().splitlines()[-1]))
+	return results
+
+
+def _import_profile() -> List[Tuple[int, int, str]]:
+	"""(self us, cumulative us, module) for every module imported by create_app()."""
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", "import app; app.create_app()"],
+		cwd=_ROOT, capture_output=True, text=True, check=True,
+	)
+	rows = []
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "self [us]" in line:
+			continue
+		self_us, cumulative_us, name = line[len("import time:"):].split("|")
+		rows.append((int(self_us), int(cumulative_us), name.strip()))
+	return rows
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--runs", type=int, default=5)
+	parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+	parser.add_argument("--profile", action="store_true", help="print an -X importtime report")
+	parser.add_argument("--top", type=int, default=15)
+	args = parser.parse_args()
+
+	if args.profile:
+		rows = _import_profile()
+		total_us = sum(self_us for self_us, _, _ in rows)
+		print(f"{len(rows)} modules imported, {total_us / 1000:.0f} ms in total")
+		print(f"\nslowest {args.top} modules by self time:")
+		for self_us, cumulative_us, name in sorted(rows, reverse=True)[:args.top]:
+			print(f"  {self_us / 1000:>7.1f} ms  {name}")
+		print("\napp modules (cumulative):")
+		for self_us, cumulative_us, name in rows:
+			if name == "app" or name.startswith("app."):
+				print(f"  {cumulative_us / 1000:>7.1f} ms  {name}")
+		print()
+
+	runs = measure(args.runs)
+	import_ms = statistics.median(r["import_ms"] for r in runs)
+	create_ms = statistics.median(r["create_ms"] for r in runs)
+	total_ms = statistics.median(r["import_ms"] + r["create_ms"] for r in runs)
+	print(f"median of {args.runs} runs: import app {import_ms:.0f} ms, create_app() {create_ms:.0f} ms, total {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+	if total_ms > args.budget_ms:
+		print("FAIL: cold start is over budget")
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
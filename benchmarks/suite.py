@@ -0,0 +1,317 @@
+"""Benchmark suite for the store functions, with JSON results for regression comparison.
+
+Usage:
+	python -m benchmarks.suite [--scales 1k 10k] [--only list_samples] [--save]
+	python -m benchmarks.suite --scales 10k --compare .benchmarks/<earlier>.json [--fail-above 20]
+
+Each benchmark runs against a generated dataset (benchmarks.datasets) in a
+temporary data directory, at every requested scale (1k/10k/100k/1M or a
+number). Functions are timed the way pytest-benchmark does: a warm-up
+call, then rounds until --max-time is used up (at least --min-rounds);
+benchmarks that add records run a fixed number of rounds instead. --save
+writes the results to .benchmarks/<commit>-<time>.json (or --json PATH);
+--compare prints the change in median time against an earlier result
+file and, with --fail-above, exits non-zero when a benchmark got slower by
+more than that many percent.
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = ".benchmarks"
+
+
+class Benchmark:
+	"""Times one function and keeps its statistics (a small pytest-benchmark fixture)."""
+
+	def __init__(self, max_time: float, min_rounds: int) -> None:
+		self.max_time = max_time
+		self.min_rounds = min_rounds
+		self.timings: List[float] = []
+
+	def __call__(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+		result = fn(*args, **kwargs)
+		deadline = time.perf_counter() + self.max_time
+		while len(self.timings) < self.min_rounds or time.perf_counter() < deadline:
+			start = time.perf_counter()
+			fn(*args, **kwargs)
+			self.timings.append(time.perf_counter() - start)
+		return result
+
+	def pedantic(self, fn: Callable[..., Any], args: tuple = (), rounds: int = 5, setup: Optional[Callable[[], Any]] = None) -> Any:
+		"""Run exactly ``rounds`` timed calls, calling ``setup`` untimed before each."""
+		result = None
+		for _ in range(rounds):
+			if setup is not None:
+				setup()
+			start = time.perf_counter()
+			result = fn(*args)
+			self.timings.append(time.perf_counter() - start)
+		return result
+
+	def stats(self) -> Dict[str, float]:
+		timings = sorted(self.timings)
+		quartiles = statistics.quantiles(timings, n=4) if len(timings) > 1 else [timings[0]] * 3
+		mean = statistics.fmean(timings)
+		return {
+			"min": timings[0],
+			"max": timings[-1],
+			"mean": mean,
+			"stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+			"median": statistics.median(timings),
+			"iqr": quartiles[2] - quartiles[0],
+			"rounds": len(timings),
+			"ops": 1 / mean if mean else 0.0,
+		}
+
+
+def _import_csv(rows: int, customers: int) -> str:
+	from .datasets import make_samples
+	output = io.StringIO()
+	writer = csv.writer(output)
+	writer.writerow(["ID Khách hàng", "Tên mẫu", "Mã hóa mẫu", "Loại mẫu", "Chỉ tiêu phân tích", "Ghi chú"])
+	for s in make_samples(rows, customer_count=customers, seed=1):
+		writer.writerow([s["customer_id"], s["sample_name"], s["sample_code"], s["sample_type"], s["analysis_target"], s["note"]])
+	return output.getvalue()
+
+
+# Benchmarks: name -> function(benchmark, size, customers). Stores are loaded
+# (cache warm) before each one runs, as in a worker that has served requests.
+
+def bench_list_samples_paginated(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import list_samples_paginated
+	benchmark(list_samples_paginated, max(1, size // 40), 20)
+
+
+def bench_list_samples_paginated_customer(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import list_samples_paginated
+	benchmark(list_samples_paginated, 2, 20, customers // 2)
+
+
+def bench_list_samples_after(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import list_samples, list_samples_after
+	middle = list_samples()[size // 2]
+	# A page in the middle of the walk
+	benchmark(list_samples_after, "received_date", (middle["received_date"], middle["id"]), 50, True)
+
+
+def bench_list_samples_after_customer(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import list_samples, list_samples_after
+	middle = list_samples()[size // 2]
+	benchmark(list_samples_after, "id", (middle["id"], middle["id"]), 50, False, customers // 2)
+
+
+def bench_list_samples_between(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import list_samples, list_samples_between
+	samples = list_samples()
+	# A window of about 200 samples at every scale, so the time shows the log N lookup, not k
+	first, last = samples[size // 2], samples[min(size // 2 + 200, size - 1)]
+	benchmark(list_samples_between, first["received_date"], last["received_date"])
+
+
+def bench_search_samples(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import search_samples
+	search_samples("")  # the index is built once per worker, not per query
+	queries = ["mau dat", "Mẫu nước sông Đà Lạt", f"M{size // 2:07d}", "duc trong 7", "phong xa bao loc"]
+
+	def run_queries() -> None:
+		for query in queries:
+			search_samples(query)
+
+	# One round is one search of each query
+	benchmark(run_queries)
+
+
+def bench_import_samples_from_csv(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import import_samples_from_csv
+	content = _import_csv(100, customers)
+	count, errors = benchmark.pedantic(import_samples_from_csv, (content,), rounds=5)
+	assert count == 100 and not errors, errors
+
+
+def bench_export_samples_to_excel(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.samples_store import export_samples_to_excel
+	benchmark(export_samples_to_excel)
+
+
+def bench_list_closed_samples_paginated(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.closed_samples_store import list_closed_samples_paginated
+	pages = [
+		(),
+		(3, 20, "customer_name", False),
+		(1, 20, "closing_date", True, "2022-01-01", "2022-03-31"),
+		(1, 20, "closing_date", True, None, None, None, None, "B2"),
+	]
+
+	def run_pages() -> None:
+		for args in pages:
+			list_closed_samples_paginated(*args)
+
+	# One round is one request of each page
+	benchmark(run_pages)
+
+
+def bench_list_closed_samples_between(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.closed_samples_store import list_closed_samples_between
+	closed_samples = list_closed_samples_between()
+	# About 200 boxes at every scale, as for list_samples_between
+	first, last = closed_samples[size // 2], closed_samples[min(size // 2 + 200, size - 1)]
+	benchmark(list_closed_samples_between, first["closing_date"], last["closing_date"])
+
+
+def bench_create_closed_sample_with_boxes(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.closed_samples_store import create_closed_sample_with_boxes
+	boxes = [{"box_symbol": f"B{i}", "weight": 1.25 * i, "moisture": 8.5} for i in range(1, 4)]
+	counter = iter(range(10**9))
+
+	def create() -> List[int]:
+		return create_closed_sample_with_boxes("2024-05-01", "Nguyễn Văn An", "Mẫu đất Đà Lạt", f"BENCH{next(counter)}", boxes, "Đo phóng xạ trong đất")
+
+	benchmark.pedantic(create, rounds=10)
+
+
+def bench_has_permission(benchmark: Benchmark, size: int, customers: int) -> None:
+	from app.users_store import has_permission
+	rng = random.Random(0)
+	checks = [(f"user{rng.randint(1, customers)}", rng.choice(["receiving", "closing", "users"])) for _ in range(1_000)]
+
+	def check_all() -> None:
+		for username, section in checks:
+			has_permission(username, section)
+
+	# One round is 1000 checks
+	benchmark(check_all)
+
+
+BENCHMARKS: Dict[str, Callable[[Benchmark, int, int], None]] = {
+	name[len("bench_"):]: fn for name, fn in list(globals().items()) if name.startswith("bench_")
+}
+
+
+def _git(*args: str) -> str:
+	try:
+		return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return ""
+
+
+def _commit_info() -> Dict[str, Any]:
+	return {
+		"id": _git("rev-parse", "HEAD"),
+		"branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+		"dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+	}
+
+
+def _machine_info() -> Dict[str, Any]:
+	return {
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpu_count": os.cpu_count(),
+		# Store configuration is read at import time and changes the numbers
+		"env": {key: value for key, value in sorted(os.environ.items()) if key.startswith("LAB_") and key != "LAB_DATA_DIR"},
+	}
+
+
+def run(scales: List[str], only: List[str], max_time: float, min_rounds: int) -> List[Dict[str, Any]]:
+	data_dir = tempfile.mkdtemp()
+	os.environ["LAB_DATA_DIR"] = data_dir
+	from . import datasets
+	from app import closed_samples_store, customers_store, samples_store, users_store
+
+	selected = [name for name in BENCHMARKS if not only or any(part in name for part in only)]
+	results = []
+	print(f"{'benchmark':<40} {'median ms':>10} {'min ms':>9} {'stddev ms':>10} {'rounds':>7}")
+	try:
+		for scale in scales:
+			size = datasets.parse_scale(scale)
+			customers = max(50, size // 100)
+			for name in selected:
+				# A fresh dataset per benchmark: some of them add records
+				datasets.write_scale(data_dir, size)
+				for module in (customers_store, samples_store, closed_samples_store, users_store):
+					module._store.invalidate()
+					module._store.read()
+				benchmark = Benchmark(max_time, min_rounds)
+				BENCHMARKS[name](benchmark, size, customers)
+				stats = benchmark.stats()
+				fullname = f"{name}[{scale}]"
+				results.append({"name": name, "fullname": fullname, "params": {"scale": scale, "size": size}, "stats": stats})
+				print(f"{fullname:<40} {stats['median'] * 1000:10.3f} {stats['min'] * 1000:9.3f} {stats['stddev'] * 1000:10.3f} {stats['rounds']:>7}")
+	finally:
+		shutil.rmtree(data_dir, ignore_errors=True)
+	return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> float:
+	"""Print median change against a saved result file; returns the worst slowdown in percent."""
+	with open(baseline_path, encoding="utf-8") as f:
+		baseline = json.load(f)
+	previous = {entry["fullname"]: entry["stats"] for entry in baseline["benchmarks"]}
+	commit = baseline.get("commit_info", {}).get("id", "")[:10] or "?"
+	print()
+	print(f"Compared with {baseline_path} (commit {commit}):")
+	print(f"{'benchmark':<40} {'before ms':>10} {'after ms':>10} {'change':>8}")
+	worst = 0.0
+	for entry in results:
+		old = previous.get(entry["fullname"])
+		if old is None:
+			continue
+		before, after = old["median"], entry["stats"]["median"]
+		change = (after - before) / before * 100 if before else 0.0
+		worst = max(worst, change)
+		print(f"{entry['fullname']:<40} {before * 1000:10.3f} {after * 1000:10.3f} {change:+7.1f}%")
+	return worst
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--scales", nargs="+", default=["1k", "10k"], help="1k, 10k, 100k, 1m or a record count")
+	parser.add_argument("--only", nargs="+", default=[], help="run benchmarks whose name contains one of these")
+	parser.add_argument("--max-time", type=float, default=1.0, help="seconds of timed rounds per benchmark")
+	parser.add_argument("--min-rounds", type=int, default=5)
+	parser.add_argument("--save", action="store_true", help=f"save results under {RESULTS_DIR}/")
+	parser.add_argument("--json", help="save results to this file")
+	parser.add_argument("--compare", help="earlier result file to compare against")
+	parser.add_argument("--fail-above", type=float, help="with --compare, exit 1 if a median grew by more than this percent")
+	args = parser.parse_args()
+
+	results = run(args.scales, args.only, args.max_time, args.min_rounds)
+	commit_info = _commit_info()
+	document = {
+		"machine_info": _machine_info(),
+		"commit_info": commit_info,
+		"datetime": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+		"benchmarks": results,
+	}
+	path = args.json
+	if args.save and not path:
+		os.makedirs(RESULTS_DIR, exist_ok=True)
+		stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+		path = os.path.join(RESULTS_DIR, f"{(commit_info['id'] or 'nogit')[:10]}{'-dirty' if commit_info['dirty'] else ''}-{stamp}.json")
+	if path:
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump(document, f, ensure_ascii=False, indent=2)
+		print(f"\nSaved {path}")
+	if args.compare:
+		worst = compare(results, args.compare)
+		if args.fail_above is not None and worst > args.fail_above:
+			print(f"\nSlower by {worst:.1f}% (limit {args.fail_above:g}%)")
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
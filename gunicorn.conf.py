@@ -0,0 +1,22 @@
+"""Gunicorn settings, picked up automatically from the working directory.
+
+LAB_PRELOAD=1 loads and warms up the app in the master process before the
+workers are forked, so workers start without import/parse spikes and share
+those pages copy-on-write.
+"""
+
+import gc
+import os
+
+preload_app = os.environ.get("LAB_PRELOAD", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def when_ready(server):
+	if not preload_app:
+		return
+	from app import warm_up
+
+	warm_up(server.app.wsgi())
+	# Keep the garbage collector in the workers from touching (and so copying)
+	# every object that was loaded in the master.
+	gc.freeze()
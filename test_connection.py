@@ -1,13 +1,32 @@
 #!/usr/bin/env python3
 """
 Script test kết nối mạng cho LabManage
+
+    python test_connection.py          # kiểm tra port và HTTP như trước
+    python test_connection.py load ... # tạo tải đồng thời, xem --help
+
+Chế độ "load" đăng nhập bằng nhiều client đồng thời rồi chạy một hỗn hợp yêu
+cầu (phân trang /receiving, tạo mẫu, import CSV, xuất CSV, đóng mẫu) và báo
+cáo thông lượng cùng độ trễ p50/p95/p99 theo từng loại yêu cầu. Với --local,
+ứng dụng được khởi động ngay trong tiến trình này trên một bộ dữ liệu sinh
+sẵn (thư mục tạm), không đụng tới data/.
 """
 
+import argparse
+import http.cookiejar
+import math
+import os
+import random
+import shutil
 import socket
-import requests
-import time
+import sys
+import tempfile
 import threading
-from urllib.parse import urljoin
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
 
 def test_port_open(host, port, timeout=3):
     """Test xem port có mở không"""
@@ -23,12 +42,14 @@ def test_port_open(host, port, timeout=3):
 def test_http_response(url, timeout=5):
     """Test HTTP response"""
     try:
-        response = requests.get(url, timeout=timeout)
-        return response.status_code == 200, response.status_code
-    except requests.exceptions.ConnectionError:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200, response.status
+    except urllib.error.HTTPError as e:
+        return False, e.code
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, socket.timeout):
+            return False, "Timeout"
         return False, "Connection Error"
-    except requests.exceptions.Timeout:
-        return False, "Timeout"
     except Exception as e:
         return False, str(e)
 
@@ -37,23 +58,23 @@ def main():
     print("    TEST KẾT NỐI LAB MANAGE")
     print("=" * 50)
     print()
-    
+
     # Thông tin server
     local_ip = "192.168.1.201"
     port = 5000
     local_url = f"http://localhost:{port}"
     network_url = f"http://{local_ip}:{port}"
-    
+
     print(f"🔍 Đang test kết nối...")
     print(f"   • Local: {local_url}")
     print(f"   • Network: {network_url}")
     print()
-    
+
     # Test port local
     print("1️⃣ Test port local (localhost:5000)...")
     if test_port_open("localhost", port):
         print("   ✅ Port local mở")
-        
+
         # Test HTTP response
         success, status = test_http_response(local_url)
         if success:
@@ -63,12 +84,12 @@ def main():
     else:
         print("   ❌ Port local không mở")
     print()
-    
+
     # Test port network
     print("2️⃣ Test port network (192.168.1.201:5000)...")
     if test_port_open(local_ip, port):
         print("   ✅ Port network mở")
-        
+
         # Test HTTP response
         success, status = test_http_response(network_url)
         if success:
@@ -78,14 +99,14 @@ def main():
     else:
         print("   ❌ Port network không mở")
     print()
-    
+
     print("=" * 50)
     print("KẾT QUẢ:")
     print("=" * 50)
-    
+
     local_ok = test_port_open("localhost", port)
     network_ok = test_port_open(local_ip, port)
-    
+
     if local_ok and network_ok:
         print("🎉 Server hoạt động tốt!")
         print(f"   • Truy cập từ máy này: {local_url}")
@@ -99,5 +120,255 @@ def main():
         print("   • Chạy: python -m app")
         print("   • Hoặc: start_server.bat")
 
+
+# ---------------------------------------------------------------------------
+# Load test
+# ---------------------------------------------------------------------------
+
+DEFAULT_MIX = "receiving=60,create=10,import=5,export=5,closing=20"
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Đo riêng từng yêu cầu: không tự đi theo redirect sau POST"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """Một người dùng: phiên đăng nhập riêng (cookie) và các thao tác trong hỗn hợp"""
+
+    def __init__(self, base_url, customer_ids, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.customer_ids = customer_ids
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+        self.rng = random.Random()
+
+    def request(self, path, data=None, headers=None):
+        """Gửi yêu cầu, đọc hết body; trả về mã trạng thái (3xx được coi là thành công)"""
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def post_form(self, path, fields):
+        return self.request(path, urllib.parse.urlencode(fields).encode("utf-8"),
+                            {"Content-Type": "application/x-www-form-urlencoded"})
+
+    def login(self, username, password):
+        status = self.post_form("/login", {"username": username, "password": password})
+        if status != 302:
+            raise RuntimeError(f"Đăng nhập thất bại (HTTP {status})")
+
+    def receiving(self):
+        return self.request(f"/receiving?page={self.rng.randint(1, 20)}")
+
+    def create(self):
+        return self.post_form("/receiving/create", {
+            "customer_id": self.rng.choice(self.customer_ids),
+            "sample_name": f"Mẫu đất tải {self.rng.randint(1, 10**6)}",
+            "sample_code": f"LT-{uuid.uuid4().hex[:8]}",
+            "sample_type": "Đất",
+            "analysis_target": "Kim loại nặng",
+            "note": "",
+        })
+
+    def csv_import(self, rows=20):
+        lines = ["ID Khách hàng,Tên mẫu,Mã hóa mẫu,Loại mẫu,Chỉ tiêu phân tích,Ghi chú"]
+        for _ in range(rows):
+            lines.append(f"{self.rng.choice(self.customer_ids)},Mẫu nước {self.rng.randint(1, 10**6)},"
+                         f"LT-{uuid.uuid4().hex[:8]},Nước,Asen,")
+        content = ("\n".join(lines) + "\n").encode("utf-8")
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="csv_file"; filename="tai.csv"\r\n'
+            "Content-Type: text/csv\r\n\r\n"
+        ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        return self.request("/receiving/import", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    def export(self):
+        customer = self.rng.choice(self.customer_ids + [None])
+        return self.request("/receiving/export" + (f"?customer_id={customer}" if customer else ""))
+
+    def closing(self):
+        boxes = self.rng.randint(1, 3)
+        fields = {
+            "closing_date": time.strftime("%Y-%m-%d"),
+            "customer_name": "Khách tải",
+            "sample_name": f"Mẫu đóng {self.rng.randint(1, 10**6)}",
+            "encoding": f"E-{uuid.uuid4().hex[:6]}",
+        }
+        for i in range(boxes):
+            fields[f"boxes[{i}][box_symbol]"] = f"B{i + 1}"
+            fields[f"boxes[{i}][weight]"] = f"{self.rng.uniform(0.5, 5):.3f}"
+            fields[f"boxes[{i}][moisture]"] = f"{self.rng.uniform(0, 15):.1f}"
+        return self.post_form("/closing/regular/add", fields)
+
+
+OPERATIONS = {
+    "receiving": Client.receiving,
+    "create": Client.create,
+    "import": Client.csv_import,
+    "export": Client.export,
+    "closing": Client.closing,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Thao tác không hợp lệ: {name} (có: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Phân vị theo thứ hạng gần nhất (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(base_url, clients, duration, requests_per_client, mix, username, password, customer_ids):
+    """Chạy các client đồng thời; trả về {thao tác: [(độ trễ giây, ok)]} và thời gian chạy"""
+    results = {name: [] for name in mix}
+    lock = threading.Lock()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    start_barrier = threading.Barrier(clients + 1)
+    errors = []
+
+    def worker():
+        client = Client(base_url, customer_ids)
+        try:
+            client.login(username, password)
+        except Exception as e:
+            errors.append(str(e))
+            start_barrier.wait()
+            return
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration if duration else None
+        done = 0
+        while (deadline is None or time.perf_counter() < deadline) and (not requests_per_client or done < requests_per_client):
+            name = client.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = OPERATIONS[name](client)
+                ok = status < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                results[name].append((elapsed, ok))
+            done += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    if errors:
+        print(f"⚠️  {len(errors)} client không đăng nhập được: {errors[0]}")
+    return results, time.perf_counter() - started
+
+
+def print_report(results, wall_seconds):
+    print(f"{'thao tác':<10} {'số yêu cầu':>10} {'lỗi':>5} {'lỗi %':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = []
+    failing = []
+    for name, samples in list(results.items()) + [("TỔNG", None)]:
+        if samples is None:
+            samples = everything
+        else:
+            everything.extend(samples)
+        if not samples:
+            continue
+        latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+        failed = sum(1 for _, ok in samples if not ok)
+        if failed and name != "TỔNG":
+            failing.append(f"{name} ({failed / len(samples):.1%})")
+        print(f"{name:<10} {len(samples):>10} {failed:>5} {failed / len(samples):>6.1%} {len(samples) / wall_seconds:>8.1f} "
+              f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+              f"{percentile(latencies, 99):>8.1f} {latencies[-1]:>8.1f}")
+    if failing:
+        # Độ trễ của các yêu cầu lỗi vẫn được tính vào phân vị ở trên
+        print(f"⚠️  Có yêu cầu lỗi: {', '.join(failing)}")
+
+
+def start_local_app(samples, customers, closed_samples):
+    """Khởi động ứng dụng trên cổng ngẫu nhiên với dữ liệu sinh sẵn; trả về (url, thư mục dữ liệu)"""
+    data_dir = tempfile.mkdtemp(prefix="labmanage-load-")
+    os.environ["LAB_DATA_DIR"] = data_dir
+    os.environ.setdefault("LAB_LOG_LEVEL", "WARNING")
+    from benchmarks import datasets
+    datasets.write_dataset(data_dir, samples=samples, customers=customers)
+    datasets.write_documents(
+        data_dir,
+        closed_samples={"next_id": closed_samples + 1, "closed_samples": datasets.make_closed_samples(closed_samples)},
+    )
+
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", data_dir
+
+
+def load_main(argv):
+    parser = argparse.ArgumentParser(prog="test_connection.py load", description="Tạo tải đồng thời cho LabManage")
+    parser.add_argument("--url", default="http://localhost:5000", help="địa chỉ server (bỏ qua khi dùng --local)")
+    parser.add_argument("--local", action="store_true", help="tự khởi động ứng dụng với dữ liệu sinh sẵn trong thư mục tạm")
+    parser.add_argument("--samples", type=int, default=10_000, help="số mẫu sinh sẵn với --local")
+    parser.add_argument("--customers", type=int, default=50, help="số khách hàng sinh sẵn với --local")
+    parser.add_argument("--closed-samples", type=int, default=2_000, help="số mẫu đã đóng sinh sẵn với --local")
+    parser.add_argument("--clients", type=int, default=8, help="số client đồng thời")
+    parser.add_argument("--duration", type=float, default=30, help="thời gian chạy (giây); 0 = dùng --requests")
+    parser.add_argument("--requests", type=int, default=0, help="số yêu cầu mỗi client (0 = không giới hạn)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"tỉ trọng các thao tác (mặc định {DEFAULT_MIX})")
+    parser.add_argument("--username", default="Admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--customer-ids", type=int, nargs="+", help="ID khách hàng dùng khi tạo mẫu (mặc định 1..--customers)")
+    args = parser.parse_args(argv)
+    if not args.duration and not args.requests:
+        parser.error("cần --duration hoặc --requests")
+
+    data_dir = None
+    base_url = args.url
+    if args.local:
+        base_url, data_dir = start_local_app(args.samples, args.customers, args.closed_samples)
+        print(f"🧪 Ứng dụng cục bộ: {base_url} ({args.samples} mẫu, {args.customers} khách hàng, {args.closed_samples} mẫu đã đóng)")
+    customer_ids = args.customer_ids or list(range(1, args.customers + 1))
+    mix_text = ", ".join(f"{name}={weight:g}" for name, weight in args.mix.items())
+    limit = f"{args.duration:g} giây" if args.duration else f"{args.requests} yêu cầu/client"
+    print(f"🚀 {args.clients} client, {limit}, hỗn hợp: {mix_text}")
+    try:
+        results, wall_seconds = run_load(base_url, args.clients, args.duration, args.requests, args.mix,
+                                         args.username, args.password, customer_ids)
+        print()
+        print_report(results, wall_seconds)
+    finally:
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        load_main(sys.argv[2:])
+    else:
+        main()
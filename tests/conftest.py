@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The stores read LAB_DATA_DIR at import time: point it at a scratch
+# directory before any test imports the app.
+os.environ["LAB_DATA_DIR"] = tempfile.mkdtemp(prefix="labmanage-tests-")
+os.environ.setdefault("LAB_LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
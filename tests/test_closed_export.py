@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+from app import closed_samples_store
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def test_xlsx_export_reads_back_with_openpyxl():
+	ids = closed_samples_store.create_closed_sample_with_boxes(
+		"2024-03-05", "Công ty Đà Lạt", "Mẫu đất <A&B>", "E-01",
+		[{"box_symbol": "A", "weight": 10.0, "moisture": 20}, {"box_symbol": "B", "weight": 2.5, "moisture": 0}],
+		note="ghi chú",
+	)
+	workbook = openpyxl.load_workbook(io.BytesIO(closed_samples_store.export_closed_samples_to_excel("2024-03-05", "2024-03-05")))
+	sheet = workbook[closed_samples_store.EXPORT_SHEET_NAME]
+	rows = list(sheet.iter_rows(values_only=True))
+
+	assert list(rows[0]) == [label for _, label in closed_samples_store.EXPORT_COLUMNS]
+	by_id = {row[0]: row for row in rows[1:]}
+	assert sorted(by_id) == sorted(ids)
+	first = dict(zip([field for field, _ in closed_samples_store.EXPORT_COLUMNS], by_id[ids[0]]))
+	assert first["customer_name"] == "Công ty Đà Lạt"
+	assert first["sample_name"] == "Mẫu đất <A&B>"
+	assert first["box_symbol"] == "A"
+	assert first["weight"] == 10.0 and first["corrected_weight"] == 8.0
+	assert first["note"] == "ghi chú"
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from app import samples_store
+
+HEADER = "ID Khách hàng,Tên mẫu,Mã hóa mẫu\r\n"
+
+
+def _rows(start, count, name):
+	return "".join(f"1,{name} {i},M{i:07d}\r\n" for i in range(start, start + count))
+
+
+def _import(payload):
+	before = samples_store.count_samples()
+	success, errors = samples_store.import_samples_from_stream(io.BytesIO(payload))
+	return success, errors, samples_store.count_samples() - before
+
+
+def test_bad_bytes_after_first_chunk_are_reported_with_their_line():
+	# Far more than IMPORT_CHUNK_SIZE of valid UTF-8, then a byte UTF-8 rejects
+	good = (HEADER + _rows(0, 5000, "Mẫu đất")).encode("utf-8")
+	assert len(good) > 2 * samples_store.IMPORT_CHUNK_SIZE
+	payload = good + b"1,Bad \xff,X\r\n" + _rows(5000, 10, "Mau").encode("utf-8")
+
+	success, errors, saved = _import(payload)
+
+	# Every row before the bad line is saved, none after it, and the report says so
+	assert success == saved == 5000
+	assert errors == [
+		f"Lỗi đọc file CSV: Dòng 5002 (byte {len(good) + 6}): không đọc được theo bảng mã utf-8-sig (byte 0xff)",
+		"Đã lưu 5000 mẫu từ các dòng trước dòng 5002; từ dòng 5002 trở đi chưa được import",
+	]
+
+
+def test_bad_bytes_with_all_or_nothing_save_nothing():
+	payload = (HEADER + _rows(0, 5000, "Mẫu")).encode("utf-8") + b"1,\xff,X\r\n"
+	before = samples_store.count_samples()
+	success, errors = samples_store.import_samples_from_stream(io.BytesIO(payload), all_or_nothing=True)
+	assert success == 0 and samples_store.count_samples() == before
+	assert errors[-1] == "Không import mẫu nào"
+
+
+def test_undefined_cp1252_byte_after_first_chunk_names_its_line():
+	# An "é" in UTF-8-invalid form makes the first chunk detect as cp1252
+	good = b"a,caf\xe9\r\n" * 20_000
+	lines = samples_store._decoded_lines(io.BytesIO(good + b"b,\x81\r\n"))
+	with pytest.raises(ValueError, match=rf"^Dòng 20001 \(byte {len(good) + 2}\): .* cp1252 \(byte 0x81\)$"):
+		for _ in lines:
+			pass
+
+
+def test_valid_file_spanning_chunks_imports_every_row():
+	success, errors, saved = _import((HEADER + _rows(0, 3500, "Mẫu nước")).encode("utf-8-sig"))
+	assert errors == []
+	assert success == saved == 3500
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from app import create_app, profiling
+
+
+@pytest.fixture
+def admin_client():
+	app = create_app()
+	app.testing = True
+	client = app.test_client()
+	assert client.post("/login", data={"username": "Admin", "password": "admin"}).status_code == 302
+	return client
+
+
+def test_profiled_request_stores_a_capture_and_frees_the_profiler(admin_client):
+	response = admin_client.get("/receiving?_profile=1")
+	assert response.status_code == 200
+	assert profiling.get_capture(int(response.headers["X-Lab-Profile-Id"]))["kind"] == "profile"
+	assert not profiling._profiling.locked()
+
+
+def test_request_runs_unprofiled_while_another_is_profiled(admin_client):
+	with profiling._profiling:  # a concurrent request is being profiled
+		response = admin_client.get("/receiving?_profile=1")
+	assert response.status_code == 200
+	assert response.headers["X-Lab-Profile"] == "busy"
+	assert "X-Lab-Profile-Id" not in response.headers
+
+
+def test_concurrent_profiled_requests_all_succeed(admin_client):
+	statuses = []
+
+	def fetch():
+		statuses.append(admin_client.get("/receiving?_profile=1").status_code)
+
+	threads = [threading.Thread(target=fetch) for _ in range(8)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert statuses == [200] * 8
+	assert not profiling._profiling.locked()
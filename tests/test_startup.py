@@ -0,0 +1,13 @@
+import os
+
+from benchmarks import startup
+
+# Shared CI runners are slower and noisier than a workstation: allow twice
+# the budget (override with LAB_STARTUP_BUDGET_MS) and keep the best run.
+BUDGET_MS = float(os.environ.get("LAB_STARTUP_BUDGET_MS", startup.BUDGET_MS * 2))
+
+
+def test_create_app_cold_start_stays_under_budget():
+	runs = startup.measure(3)
+	best_ms = min(r["import_ms"] + r["create_ms"] for r in runs)
+	assert best_ms <= BUDGET_MS, f"import app + create_app() took {best_ms:.0f} ms in a fresh interpreter (budget {BUDGET_MS:.0f} ms)"